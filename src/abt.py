@@ -0,0 +1,324 @@
+import sys
+import os
+import json
+import argparse
+
+import abt_core
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def default_avrdude():
+    if os.environ.get('ABT_AVRDUDE'):
+        return os.environ['ABT_AVRDUDE']
+    bundled = os.path.join(PROJECT_ROOT, 'avrdude', 'avrdude.exe')
+    return bundled if os.name == 'nt' and os.path.exists(bundled) else 'avrdude'
+
+
+def default_conf():
+    return os.environ.get('ABT_AVRDUDE_CONF') or os.path.join(PROJECT_ROOT, 'avrdude', 'avrdude.conf')
+
+
+def list_ports():
+    # pyserial is only needed here, keep it out of the import path of the
+    # backup/restore commands.
+    import serial.tools.list_ports
+    return [p.device for p in serial.tools.list_ports.comports()]
+
+
+def schedule(args):
+    import sqlite3
+    import scheduler
+    queue = scheduler.JobQueue()
+    if args.action == 'add':
+        if not args.name or not args.port:
+            print(json.dumps({'ok': False, 'error': "--name and --port are required"}))
+            return 2
+        try:
+            queue.add_board(args.name, args.port, args.mcu, args.prog, args.baud, args.out,
+                            args.every, args.hub or scheduler.hub_of(args.port), args.at)
+        except ValueError as e:
+            print(json.dumps({'ok': False, 'error': str(e)}))
+            return 2
+        except sqlite3.IntegrityError:
+            print(json.dumps({'ok': False, 'error': f"board {args.name!r} already exists "
+                                                     f"(schedule remove --name {args.name} first)"}))
+            return 2
+        print(json.dumps({'ok': True, 'boards': queue.boards()}, indent=2))
+    elif args.action == 'remove':
+        print(json.dumps({'ok': bool(queue.remove_board(args.name))}))
+    elif args.action == 'list':
+        print(json.dumps(queue.boards(), indent=2))
+    elif args.action == 'history':
+        print(json.dumps(queue.history(args.name), indent=2))
+    elif args.action == 'trend':
+        print(json.dumps(queue.trend(args.name), indent=2))
+    else:
+        say = lambda s: print(s, file=sys.stderr, flush=True)
+        sched = scheduler.Scheduler(queue, args.avrdude, args.conf, args.jobs, args.per_hub,
+                                    on_status=say, watch=args.watch)
+        try:
+            sched.run_forever(until_idle=args.once)
+        except KeyboardInterrupt:
+            sched.stop.set()
+    return 0
+
+
+def watch(args):
+    # One JSON object per line: {"event": "added", "device": ..., "vid": ...}.
+    import time
+    import port_watch
+    watcher = port_watch.PortWatcher()
+    try:
+        while True:
+            added, removed = watcher.poll()
+            for event, infos in (('removed', removed), ('added', added)):
+                for info in infos:
+                    print(json.dumps(dict(info, event=event)), flush=True)
+            time.sleep(args.interval or port_watch.POLL_SECONDS)
+    except KeyboardInterrupt:
+        return 0
+
+
+def plugged_ports(count):
+    # Boards plugged in from now on, one port at a time.
+    import time
+    import port_watch
+    watcher = port_watch.PortWatcher()
+    watcher.poll()
+    seen = 0
+    while count is None or seen < count:
+        added, _ = watcher.poll()
+        for info in added[:None if count is None else count - seen]:
+            seen += 1
+            yield info['device']
+        time.sleep(port_watch.POLL_SECONDS)
+
+
+def program(args):
+    if args.watch:
+        ports = plugged_ports(args.count)
+    else:
+        ports = list_ports() if args.all_ports else args.port
+        if not ports:
+            print(json.dumps({'ok': False, 'error': "No serial port given (--port, --all-ports or --watch)."}))
+            return 2
+    params = {
+        'avrdude_path': args.avrdude,
+        'avrdude_conf_path': args.conf,
+        'mcu': args.mcu,
+        'prog': args.prog,
+        'baud': args.baud,
+        'batch': not args.no_batch,
+        'engine': args.engine,
+        'unsafe_fuses': args.unsafe_fuses,
+        'base_dir': os.path.abspath(args.source),
+    }
+    say = (lambda s: None) if args.quiet else (lambda s: print(s, file=sys.stderr, flush=True))
+    mass = abt_core.MassProgram(params, ports, args.count if args.watch else len(ports), on_status=say)
+    try:
+        result = mass.run()
+    except KeyboardInterrupt:
+        # --watch without --count: Ctrl+C ends the run, the summary is kept.
+        result = {'units': sorted(mass.results, key=lambda u: u['unit'])}
+    result['ok'] = bool(result['units']) and all(u['ok'] for u in result['units'])
+    print(json.dumps(result, indent=2))
+    return 0 if result['ok'] else 1
+
+
+def build_parser():
+    ap = argparse.ArgumentParser(prog='abt', description="Arduino Backup Tool (headless)")
+    sub = ap.add_subparsers(dest='command', required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--port', action='append', default=[], help="serial port (repeat for several boards)")
+    common.add_argument('--all-ports', action='store_true', help="every detected serial port")
+    common.add_argument('--jobs', type=int, default=4, help="boards handled in parallel")
+    common.add_argument('--mcu', default='atmega328p')
+    common.add_argument('--prog', default='arduino')
+    common.add_argument('--baud', default='57600')
+    common.add_argument('--avrdude', default=default_avrdude())
+    common.add_argument('--conf', default=default_conf())
+    common.add_argument('--engine', choices=['avrdude', 'native'], default='avrdude',
+                        help="native: talk STK500 to arduino/wiring bootloaders without avrdude")
+    common.add_argument('--no-batch', action='store_true', help="one avrdude process per memory")
+    common.add_argument('--quiet', action='store_true', help="no progress on stderr")
+
+    p = sub.add_parser('backup', parents=[common], help="read flash, EEPROM and fuses")
+    p.add_argument('--out', default='backup', help="folder receiving abt_* backups")
+    p.add_argument('--no-store', action='store_true', help="keep loose HEX/fuse files")
+    p.add_argument('--archive', action='store_true', help="one compressed abt_*.abt file per backup")
+    p.add_argument('--retries', type=int, default=abt_core.RETRIES,
+                   help="retries of a failed read, resuming from the checkpoint")
+    p.add_argument('--resume', action='store_true',
+                   help="continue the unfinished backup of an earlier run (memories read at different times)")
+
+    p = sub.add_parser('program', parents=[common], help="program one golden backup onto many boards")
+    p.add_argument('--from', dest='source', required=True, help="golden abt_* backup folder or .abt archive")
+    p.add_argument('--watch', action='store_true', help="program boards as they are plugged in")
+    p.add_argument('--count', type=int, help="--watch: stop after this many boards")
+    p.add_argument('--unsafe-fuses', action='store_true',
+                   help="write fuses that disable ISP or the reset pin (SPIEN, RSTDISBL, DWEN)")
+
+    p = sub.add_parser('restore', parents=[common], help="write a backup to the board")
+    p.add_argument('--from', dest='source', required=True, help="abt_* backup folder or .abt archive")
+    p.add_argument('--differential', action='store_true', help="only write changed pages")
+    p.add_argument('--verify', choices=['avrdude', 'hash'], default='avrdude',
+                   help="avrdude's verify pass after each memory, or one read-back of the image bytes at "
+                        "the end (compared by avrdude, or by CRC32/SHA-256 on the native engine)")
+    p.add_argument('--unsafe-fuses', action='store_true',
+                   help="write fuses that disable ISP or the reset pin (SPIEN, RSTDISBL, DWEN)")
+
+    p = sub.add_parser('verify', parents=[common], help="compare the board with a backup")
+    p.add_argument('--from', dest='source', required=True, help="abt_* backup folder or .abt archive")
+
+    p = sub.add_parser('check', help="check backup integrity offline")
+    p.add_argument('--tree', default='backup', help="folder holding abt_* backups")
+    p.add_argument('--jobs', type=int, default=None)
+
+    p = sub.add_parser('schedule', help="periodic unattended backups")
+    p.add_argument('action', choices=['add', 'remove', 'list', 'run', 'history', 'trend'])
+    p.add_argument('--name', help="board name")
+    p.add_argument('--port')
+    p.add_argument('--mcu', default='atmega328p')
+    p.add_argument('--prog', default='arduino')
+    p.add_argument('--baud', default='57600')
+    p.add_argument('--out', default='backup', help="folder receiving abt_* backups")
+    p.add_argument('--every', default='24h', help="interval: 90s, 30m, 24h, 7d")
+    p.add_argument('--at', help="first run at HH:MM (e.g. 02:00 for nightly backups)")
+    p.add_argument('--hub', help="USB hub id (default: from the port location)")
+    p.add_argument('--jobs', type=int, default=4, help="backups running at once")
+    p.add_argument('--per-hub', type=int, default=2, help="backups running at once per USB hub")
+    p.add_argument('--once', action='store_true', help="run: stop when nothing is due")
+    p.add_argument('--watch', action='store_true', help="run: back up a board as soon as it is plugged in")
+    p.add_argument('--avrdude', default=default_avrdude())
+    p.add_argument('--conf', default=default_conf())
+
+    p = sub.add_parser('catalog', help="index and search backups")
+    p.add_argument('action', choices=['scan', 'search'])
+    p.add_argument('text', nargs='*', help="search: words matched against board, MCU, path, hashes, date")
+    p.add_argument('--tree', default='backup', help="scan: folder holding abt_* backups")
+    p.add_argument('--mcu')
+    p.add_argument('--board')
+    p.add_argument('--limit', type=int, default=50)
+
+    p = sub.add_parser('diff', help="compare two backups")
+    p.add_argument('a', help="abt_* backup folder or .abt archive")
+    p.add_argument('b')
+    p.add_argument('--json', action='store_true', help="JSON instead of text")
+
+    p = sub.add_parser('group', help="group the backups of a tree by flash similarity")
+    p.add_argument('--tree', default='backup', help="folder holding abt_* backups")
+    p.add_argument('--threshold', type=float, default=0.8, help="minimal block similarity (0-1)")
+
+    sub.add_parser('ports', help="list serial ports")
+    p = sub.add_parser('watch', help="print serial ports as they are plugged in and removed")
+    p.add_argument('--interval', type=float, default=None, help="seconds between port scans")
+
+    p = sub.add_parser('parts', help="list the parts of avrdude.conf")
+    p.add_argument('--conf', default=default_conf())
+    return ap
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.command == 'ports':
+        print(json.dumps(list_ports()))
+        return 0
+
+    if args.command == 'watch':
+        return watch(args)
+
+    if args.command == 'parts':
+        import avrdude_conf
+        parts = avrdude_conf.load(args.conf)['parts']
+        print(json.dumps({name: {'signature': part['signature'],
+                                 'sizes': avrdude_conf.memory_sizes(part)}
+                          for name, part in parts.items()}, indent=2))
+        return 0
+
+    if args.command == 'check':
+        import integrity
+        results = integrity.check_tree(args.tree, args.jobs)
+        ok = not any(results.values())
+        print(json.dumps({'ok': ok, 'backups': results}, indent=2))
+        return 0 if ok else 1
+
+    if args.command == 'schedule':
+        return schedule(args)
+
+    if args.command == 'diff':
+        import image_diff
+        report = image_diff.diff_backups(args.a, args.b)
+        print(json.dumps(report, indent=2) if args.json else image_diff.format_report(report))
+        return 0
+
+    if args.command == 'group':
+        import backup_store
+        import image_diff
+        import integrity
+        images = {path: backup_store.load_image(path, 'flash') for path in integrity.find_backups(args.tree)}
+        print(json.dumps(image_diff.group_similar(images, args.threshold), indent=2))
+        return 0
+
+    if args.command == 'catalog':
+        import catalog
+        cat = catalog.Catalog()
+        if args.action == 'scan':
+            print(json.dumps(cat.scan(args.tree, on_status=lambda s: print(s, file=sys.stderr)), indent=2))
+        else:
+            print(json.dumps(cat.search(" ".join(args.text), args.mcu, args.board, args.limit), indent=2))
+        return 0
+
+    if args.command == 'program':
+        return program(args)
+
+    ports = list_ports() if args.all_ports else args.port
+    if not ports:
+        print(json.dumps({'ok': False, 'error': "No serial port given (--port or --all-ports)."}))
+        return 2
+
+    base_dir = args.out if args.command == 'backup' else args.source
+    if args.command == 'backup':
+        os.makedirs(base_dir, exist_ok=True)
+    params = {
+        'avrdude_path': args.avrdude,
+        'avrdude_conf_path': args.conf,
+        'mcu': args.mcu,
+        'prog': args.prog,
+        'port': ports[0],
+        'baud': args.baud,
+        'batch': not args.no_batch,
+        'engine': args.engine,
+        'store': not getattr(args, 'no_store', False),
+        'archive': getattr(args, 'archive', False),
+        'catalog': True,
+        'retries': getattr(args, 'retries', abt_core.RETRIES),
+        'resume': getattr(args, 'resume', False),
+        'differential': getattr(args, 'differential', False),
+        'verify': getattr(args, 'verify', 'avrdude'),
+        'unsafe_fuses': getattr(args, 'unsafe_fuses', False),
+        'base_dir': os.path.abspath(base_dir),
+    }
+    say = (lambda s: None) if args.quiet else (lambda s: print(s, file=sys.stderr, flush=True))
+
+    if len(ports) == 1:
+        try:
+            result = abt_core.Job(args.command, params, on_status=say).run()
+            result['ok'] = True
+        except Exception as e:
+            result = {'ok': False, 'mode': args.command, 'port': ports[0], 'error': str(e)}
+        print(json.dumps(result, indent=2))
+        return 0 if result['ok'] else 1
+
+    fleet = abt_core.Fleet(args.command, params, ports, args.jobs,
+                           on_board_status=lambda port, s: say(f"[{port}] {s}"))
+    results = fleet.run()
+    ok = all(r['ok'] for r in results)
+    print(json.dumps({'ok': ok, 'summary': fleet.summary, 'results': results}, indent=2))
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
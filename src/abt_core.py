@@ -0,0 +1,1020 @@
+import os
+import hashlib
+import queue
+import re
+import subprocess
+import tempfile
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+
+import avrdude_conf
+import backup_archive
+import backup_store
+import checkpoint
+import fuses
+import ihex
+
+MEMORY_RE = re.compile(r"(reading|writing|verifying) (flash|eeprom|lfuse|hfuse|efuse)\b", re.IGNORECASE)
+WRITE_SIZE_RE = re.compile(r"writing \w+ \((\d+) bytes\)")
+BAR_RE = re.compile(r"^(Reading|Writing) \| $")
+# -v output: "Using Port" follows the config parse, "writing output file"
+# ends the transfer of a read.
+PORT_RE = re.compile(r"^\s*Using Port\s*:", re.IGNORECASE)
+OUTPUT_RE = re.compile(r"writing output file", re.IGNORECASE)
+STALL_SECONDS = 5
+
+# (flash size, eeprom size, flash page, eeprom page)
+MEMORY_SIZES = {
+    'atmega328p': (32768, 1024, 128, 4),
+    'atmega168':  (16384, 512, 128, 4),
+    'atmega2560': (262144, 4096, 256, 8),
+    'attiny85':   (8192, 512, 64, 4),
+    'atmega32u4': (32768, 1024, 128, 4),
+    'atmega1280': (131072, 4096, 256, 8),
+    'attiny13':   (1024, 64, 32, 4),
+    'atmega8':    (8192, 512, 64, 4),
+}
+
+# Programmers talking to a bootloader, which erases each page itself before
+# writing it: only those can rewrite a subset of the flash pages.
+BOOTLOADER_PROGS = ('arduino', 'wiring')
+# Programmers the native STK500 engine (stk500.py) can stand in for.
+NATIVE_PROGS = ('arduino', 'stk500v1', 'wiring')
+# A failed backup is retried this many times, resuming from its checkpoint.
+RETRIES     = 2
+RETRY_DELAY = 1.0
+
+
+class AvrdudeOutput:
+    # avrdude draws its "Reading | ####" bars one '#' at a time without a
+    # newline, so the output has to be parsed per character, not per line.
+    def __init__(self, tail=40):
+        self.line   = ''
+        self.bar    = None
+        self.hashes = 0
+        self.tail   = deque(maxlen=tail)
+
+    def feed(self, text):
+        events = []
+        for ch in text:
+            if ch in '\r\n':
+                if self.line:
+                    self.tail.append(self.line)
+                    m = MEMORY_RE.search(self.line)
+                    if PORT_RE.match(self.line):
+                        events.append(('port', None, None))
+                    elif OUTPUT_RE.search(self.line):
+                        events.append(('output', None, None))
+                    elif m:
+                        size = WRITE_SIZE_RE.search(self.line)
+                        kind = {'reading': 'read', 'writing': 'write'}.get(m.group(1).lower(), 'verify')
+                        events.append((kind, m.group(2).lower(), int(size.group(1)) if size else None))
+                self.line = ''
+                self.bar  = None
+                continue
+            self.line += ch
+            if self.bar is not None:
+                if ch == '#':
+                    self.hashes += 1
+                    events.append(('bar', self.bar, self.hashes * 2))
+            elif ch == ' ' and BAR_RE.match(self.line):
+                self.bar    = self.line.split()[0].lower()
+                self.hashes = 0
+                events.append(('bar', self.bar, 0))
+        return events
+
+    def text(self):
+        return "\n".join(list(self.tail) + ([self.line] if self.line else []))
+
+
+def backup_name(base_dir, now):
+    # abt_may13a..z, then abt_may13-27, -28...: a letter past 'z' would be
+    # '{' or '|', not allowed on Windows.
+    prefix = f"abt_{now.strftime('%B').lower()}{now.day}"
+    # A converted folder and its .abt archive share one name.
+    taken = {d.split('.')[0] for d in os.listdir(base_dir)}
+    # abt_may1 must not count abt_may13a.
+    n = sum(1 for d in taken if re.fullmatch(re.escape(prefix) + r"([a-z]|-\d+)", d))
+    while True:
+        name = prefix + (chr(ord('a') + n) if n < 26 else f"-{n + 1}")
+        if name not in taken:
+            return name
+        n += 1
+
+
+def _ignore(*args):
+    pass
+
+
+class Job:
+    def __init__(self, mode, params, on_progress=None, on_status=None, on_throughput=None,
+                 on_phase=None):
+        self.mode   = mode
+        self.params = params
+        self.on_progress   = on_progress or _ignore
+        self.on_status     = on_status or _ignore
+        self.on_throughput = on_throughput or _ignore
+        self.on_phase      = on_phase or _ignore
+        self.phases = []
+        self.t0 = time.perf_counter()
+        self.extra_args = []
+        self.report = []
+        self.backup_dir = None
+        self.archive = None
+        self.checkpoint = None
+        self.resumed_ops = []
+        self.resumed = None
+        self.device_fuses = None
+        self.read_sizes = {}
+        self.verified = {}
+        self._part = None
+
+    def base_cmd(self):
+        return [
+            self.params['avrdude_path'], '-C', self.params['avrdude_conf_path'],
+            '-p', self.params['mcu'], '-c', self.params['prog'],
+            '-P', self.params['port'], '-b', self.params['baud']
+        ] + self.extra_args
+
+    def plan(self, tmp):
+        ops = []
+        base_dir = self.params['base_dir']
+
+        if self.mode == 'backup':
+            meta = {
+                'mcu': self.params['mcu'], 'board': self.params.get('board') or self.params['port'],
+                'archive': bool(self.params.get('archive')),
+            }
+            # Another run's unfinished backup is only continued on request.
+            resumed = checkpoint.find(base_dir, meta) if self.params.get('resume') else None
+            if resumed:
+                self.backup_dir = resumed
+                self.on_status(f"Resuming unfinished backup {os.path.basename(resumed)}")
+            else:
+                self.backup_dir = os.path.join(base_dir, backup_name(base_dir, datetime.now()))
+                if self.params.get('archive'):
+                    self.backup_dir += backup_archive.EXT
+            self.checkpoint = checkpoint.Checkpoint(self.backup_dir, meta)
+            if resumed and self.checkpoint.read_before():
+                # Not a snapshot: say which memories are older.
+                self.resumed = {
+                    'backup': os.path.basename(resumed),
+                    'started': self.checkpoint.state.get('started'),
+                    'read_before': self.checkpoint.read_before(),
+                    'read_at': dict(self.checkpoint.state.get('done_at', {})),
+                }
+                self.report.append(
+                    f"Resumed {self.resumed['backup']} (started {self.resumed['started'] or 'earlier'}): "
+                    f"{', '.join(self.resumed['read_before'])} read then, the rest now - "
+                    f"memories read at different times")
+            if self.params.get('archive'):
+                # Memories are read to the checkpoint folder and appended to
+                # the archive as soon as each one is complete (op_done).
+                backup_dir = self.checkpoint.path
+            else:
+                backup_dir = self.backup_dir
+                os.makedirs(backup_dir, exist_ok=True)
+
+            for name, ext in [('flash','hex'), ('eeprom','eep')]:
+                out = os.path.join(backup_dir, f"{name}.{ext}")
+                ops.append((f"Read {name}", name, f"{name}:r:{out}:i"))
+
+            for fuse in self.fuse_names():
+                out = os.path.join(backup_dir, f"{fuse}.txt")
+                ops.append((f"Read {fuse}", fuse, f"{fuse}:r:{out}:h"))
+
+            # Memories a previous run finished are not read again.
+            self.resumed_ops = [op for op in ops if self.checkpoint.is_done(op[1])
+                                and os.path.exists(op[2].split(':', 2)[2].rsplit(':', 1)[0])]
+            ops = [op for op in ops if op not in self.resumed_ops]
+
+        elif backup_archive.is_archive(base_dir):
+            for name, _ in backup_store.IMAGES:
+                inp = os.path.join(tmp, f"{name}.bin")
+                with open(inp, 'wb') as f:
+                    f.write(backup_store.load_image(base_dir, name))
+                ops.append((f"Write {name}", name, f"{name}:w:{inp}:r"))
+            ops += self.fuse_writes()
+
+        elif backup_store.is_store_backup(base_dir):
+            manifest = backup_store.read_manifest(base_dir)
+            store = backup_store.BackupStore.for_backup(base_dir, manifest)
+            for name, _ in backup_store.IMAGES:
+                inp = store.object_path(manifest['images'][name]['sha256'])
+                ops.append((f"Write {name}", name, f"{name}:w:{inp}:r"))
+            ops += self.fuse_writes()
+
+        else:
+            for name, ext in [('flash','hex'), ('eeprom','eep')]:
+                inp = os.path.join(base_dir, f"{name}.{ext}")
+                ops.append((f"Write {name}", name, f"{name}:w:{inp}:i"))
+            ops += self.fuse_writes()
+
+        return ops
+
+    def fuse_ops(self):
+        values = backup_store.read_fuses(self.params['base_dir'])
+        return [(f"Write {fuse}", fuse, f"{fuse}:w:{values[fuse]}:m") for fuse in self.fuse_names()
+                if fuse in values]
+
+    def fuse_names(self):
+        return fuses.names(self.params['mcu'], self.part())
+
+    def fuse_access(self):
+        # The arduino and wiring bootloaders can neither read nor write
+        # fuses: through them fuses are left alone. Other programmers
+        # (stk500v1 may be an ArduinoISP or a bootloader) are asked, and
+        # fuses_readable() tells from the answer.
+        return self.params['prog'] not in BOOTLOADER_PROGS
+
+    def fuses_readable(self, values):
+        # Optiboot answers fuse reads with 0x00, a value no chip reachable
+        # by ISP can have (hfuse 0x00 has RSTDISBL programmed).
+        return any(fuses.value(v) for v in values.values())
+
+    def skip_fuses(self, why):
+        self.on_status(f"Fuses not written: {why}")
+        self.report.append(f"fuses: not written, {why}")
+
+    def read_device(self, tmp, images=()):
+        # Device images the differential restore compares against and the
+        # fuses, in one session before anything is written.
+        ops = [(f"Read device {name}", name, f"{name}:r:{os.path.join(tmp, f'{name}.device.hex')}:i")
+               for name in images]
+        if self.fuse_access():
+            ops += [(f"Read device {fuse}", fuse, f"{fuse}:r:{os.path.join(tmp, f'{fuse}.device.txt')}:h")
+                    for fuse in self.fuse_names()]
+        if not ops:
+            return 0
+        # Progress runs over the whole job: these reads, then at most one
+        # write per image and fuse, checked again by a hash verify.
+        later = len(backup_store.IMAGES) + (len(self.fuse_names()) if self.fuse_access() else 0)
+        if self.params.get('verify') == 'hash':
+            later *= 2
+        self.run_session(ops, 0, len(ops) + later)
+        if self.fuse_access():
+            self.device_fuses = {}
+            for fuse in self.fuse_names():
+                with open(os.path.join(tmp, f"{fuse}.device.txt"), 'r') as f:
+                    self.device_fuses[fuse] = f.read().strip()
+        return len(ops)
+
+    def fuse_writes(self):
+        # Only the fuses that differ from the device are written, and a
+        # change that could lock the board out is refused up front.
+        if not self.fuse_access():
+            self.skip_fuses(f"the {self.params['prog']} bootloader cannot program them")
+            return []
+        current = self.device_fuses
+        if not self.fuses_readable(current):
+            self.skip_fuses(f"they read back as 0x00 through {self.params['prog']} (a bootloader?)")
+            self.device_fuses = None
+            return []
+        mcu = self.params['mcu']
+        target = {fuse: value.strip() for fuse, value in backup_store.read_fuses(self.params['base_dir']).items()
+                  if fuse in current}
+        for problem in fuses.ensure_safe(mcu, target, current, self.params.get('unsafe_fuses')):
+            self.on_status(f"Warning: {problem}")
+        ops = []
+        for fuse in fuses.changed(current, target):
+            fields = fuses.diff(mcu, fuse, current[fuse], target[fuse])
+            self.on_status(f"{fuse}: {current[fuse]} -> {target[fuse]}"
+                           + (f" ({', '.join(fields)})" if fields else ""))
+            ops.append((f"Write {fuse}", fuse, f"{fuse}:w:{target[fuse]}:m"))
+        self.report.append(f"fuses: {len(ops)} written, {len(current) - len(ops)} unchanged")
+        return ops
+
+    def plan_differential(self, tmp):
+        # The diff module is only loaded by the jobs that compare images.
+        import image_diff
+
+        base_dir = self.params['base_dir']
+        device = dict(self.params.get('device_images') or {})
+        missing = [name for name, _ in backup_store.IMAGES if name not in device]
+        for name in missing:
+            device[name] = os.path.join(tmp, f"{name}.device.hex")
+        done = self.read_device(tmp, missing)
+
+        # -D: keep avrdude from erasing the chip, the bootloader erases
+        # the pages it rewrites.
+        self.extra_args.append('-D')
+        ops = []
+        for name, _ in backup_store.IMAGES:
+            target  = backup_store.load_image(base_dir, name)
+            current = ihex.load(device[name], cache=False)
+            ranges  = image_diff.changed_ranges(current, target, self.page_size(name))
+            written = sum(end - start for start, end in ranges)
+            self.report.append(
+                f"{name}: {written} byte(s) written, {len(target) - written} skipped "
+                f"({len(ranges)} range(s))")
+            if ranges:
+                path = os.path.join(tmp, f"{name}.diff.hex")
+                ihex.write(path, target, ranges=ranges)
+                ops.append((f"Write {name}", name, f"{name}:w:{path}:i"))
+        return ops + self.fuse_writes(), done
+
+    def plan_verify(self, tmp, verb="Read"):
+        ops = []
+        for name, _ in backup_store.IMAGES:
+            if verb == "Verify" and not self.native():
+                # avrdude compares the backup bytes itself and reads back
+                # only as many as the file holds, not the whole memory.
+                inp = os.path.join(tmp, f"{name}.backup.bin")
+                with open(inp, 'wb') as f:
+                    f.write(backup_store.load_image(self.params['base_dir'], name))
+                self.verified[name] = os.path.getsize(inp)
+                ops.append((f"{verb} {name}", name, f"{name}:v:{inp}:r"))
+                continue
+            out = os.path.join(tmp, f"{name}.device.hex")
+            # compare_device() only looks at the backup's bytes: the native
+            # engine stops there, avrdude always reads the whole memory.
+            self.read_sizes[name] = backup_store.expected_digests(self.params['base_dir'], name)['size']
+            ops.append((f"{verb} {name}", name, f"{name}:r:{out}:i"))
+        if self.fuse_access():
+            for fuse in self.fuse_names():
+                out = os.path.join(tmp, f"{fuse}.device.txt")
+                ops.append((f"{verb} {fuse}", fuse, f"{fuse}:r:{out}:h"))
+        return ops
+
+    def compare_device(self, tmp):
+        import image_diff
+
+        base_dir = self.params['base_dir']
+        mismatches = []
+        for name, _ in backup_store.IMAGES:
+            if name in self.verified:
+                self.report.append(f"{name}: {self.verified[name]} byte(s) verified by avrdude")
+                continue
+            expected = backup_store.expected_digests(base_dir, name)
+            current  = ihex.load(os.path.join(tmp, f"{name}.device.hex"), cache=False)
+            size = expected['size']
+            # avrdude drops trailing 0xff bytes from flash reads.
+            data = bytes(current[:size]) + b'\xff' * max(0, size - len(current))
+            if f"{zlib.crc32(data) & 0xffffffff:08x}" == expected['crc32'] \
+                    and hashlib.sha256(data).hexdigest() == expected['sha256']:
+                self.report.append(f"{name}: {size} byte(s) match (crc32 {expected['crc32']})")
+                continue
+            ranges = image_diff.changed_ranges(data, backup_store.load_image(base_dir, name))
+            count = sum(end - start for start, end in ranges)
+            where = f", first at 0x{ranges[0][0]:04x}" if ranges else ""
+            mismatches.append(f"{name}: {count} byte(s) differ{where}")
+        if self.fuse_access():
+            expected = dict((op[1], op[2].split(':')[2]) for op in self.fuse_ops())
+            device = {}
+            for fuse in self.fuse_names():
+                with open(os.path.join(tmp, f"{fuse}.device.txt"), 'r') as f:
+                    device[fuse] = f.read().strip()
+            if not self.fuses_readable(device):
+                self.on_status(f"Fuses not compared: they read back as 0x00 through {self.params['prog']}")
+                self.report.append("fuses: not compared, the device reads them as 0x00")
+                device = {}
+            for fuse, actual in device.items():
+                if fuse in expected and fuses.value(actual) != fuses.value(expected[fuse]):
+                    mismatches.append(f"{fuse}: device {actual}, backup {expected[fuse]}")
+        if mismatches:
+            raise RuntimeError("Verify failed:\n" + "\n".join(mismatches))
+        self.report.append("Device matches backup")
+
+    def op_done(self, op):
+        # Backup outputs are complete once the session has moved past them.
+        if self.archive is not None:
+            self.archive_op(op)
+        if self.checkpoint is not None:
+            self.checkpoint.mark_done(op[1])
+
+    def archive_op(self, op):
+        _, name, spec = op
+        path = spec.split(':', 2)[2].rsplit(':', 1)[0]
+        with self.timed('archive', memory=name):
+            if name in dict(backup_store.IMAGES):
+                self.archive.add_image(name, ihex.decode(path))
+            else:
+                with open(path, 'r') as f:
+                    self.archive.add_fuse(name, f.read())
+
+    def sessions(self, ops):
+        # One avrdude process per session: either every -U in a single
+        # session, or the historical one-process-per-memory layout.
+        if self.params.get('batch', True):
+            return [ops]
+        # Fuses are a byte each: consecutive ones share a process.
+        sessions = []
+        for op in ops:
+            if sessions and op[1] in backup_store.FUSES and sessions[-1][-1][1] in backup_store.FUSES:
+                sessions[-1].append(op)
+            else:
+                sessions.append([op])
+        return sessions
+
+    def phase(self, name, start, end=None, **info):
+        # One timing event: phase name, start relative to the job start and
+        # duration in seconds, plus the op label/memory when relevant.
+        end = time.perf_counter() if end is None else end
+        event = dict(phase=name, start=round(start - self.t0, 4), elapsed=round(end - start, 4), **info)
+        self.phases.append(event)
+        self.on_phase(event)
+
+    @contextmanager
+    def timed(self, name, **info):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phase(name, start, **info)
+
+    def part(self):
+        # Selected MCU in the avrdude.conf index, None when the file is
+        # missing or does not know it.
+        if self._part is None:
+            try:
+                index = avrdude_conf.load(self.params['avrdude_conf_path'])
+                self._part = avrdude_conf.find_part(index, self.params['mcu']) or {}
+            except OSError:
+                self._part = {}
+        return self._part or None
+
+    def sizes(self):
+        return MEMORY_SIZES.get(self.params['mcu']) or avrdude_conf.memory_sizes(self.part())
+
+    def check_fit(self):
+        # Refuse a backup too large for the selected part before the board
+        # is touched.
+        base_dir = self.params['base_dir']
+        for name, _ in backup_store.IMAGES:
+            size = self.memory_size(name)
+            used = backup_store.expected_digests(base_dir, name)['size']
+            if size and used > size:
+                raise RuntimeError(f"{name} backup ({used} bytes) does not fit in "
+                                   f"{self.params['mcu']} {name} ({size} bytes)")
+
+    def memory_size(self, memory):
+        sizes = self.sizes()
+        if memory in ('flash', 'eeprom'):
+            return sizes[0 if memory == 'flash' else 1] if sizes else None
+        return 1
+
+    def read_size(self, memory, spec):
+        # Bytes the native engine reads or checks for one op: a verify
+        # read-back ends with the backup image, rounded up to a page.
+        size = self.memory_size(memory)
+        used = self.read_sizes.get(memory)
+        if used is None or spec.split(':')[1] != 'r':
+            return size
+        page = self.page_size(memory)
+        return min(size, -(-used // page) * page) if size else used
+
+    def page_size(self, memory):
+        sizes = self.sizes()
+        if not sizes:
+            # Unknown part: a 256-byte/8-byte grid is a multiple of every
+            # AVR page size we support, so it never splits a page.
+            return 256 if memory == 'flash' else 8
+        return sizes[2 if memory == 'flash' else 3]
+
+    def native(self):
+        return (self.params.get('engine') == 'native' and self.params['prog'] in NATIVE_PROGS
+                and self.sizes() is not None)
+
+    def run_native(self, ops, done, total):
+        # pyserial is only imported when the native engine is asked for.
+        import serial
+        import stk500
+
+        label = ops[0][0]
+        last_pct = [int(done * 100 / total)]
+        self.on_status(label)
+        self.on_progress(last_pct[0])
+        start = time.perf_counter()
+        connected = False
+        try:
+            with stk500.connect(self.params['prog'], self.params['port'], self.params['baud'],
+                                self.memory_size('flash'), self.params['mcu'],
+                                (self.part() or {}).get('signature')) as boot:
+                # Serial open, auto-reset, sync and signature check.
+                self.phase('connect', start)
+                connected = True
+                for idx, (label, name, spec) in enumerate(ops):
+                    if idx:
+                        self.on_status(label)
+                    t0 = time.monotonic()
+                    op_start = time.perf_counter()
+
+                    def on_bytes(count, size, idx=idx, t0=t0):
+                        pct = int((done + idx + count / size) * 100 / total)
+                        if pct != last_pct[0]:
+                            last_pct[0] = pct
+                            self.on_progress(pct)
+                        elapsed = time.monotonic() - t0
+                        if size > 1 and elapsed > 0:
+                            self.on_throughput(count / elapsed)
+                    image = None
+                    if self.checkpoint and name in dict(backup_store.IMAGES):
+                        image = self.read_chunks(boot, spec, on_bytes)
+                    else:
+                        boot.execute(spec, self.read_size(name, spec), self.page_size(name),
+                                     verify='-V' not in self.extra_args, on_bytes=on_bytes)
+                    self.phase('transfer', op_start, op=label, memory=name)
+                    if image is not None:
+                        _, _, path, fmt = stk500.parse_spec(spec)
+                        with self.timed('file_write', op=label, memory=name):
+                            stk500.save(name, image, path, fmt)
+                    self.op_done(ops[idx])
+        except (RuntimeError, ValueError, OSError, serial.SerialException) as e:
+            if not connected:
+                raise RuntimeError(f"Connection to {self.params['port']} failed:\n{e}")
+            raise RuntimeError(f"{label} failed:\n{e}")
+
+    def read_chunks(self, boot, spec, on_bytes):
+        # Every chunk is persisted as soon as it is read, so a retry only
+        # reads what is missing; the image is returned once all check out.
+        import stk500
+
+        memory = stk500.parse_spec(spec)[0]
+        size = self.memory_size(memory)
+        missing = self.checkpoint.missing(memory, size)
+        count = [size - sum(min(self.checkpoint.chunk, size - addr) for addr in missing)]
+
+        def on_chunk(n):
+            count[0] += n
+            on_bytes(count[0], size)
+        if count[0]:
+            self.on_status(f"{memory}: {count[0]} byte(s) from checkpoint")
+        for addr in missing:
+            data = boot.read_memory(memory, min(size, addr + self.checkpoint.chunk), on_chunk, start=addr)
+            self.checkpoint.put_chunk(memory, addr, data)
+        return self.checkpoint.image(memory, size)
+
+    @staticmethod
+    def pump(stream, chunks):
+        for chunk in iter(lambda: stream.read1(4096), b''):
+            chunks.put(chunk)
+        chunks.put(None)
+
+    def run_session(self, ops, done, total):
+        if self.native():
+            return self.run_native(ops, done, total)
+        # -v for the "Using Port" line that splits config parse from connect.
+        cmd = self.base_cmd() + ['-v']
+        for _, _, spec in ops:
+            cmd += ['-U', spec]
+
+        startupinfo = None
+        creationflags = 0
+        if os.name == 'nt':
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+            creationflags = subprocess.CREATE_NO_WINDOW
+
+        current = 0
+        flushed = 0
+        started = False
+        label = ops[0][0]
+        bar = 0
+        size = None
+        bar_t0 = time.monotonic()
+        last_pct = int(done * 100 / total)
+        self.on_status(label)
+        self.on_progress(last_pct)
+
+        parser = AvrdudeOutput()
+        chunks = queue.Queue()
+        # Phases: 'spawn' until avrdude's first output (its -v banner),
+        # 'config' until "Using Port", 'connect' (serial open, auto-reset,
+        # sync, signature) until the first memory op, then per op a
+        # 'transfer' and, for reads, a 'file_write' of the output file.
+        start = mark = op_start = time.perf_counter()
+        stage = 'spawn'
+        writing = False
+        proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            startupinfo=startupinfo, creationflags=creationflags
+        )
+        threading.Thread(target=self.pump, args=(proc.stdout, chunks), daemon=True).start()
+
+        last_data = time.monotonic()
+        warned = 0
+        while True:
+            try:
+                chunk = chunks.get(timeout=1)
+            except queue.Empty:
+                idle = int(time.monotonic() - last_data)
+                if idle >= STALL_SECONDS * (warned + 1):
+                    warned += 1
+                    self.on_status(f"{label}: no data from avrdude for {idle}s")
+                continue
+            if chunk is None:
+                break
+            last_data = time.monotonic()
+            warned = 0
+            if stage == 'spawn':
+                mark = time.perf_counter()
+                self.phase('spawn', start, mark)
+                stage = 'config'
+
+            for kind, name, value in parser.feed(chunk.decode(errors='replace')):
+                if kind == 'port' and stage == 'config':
+                    now = time.perf_counter()
+                    self.phase('config', mark, now)
+                    mark, stage = now, 'connect'
+                    continue
+                if kind == 'output' and started and not writing:
+                    now = time.perf_counter()
+                    self.phase('transfer', op_start, now, op=ops[current][0], memory=ops[current][1])
+                    op_start, writing = now, True
+                    continue
+                if kind in ('read', 'write', 'verify'):
+                    for idx in range(current, len(ops)):
+                        if ops[idx][1] != name or ops[idx][2].split(':')[1] != kind[0]:
+                            continue
+                        if idx != current or not started:
+                            now = time.perf_counter()
+                            if started:
+                                self.phase('file_write' if writing else 'transfer', op_start, now,
+                                           op=ops[current][0], memory=ops[current][1])
+                            else:
+                                # Without -v output: one phase up to here.
+                                self.phase(stage, mark, now)
+                            op_start, writing = now, False
+                            if idx != current:
+                                label = ops[idx][0]
+                                self.on_status(label)
+                                for op in ops[flushed:idx]:
+                                    self.op_done(op)
+                                flushed = idx
+                            current, started = idx, True
+                            bar  = -1
+                            size = value or self.memory_size(name)
+                        break
+                    continue
+
+                if not started:
+                    continue
+                # Writes are followed by avrdude's verify read (unless -V): two bars.
+                bars = 2 if ops[current][2].split(':')[1] == 'w' and '-V' not in self.extra_args else 1
+                if value == 0:
+                    bar = min(bar + 1, bars - 1)
+                    bar_t0 = time.monotonic()
+                frac = (bar + value / 100) / bars
+                pct = int((done + current + frac) * 100 / total)
+                if pct != last_pct:
+                    last_pct = pct
+                    self.on_progress(pct)
+                elapsed = time.monotonic() - bar_t0
+                if size and value and elapsed > 0:
+                    self.on_throughput(size * value / 100 / elapsed)
+
+        end = time.perf_counter()
+        if started:
+            self.phase('file_write' if writing else 'transfer', op_start, end,
+                       op=ops[current][0], memory=ops[current][1])
+        proc.wait()
+        self.phase('exit', end)
+        if proc.returncode != 0:
+            if not started:
+                # No memory op reached: port, programmer or board sync.
+                raise RuntimeError(f"Connection to {self.params['port']} failed:\n{parser.text()}")
+            raise RuntimeError(f"{label} failed:\n{parser.text()}")
+        for op in ops[flushed:]:
+            self.op_done(op)
+
+    def store_backup(self):
+        self.on_status("Store images")
+        base_dir = self.params['base_dir']
+        store = backup_store.BackupStore(
+            self.params.get('store_dir') or os.path.join(base_dir, backup_store.STORE_DIRNAME))
+        previous = backup_store.latest_backup(base_dir, exclude=self.backup_dir)
+        manifest = store.ingest(self.backup_dir, info={
+            'mcu': self.params['mcu'], 'prog': self.params['prog'], 'port': self.params['port'],
+            'board': self.params.get('board') or self.params['port'],
+            'resumed': self.resumed,
+        })
+        if previous:
+            prev = backup_store.read_manifest(previous)
+            if backup_store.fingerprint(prev) == backup_store.fingerprint(manifest):
+                self.on_status(f"Board unchanged since {os.path.basename(previous)}")
+
+    def update_catalog(self):
+        # sqlite3 and the catalog are only loaded once a backup is done.
+        import sqlite3
+        import catalog
+
+        try:
+            cat = catalog.Catalog(self.params['catalog'] if isinstance(self.params['catalog'], str) else None)
+            try:
+                cat.add(self.backup_dir, board=self.params.get('board') or self.params['port'])
+            finally:
+                cat.close()
+        except (sqlite3.Error, OSError, ValueError) as e:
+            # The backup itself is fine: a later catalog scan picks it up.
+            self.on_status(f"Catalog not updated: {e}")
+
+    def run_sessions(self, ops, done, total):
+        retries = self.params.get('retries', RETRIES) if self.checkpoint else 0
+        pending = ops
+        for attempt in range(retries + 1):
+            try:
+                for session in self.sessions(pending):
+                    if session:
+                        self.run_session(session, done, total)
+                        done += len(session)
+                return
+            except RuntimeError as e:
+                if attempt == retries:
+                    raise
+                pending = [op for op in ops if not self.checkpoint.is_done(op[1])]
+                done = total - len(pending)
+                lines = str(e).strip().splitlines()
+                reason = " ".join(lines[:1] + lines[1:][-1:])
+                self.on_status(f"{reason} - resuming from checkpoint ({attempt + 1}/{retries})")
+                time.sleep(RETRY_DELAY)
+
+    def run(self):
+        t0 = self.t0 = time.perf_counter()
+        with tempfile.TemporaryDirectory() as tmp:
+            done = 0
+            hash_verify = self.mode == 'restore' and self.params.get('verify') == 'hash'
+            if hash_verify:
+                # Skip avrdude's per-memory verify pass and check everything
+                # once at the end of the same session instead.
+                self.extra_args.append('-V')
+            if self.params.get('engine') == 'native' and not self.native():
+                self.on_status("Native engine needs an arduino/stk500v1/wiring programmer "
+                               "and a known MCU, using avrdude")
+            if self.mode in ('restore', 'verify'):
+                with self.timed('check'):
+                    self.check_fit()
+            differential = self.mode == 'restore' and self.params.get('differential')
+            if differential and self.params['prog'] not in BOOTLOADER_PROGS:
+                self.on_status("Differential restore needs a bootloader programmer, writing full images")
+                differential = False
+            if differential:
+                ops, done = self.plan_differential(tmp)
+            elif self.mode == 'verify':
+                ops = self.plan_verify(tmp)
+            else:
+                if self.mode == 'restore':
+                    done = self.read_device(tmp)
+                with self.timed('plan'):
+                    ops = self.plan(tmp)
+            if hash_verify:
+                ops += self.plan_verify(tmp, "Verify")
+            if self.mode == 'backup' and self.params.get('archive'):
+                self.archive = backup_archive.ArchiveWriter(self.backup_dir, {
+                    'format': 1, 'created': datetime.now().isoformat(timespec='seconds'),
+                    'mcu': self.params['mcu'], 'prog': self.params['prog'], 'port': self.params['port'],
+                    'board': self.params.get('board') or self.params['port'],
+                    'resumed': self.resumed,
+                })
+                for op in self.resumed_ops:
+                    self.archive_op(op)
+            total = done + len(ops)
+            try:
+                self.run_sessions(ops, done, total)
+            except BaseException:
+                if self.archive:
+                    self.archive.abort()
+                if self.checkpoint and not self.checkpoint.read_before():
+                    # Nothing read (port busy, board missing): leave no empty
+                    # abt_* folder behind for the next attempt to skip over.
+                    self.checkpoint.remove()
+                    if os.path.isdir(self.backup_dir) and not os.listdir(self.backup_dir):
+                        os.rmdir(self.backup_dir)
+                raise
+            if self.archive:
+                self.archive.close()
+            if self.checkpoint:
+                self.checkpoint.remove()
+
+            if self.mode == 'verify' or hash_verify:
+                with self.timed('compare'):
+                    self.compare_device(tmp)
+
+        if self.mode == 'backup' and self.params.get('store', True) and not self.archive:
+            with self.timed('store'):
+                self.store_backup()
+        if self.mode == 'backup' and self.params.get('catalog'):
+            with self.timed('catalog'):
+                self.update_catalog()
+
+        for line in self.report:
+            self.on_status(line)
+        self.on_status("Done")
+        self.on_progress(100)
+        return {
+            'mode': self.mode,
+            'port': self.params['port'],
+            'mcu': self.params['mcu'],
+            'backup_dir': self.backup_dir or self.params['base_dir'],
+            'report': self.report,
+            'elapsed': round(time.perf_counter() - t0, 3),
+            'phases': self.phases,
+            'resumed': self.resumed,
+        }
+
+def port_dirname(port):
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', port).strip('_') or 'port'
+
+
+class Fleet:
+    def __init__(self, mode, params, ports, jobs=4, on_progress=None, on_status=None,
+                 on_board_status=None, on_board_finished=None):
+        self.mode   = mode
+        self.params = params
+        self.ports  = list(ports)
+        self.jobs   = max(1, jobs)
+        self.on_progress       = on_progress or _ignore
+        self.on_status         = on_status or _ignore
+        self.on_board_status   = on_board_status or _ignore
+        self.on_board_finished = on_board_finished or _ignore
+        self.board_pct = {p: 0 for p in self.ports}
+        self.lock = threading.Lock()
+        self.summary = ''
+
+    def board_params(self, port):
+        params = dict(self.params, port=port)
+        # Per-port mcu/prog/baud found by auto-detection win over the combos.
+        params.update(self.params.get('board_settings', {}).get(port, {}))
+        if self.mode == 'backup':
+            # Every board gets its own folder so abt_* letters never collide.
+            params['base_dir'] = os.path.join(self.params['base_dir'], port_dirname(port))
+            params.setdefault('store_dir', os.path.join(self.params['base_dir'], backup_store.STORE_DIRNAME))
+            os.makedirs(params['base_dir'], exist_ok=True)
+        return params
+
+    def on_board_progress(self, port, pct):
+        with self.lock:
+            self.board_pct[port] = pct
+            overall = sum(self.board_pct.values()) // len(self.board_pct)
+        self.on_progress(overall)
+
+    def run_board(self, port):
+        result = {'port': port, 'ok': False, 'error': ''}
+        t0 = time.perf_counter()
+        try:
+            job = Job(self.mode, self.board_params(port),
+                      on_progress=lambda pct: self.on_board_progress(port, pct),
+                      on_status=lambda s: self.on_board_status(port, s))
+            result.update(job.run())
+            result['ok'] = True
+        except Exception as e:
+            result['error'] = str(e)
+        result['elapsed'] = round(time.perf_counter() - t0, 3)
+        self.on_board_progress(port, 100)
+        self.on_board_finished(port, result['ok'], result['error'])
+        return result
+
+    def run(self):
+        if not self.ports:
+            raise RuntimeError("No serial port available.")
+        self.on_status(f"{self.mode.capitalize()} on {len(self.ports)} board(s), {self.jobs} at a time")
+        t0 = time.perf_counter()
+        results = []
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            for res in pool.map(self.run_board, self.ports):
+                results.append(res)
+        elapsed = time.perf_counter() - t0
+
+        failed = [r for r in results if not r['ok']]
+        lines = [f"{len(results) - len(failed)}/{len(results)} board(s) OK in {elapsed:.1f}s"]
+        for r in results:
+            first = r['error'].strip().splitlines()[0] if r['error'].strip() else ""
+            lines.append(f"  {r['port']}: {'OK' if r['ok'] else 'FAILED'} ({r['elapsed']:.1f}s)"
+                         f"{' - ' + first if first else ''}")
+        self.summary = "\n".join(lines)
+
+        self.on_progress(100)
+        self.on_status(self.summary)
+        return results
+
+
+class MassProgram:
+    # One golden backup onto many boards. The backup is decoded once; each
+    # board is programmed without avrdude's verify pass, then verified
+    # against the golden bytes while the next board is programmed.
+    def __init__(self, params, ports, count=None, on_progress=None, on_status=None,
+                 on_unit=None):
+        self.params = params
+        self.ports  = ports
+        self.count  = count
+        self.on_progress = on_progress or _ignore
+        self.on_status   = on_status or _ignore
+        self.on_unit     = on_unit or _ignore
+        self.lock = threading.Lock()
+        self.results = []
+        self.summary = ''
+
+    def load_golden(self, tmp):
+        path = self.params['base_dir']
+        images, files = {}, {}
+        for name, _ in backup_store.IMAGES:
+            images[name] = bytes(backup_store.load_image(path, name))
+            files[name] = os.path.join(tmp, f"golden.{name}.bin")
+            with open(files[name], 'wb') as f:
+                f.write(images[name])
+        return {
+            'images': images, 'files': files,
+            'fuses': {fuse: value.strip() for fuse, value in backup_store.read_fuses(path).items()},
+        }
+
+    def board_params(self, port):
+        params = dict(self.params, port=port)
+        params.update(self.params.get('board_settings', {}).get(port, {}))
+        return params
+
+    def run_ops(self, job, ops):
+        done = 0
+        for session in job.sessions(ops):
+            job.run_session(session, done, len(ops))
+            done += len(session)
+
+    def program(self, port, golden):
+        job = Job('restore', self.board_params(port), on_status=lambda s: self.on_status(f"[{port}] {s}"))
+        for name, data in golden['images'].items():
+            size = job.memory_size(name)
+            if size and len(data) > size:
+                raise RuntimeError(f"{name} backup ({len(data)} bytes) does not fit in "
+                                   f"{job.params['mcu']} {name} ({size} bytes)")
+        # The read-back of verify() replaces avrdude's verify pass.
+        job.extra_args.append('-V')
+        ops = [(f"Write {name}", name, f"{name}:w:{path}:r") for name, path in golden['files'].items()]
+        if job.fuse_access():
+            # Fuses that differ from this board's, once checked against them.
+            with tempfile.TemporaryDirectory() as tmp:
+                job.read_device(tmp)
+            ops += job.fuse_writes()
+        self.run_ops(job, ops)
+        # False when the board answered 0x00: its fuses are not verified.
+        return bool(job.fuse_access() and job.device_fuses)
+
+    def verify(self, port, golden, fuse_access):
+        # avrdude (or the native engine) reads back only the golden bytes.
+        job = Job('verify', self.board_params(port), on_status=lambda s: self.on_status(f"[{port}] {s}"))
+        ops = [(f"Verify {name}", name, f"{name}:v:{path}:r") for name, path in golden['files'].items()]
+        if fuse_access:
+            ops += [(f"Verify {fuse}", fuse, f"{fuse}:v:{golden['fuses'][fuse]}:m")
+                    for fuse in job.fuse_names() if fuse in golden['fuses']]
+        self.run_ops(job, ops)
+
+    def finish(self, unit, error=None):
+        unit['ok'] = error is None
+        unit['error'] = error or ''
+        with self.lock:
+            self.results.append(unit)
+            finished = len(self.results)
+        if self.count:
+            self.on_progress(min(100, finished * 100 // self.count))
+        self.on_unit(unit)
+
+    def verify_unit(self, unit, golden, fuse_access):
+        start = time.perf_counter()
+        try:
+            self.verify(unit['port'], golden, fuse_access)
+            error = None
+        except Exception as e:
+            error = str(e)
+        unit['verify_s'] = round(time.perf_counter() - start, 3)
+        self.finish(unit, error)
+
+    def run(self):
+        t0 = time.perf_counter()
+        with tempfile.TemporaryDirectory() as tmp:
+            golden = self.load_golden(tmp)
+            self.on_status(f"Golden image {os.path.basename(self.params['base_dir'])}: "
+                           + ", ".join(f"{n} {len(d)} B" for n, d in golden['images'].items()))
+            # One verify at a time, overlapping the next board's programming.
+            with ThreadPoolExecutor(max_workers=1) as verifier:
+                for n, port in enumerate(self.ports, start=1):
+                    unit = {'unit': n, 'port': port}
+                    self.on_status(f"[{port}] unit {n}: programming")
+                    start = time.perf_counter()
+                    try:
+                        fuse_access = self.program(port, golden)
+                    except Exception as e:
+                        unit['program_s'] = round(time.perf_counter() - start, 3)
+                        self.finish(unit, str(e))
+                        continue
+                    unit['program_s'] = round(time.perf_counter() - start, 3)
+                    verifier.submit(self.verify_unit, unit, golden, fuse_access)
+        elapsed = time.perf_counter() - t0
+
+        results = sorted(self.results, key=lambda u: u['unit'])
+        passed = sum(1 for u in results if u['ok'])
+        rate = len(results) * 3600 / elapsed if elapsed else 0
+        lines = [f"{passed}/{len(results)} unit(s) passed in {elapsed:.1f}s ({rate:.0f} units/hour)"]
+        for u in results:
+            # "Verify flash failed:" and the avrdude line saying why.
+            error = u['error'].strip().splitlines()
+            reason = " ".join(error[:1] + error[1:][-1:])
+            lines.append(f"  #{u['unit']} {u['port']}: {'PASS' if u['ok'] else 'FAIL'}"
+                         f"{' - ' + reason if reason else ''}")
+        self.summary = "\n".join(lines)
+        self.on_progress(100)
+        self.on_status(self.summary)
+        return {'units': results, 'passed': passed, 'failed': len(results) - passed,
+                'elapsed': round(elapsed, 3), 'units_per_hour': round(rate, 1)}
@@ -0,0 +1,12 @@
+import os
+
+
+def user_dir(*parts):
+    base = os.environ.get('ABT_HOME') or os.path.join(os.path.expanduser('~'), '.arduino_backup_tool')
+    path = os.path.join(base, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def user_file(name):
+    return os.path.join(user_dir(), name)
@@ -1,111 +1,310 @@
 import sys
 import os
-import subprocess
-import serial.tools.list_ports
-from datetime import datetime
-from PyQt5.QtCore import QThread, pyqtSignal, Qt
-from PyQt5.QtGui import QMovie, QIcon
+import time
+import threading
+import abt_core
+import autodetect
+import avrdude_conf
+import console_log
+import port_watch
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5.QtCore import QThread, QTimer, pyqtSignal, Qt
+from PyQt5.QtGui import QIcon
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QVBoxLayout, QWidget, QLabel,
     QComboBox, QPushButton, QFileDialog, QMessageBox, QProgressBar,
-    QGroupBox, QHBoxLayout, QLineEdit, QPlainTextEdit
+    QGroupBox, QHBoxLayout, QLineEdit, QPlainTextEdit, QCheckBox,
+    QDialog, QTableWidget, QTableWidgetItem, QAbstractItemView, QHeaderView
 )
 
 class Worker(QThread):
+    progress_changed   = pyqtSignal(int)
+    status_changed     = pyqtSignal(str)
+    throughput_changed = pyqtSignal(float)
+    phase_done         = pyqtSignal(dict)
+    finished_ok        = pyqtSignal()
+    finished_err       = pyqtSignal(str)
+
+    def __init__(self, mode, params):
+        super().__init__()
+        self.mode   = mode
+        self.params = params
+        self.result = None
+
+    def run(self):
+        try:
+            job = abt_core.Job(
+                self.mode, self.params,
+                on_progress=self.progress_changed.emit,
+                on_status=self.status_changed.emit,
+                on_throughput=self.throughput_changed.emit,
+                on_phase=self.phase_done.emit
+            )
+            self.result = job.run()
+            self.finished_ok.emit()
+
+        except Exception as e:
+            self.finished_err.emit(str(e))
+
+
+class FleetWorker(QThread):
     progress_changed = pyqtSignal(int)
     status_changed   = pyqtSignal(str)
+    board_status     = pyqtSignal(str, str)
+    board_finished   = pyqtSignal(str, bool, str)
     finished_ok      = pyqtSignal()
     finished_err     = pyqtSignal(str)
 
-    def __init__(self, mode, params):
+    def __init__(self, mode, params, ports, jobs=4):
         super().__init__()
-        self.mode   = mode
-        self.params = params
+        self.fleet = abt_core.Fleet(
+            mode, params, ports, jobs,
+            on_progress=self.progress_changed.emit,
+            on_status=self.status_changed.emit,
+            on_board_status=self.board_status.emit,
+            on_board_finished=self.board_finished.emit
+        )
+        self.results = []
 
     def run(self):
         try:
-            tasks = []
-
-            if self.mode == 'backup':
-                base_dir = self.params['base_dir']
-                now = datetime.now()
-                prefix = f"abt_{now.strftime('%B').lower()}{now.day}"
-                existing = [d for d in os.listdir(base_dir) if d.startswith(prefix)]
-                letter = chr(ord('a') + len(existing))
-                backup_dir = os.path.join(base_dir, f"{prefix}{letter}")
-                os.makedirs(backup_dir, exist_ok=True)
-
-                for name, ext in [('flash','hex'), ('eeprom','eep')]:
-                    out = os.path.join(backup_dir, f"{name}.{ext}")
-                    cmd = [
-                        self.params['avrdude_path'], '-C', self.params['avrdude_conf_path'],
-                        '-p', self.params['mcu'], '-c', self.params['prog'],
-                        '-P', self.params['port'], '-b', self.params['baud'],
-                        '-U', f"{name}:r:{out}:i"
-                    ]
-                    tasks.append((f"Read {name}", cmd))
-
-                for fuse in ['lfuse','hfuse','efuse']:
-                    out = os.path.join(backup_dir, f"{fuse}.txt")
-                    cmd = [
-                        self.params['avrdude_path'], '-C', self.params['avrdude_conf_path'],
-                        '-p', self.params['mcu'], '-c', self.params['prog'],
-                        '-P', self.params['port'], '-b', self.params['baud'],
-                        '-U', f"{fuse}:r:{out}:h"
-                    ]
-                    tasks.append((f"Read {fuse}", cmd))
-
-            else:
-                base_dir = self.params['base_dir']
-                for name, ext in [('flash','hex'), ('eeprom','eep')]:
-                    inp = os.path.join(base_dir, f"{name}.{ext}")
-                    cmd = [
-                        self.params['avrdude_path'], '-C', self.params['avrdude_conf_path'],
-                        '-p', self.params['mcu'], '-c', self.params['prog'],
-                        '-P', self.params['port'], '-b', self.params['baud'],
-                        '-U', f"{name}:w:{inp}:i"
-                    ]
-                    tasks.append((f"Write {name}", cmd))
-
-                for fuse in ['lfuse','hfuse','efuse']:
-                    fname = os.path.join(base_dir, f"{fuse}.txt")
-                    with open(fname, 'r') as f:
-                        val = f.read().strip()
-                    cmd = [
-                        self.params['avrdude_path'], '-C', self.params['avrdude_conf_path'],
-                        '-p', self.params['mcu'], '-c', self.params['prog'],
-                        '-P', self.params['port'], '-b', self.params['baud'],
-                        '-U', f"{fuse}:w:{val}:m"
-                    ]
-                    tasks.append((f"Write {fuse}", cmd))
-
-            total = len(tasks)
-            for idx, (label, cmd) in enumerate(tasks, start=1):
-                pct = int((idx-1) * 100 / total)
-                self.status_changed.emit(label)
-                self.progress_changed.emit(pct)
-
-                startupinfo = None
-                creationflags = 0
-                if os.name == 'nt':
-                    startupinfo = subprocess.STARTUPINFO()
-                    startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                    creationflags = subprocess.CREATE_NO_WINDOW
-
-                proc = subprocess.run(
-                    cmd,
-                    capture_output=True, text=True,
-                    startupinfo=startupinfo, creationflags=creationflags
-                )
-                if proc.returncode != 0:
-                    raise RuntimeError(f"{label} failed:\n{proc.stderr}")
-
-            self.status_changed.emit("Done")
-            self.progress_changed.emit(100)
+            self.results = self.fleet.run()
+        except Exception as e:
+            self.finished_err.emit(str(e))
+            return
+        if all(r['ok'] for r in self.results):
             self.finished_ok.emit()
+        else:
+            self.finished_err.emit(self.fleet.summary)
+
+
+class MassWorker(QThread):
+    progress_changed = pyqtSignal(int)
+    status_changed   = pyqtSignal(str)
+    unit_done        = pyqtSignal(dict)
+    finished_ok      = pyqtSignal()
+    finished_err     = pyqtSignal(str)
+
+    def __init__(self, params, ports):
+        super().__init__()
+        self.mass = abt_core.MassProgram(
+            params, ports, len(ports),
+            on_progress=self.progress_changed.emit,
+            on_status=self.status_changed.emit,
+            on_unit=self.unit_done.emit
+        )
+        self.result = None
 
+    def run(self):
+        try:
+            self.result = self.mass.run()
         except Exception as e:
             self.finished_err.emit(str(e))
+            return
+        if self.result['failed']:
+            self.finished_err.emit(self.mass.summary)
+        else:
+            self.finished_ok.emit()
+
+
+class CheckWorker(QThread):
+    backup_checked = pyqtSignal(str, list)
+    status_changed = pyqtSignal(str)
+
+    def __init__(self, base_dir):
+        super().__init__()
+        self.base_dir = base_dir
+
+    def run(self):
+        t0 = time.perf_counter()
+        import integrity
+        results = integrity.check_tree(self.base_dir, on_result=self.backup_checked.emit)
+        bad = sum(1 for problems in results.values() if problems)
+        self.status_changed.emit(
+            f"{len(results) - bad}/{len(results)} backup(s) intact ({time.perf_counter() - t0:.2f}s)")
+
+
+class PortWatchWorker(QThread):
+    port_added   = pyqtSignal(dict)
+    port_removed = pyqtSignal(dict)
+    scan_failed  = pyqtSignal(str)
+
+    def run(self):
+        watcher = port_watch.PortWatcher()
+        while not self.isInterruptionRequested():
+            try:
+                added, removed = watcher.poll()
+            except Exception as e:
+                self.scan_failed.emit(str(e))
+                added, removed = [], []
+            for info in removed:
+                self.port_removed.emit(info)
+            for info in added:
+                self.port_added.emit(info)
+            self.msleep(int(port_watch.POLL_SECONDS * 1000))
+
+
+CONSOLE_BLOCKS = 5000
+LOG_FLUSH_MS   = 100
+
+MCUS = [
+    "atmega328p", "atmega168", "atmega2560", "attiny85",
+    "atmega32u4", "atmega1280", "attiny13", "atmega8"
+]
+PROGS = [
+    "arduino", "usbtiny", "avrisp", "usbasp",
+    "stk500v1", "stk500v2", "wiring"
+]
+
+
+class ScanWorker(QThread):
+    scanned = pyqtSignal(dict)
+
+    def __init__(self, base_dir):
+        super().__init__()
+        self.base_dir = base_dir
+        self.stop = threading.Event()
+
+    def run(self):
+        import catalog
+        cat = catalog.Catalog()
+        try:
+            result = cat.scan(self.base_dir, stop=self.stop)
+            if not self.stop.is_set():
+                self.scanned.emit(result)
+        finally:
+            cat.close()
+
+
+class BackupPicker(QDialog):
+    COLUMNS = [("Date", 'created'), ("Board", 'board'), ("MCU", 'mcu'),
+               ("Fuses", None), ("Flash", 'flash_sha256'), ("Backup", 'path')]
+
+    def __init__(self, parent, base_dir, archive_filter):
+        super().__init__(parent)
+        self.setWindowTitle("Select Backup")
+        self.resize(800, 450)
+        self.base_dir = base_dir
+        self.archive_filter = archive_filter
+        self.selected = None
+        import catalog
+        self.catalog = catalog.Catalog()
+
+        layout = QVBoxLayout()
+        self.search = QLineEdit()
+        self.search.setPlaceholderText("Search board, MCU, date, flash hash...")
+        layout.addWidget(self.search)
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels([c[0] for c in self.COLUMNS])
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.doubleClicked.connect(self.accept_row)
+        layout.addWidget(self.table)
+        row = QHBoxLayout()
+        self.count_lbl = QLabel("")
+        row.addWidget(self.count_lbl)
+        browse = QPushButton("Browse...")
+        browse.clicked.connect(self.browse)
+        row.addWidget(browse)
+        ok = QPushButton("Select")
+        ok.clicked.connect(self.accept_row)
+        row.addWidget(ok)
+        layout.addLayout(row)
+        self.setLayout(layout)
+
+        # Typing only queries the catalog once the user pauses.
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(150)
+        self.timer.timeout.connect(self.refresh)
+        self.search.textChanged.connect(lambda _: self.timer.start())
+        self.refresh()
+
+        self.scan = ScanWorker(base_dir)
+        self.scan.scanned.connect(lambda _: self.refresh())
+        self.scan.start()
+
+    def refresh(self):
+        rows = self.catalog.search(self.search.text())
+        self.rows = rows
+        self.table.setRowCount(len(rows))
+        for i, r in enumerate(rows):
+            for j, (_, key) in enumerate(self.COLUMNS):
+                if key is None:
+                    text = " ".join(r[f] for f in ('lfuse', 'hfuse', 'efuse'))
+                elif key == 'flash_sha256':
+                    text = f"{r[key][:12]} ({r['flash_size']} B)"
+                else:
+                    text = str(r[key])
+                self.table.setItem(i, j, QTableWidgetItem(text))
+        self.count_lbl.setText(f"{len(rows)} of {self.catalog.count()} backup(s)")
+
+    def accept_row(self):
+        i = self.table.currentRow()
+        if 0 <= i < len(self.rows):
+            self.selected = self.rows[i]['path']
+            self.accept()
+
+    def browse(self):
+        if self.archive_filter:
+            path, _ = QFileDialog.getOpenFileName(self, "Select Backup Archive", self.base_dir,
+                                                  "ABT archive (*.abt)")
+        else:
+            path = QFileDialog.getExistingDirectory(self, "Select Backup Folder", self.base_dir)
+        if path:
+            self.selected = path
+            self.accept()
+
+    def done(self, result):
+        # The scan stops after the backup it is reading, the GUI does not
+        # wait for the rest of the tree.
+        self.scan.stop.set()
+        self.scan.wait()
+        self.catalog.close()
+        super().done(result)
+
+
+class DetectWorker(QThread):
+    port_detected = pyqtSignal(str, str, str, str)
+
+    def __init__(self, avrdude_path, conf_path, ports, log, jobs=8):
+        super().__init__()
+        self.avrdude_path = avrdude_path
+        self.conf_path    = conf_path
+        self.ports        = list(ports)
+        self.log          = log
+        self.jobs         = jobs
+
+    def detect_port(self, port, key, cache):
+        # Straight into the log queue: avrdude output can be long and must
+        # not go through one queued signal per line.
+        log = lambda s: self.log(f"[{port}] {s}")
+        log("🔍 Auto-détection...")
+        try:
+            found = autodetect.detect(self.avrdude_path, self.conf_path, port, key, cache, log)
+        except Exception as e:
+            log(f"❌ Erreur : {e}")
+            return
+        if found:
+            mcu, prog, baud = found
+            log(f"✅ Détection réussie : {mcu}, {baud}, {prog}")
+            self.port_detected.emit(port, mcu, prog, baud)
+        else:
+            log("❌ Aucune combinaison valide détectée.")
+
+    def run(self):
+        try:
+            infos = port_watch.list_ports()
+        except Exception:
+            infos = {}
+        cache = autodetect.DetectCache()
+        with ThreadPoolExecutor(max_workers=max(1, min(self.jobs, len(self.ports)))) as pool:
+            for port in self.ports:
+                key = infos[port]['key'] if port in infos else port
+                pool.submit(self.detect_port, port, key, cache)
 
 
 class ArduinoBackupTool(QMainWindow):
@@ -126,8 +325,25 @@ class ArduinoBackupTool(QMainWindow):
         self.avrdude_path      = self.default_avrdude_path
         self.avrdude_conf_path = self.default_avrdude_conf_path
 
+        self.board_settings = {}
+        self.log_sink = console_log.LogSink()
+        self.worker = None
+        self.auto_queue = deque()
+        self.auto_job = False
+
         self.init_ui()
-        self.detect_serial_ports()
+        self.port_watcher = PortWatchWorker()
+        # Everything not needed to draw the window waits for the event loop.
+        QTimer.singleShot(0, self.after_show)
+
+    def after_show(self):
+        self.load_part_lists()
+        # Ports are listed by the watcher thread as they appear, starting
+        # with the ones already plugged in.
+        self.port_watcher.port_added.connect(self.on_port_added)
+        self.port_watcher.port_removed.connect(self.on_port_removed)
+        self.port_watcher.scan_failed.connect(lambda e: self.log(f"pyserial error: {e}"))
+        self.port_watcher.start()
 
     def init_ui(self):
         widget = QWidget()
@@ -171,10 +387,7 @@ class ArduinoBackupTool(QMainWindow):
         r = QHBoxLayout()
         r.addWidget(QLabel("MCU:"))
         self.mcu = QComboBox()
-        self.mcu.addItems([
-            "atmega328p", "atmega168", "atmega2560", "attiny85",
-            "atmega32u4", "atmega1280", "attiny13", "atmega8"
-        ])
+        self.mcu.addItems(MCUS)
         r.addWidget(self.mcu)
         bd_l.addLayout(r)
         # Baud
@@ -189,16 +402,49 @@ class ArduinoBackupTool(QMainWindow):
         r = QHBoxLayout()
         r.addWidget(QLabel("Programmer:"))
         self.prog = QComboBox()
-        self.prog.addItems([
-            "arduino", "usbtiny", "avrisp", "usbasp",
-            "stk500v1", "stk500v2", "wiring"
-        ])
+        self.prog.addItems(PROGS)
         r.addWidget(self.prog)
         bd_l.addLayout(r)
+        # Batch
+        self.batch_chk = QCheckBox("Single avrdude session (one reset per board)")
+        self.batch_chk.setChecked(True)
+        bd_l.addWidget(self.batch_chk)
+        # Engine
+        self.native_chk = QCheckBox("Native STK500 engine (arduino/wiring bootloaders, no avrdude)")
+        bd_l.addWidget(self.native_chk)
+        # Store
+        self.store_chk = QCheckBox("Deduplicated backup store (manifest + shared images)")
+        self.store_chk.setChecked(True)
+        bd_l.addWidget(self.store_chk)
+        # Archive
+        self.archive_chk = QCheckBox("Single-file compressed archive (.abt)")
+        bd_l.addWidget(self.archive_chk)
+        # Differential restore
+        self.diff_chk = QCheckBox("Differential restore (only changed pages, bootloader only)")
+        bd_l.addWidget(self.diff_chk)
+        # Verify
+        self.hash_verify_chk = QCheckBox("Read-back verify at the end (image bytes only, one pass)")
+        bd_l.addWidget(self.hash_verify_chk)
+        # Fuses
+        self.unsafe_fuses_chk = QCheckBox("Allow fuses that lock out ISP/reset (SPIEN, RSTDISBL, DWEN)")
+        bd_l.addWidget(self.unsafe_fuses_chk)
+        # Fleet
+        r = QHBoxLayout()
+        self.fleet_chk = QCheckBox("Fleet mode (all detected ports)")
+        r.addWidget(self.fleet_chk)
+        r.addWidget(QLabel("Parallel:"))
+        self.jobs = QComboBox()
+        self.jobs.addItems(["1", "2", "4", "8", "16"])
+        self.jobs.setCurrentText("4")
+        r.addWidget(self.jobs)
+        bd_l.addLayout(r)
+        # Hot-plug
+        self.auto_chk = QCheckBox("Back up known boards when plugged in (to ./backup)")
+        bd_l.addWidget(self.auto_chk)
         # Auto-detect button
-        autodetect_btn = QPushButton("Auto-détecter")
-        autodetect_btn.clicked.connect(self.autodetect_board)
-        bd_l.addWidget(autodetect_btn)
+        self.autodetect_btn = QPushButton("Auto-détecter")
+        self.autodetect_btn.clicked.connect(self.autodetect_board)
+        bd_l.addWidget(self.autodetect_btn)
 
         bd.setLayout(bd_l)
         layout.addWidget(bd)
@@ -210,11 +456,15 @@ class ArduinoBackupTool(QMainWindow):
         self.spinner_lbl = QLabel()
         self.spinner_lbl.setAlignment(Qt.AlignCenter)
         self.spinner_lbl.setVisible(False)
-        self.spinner     = QMovie(os.path.join(self.base_path, "loader.gif"))
-        self.spinner_lbl.setMovie(self.spinner)
+        self.spinner     = None
+
+        self.rate_lbl    = QLabel("")
+        prog_row = QHBoxLayout()
+        prog_row.addWidget(self.progress)
+        prog_row.addWidget(self.rate_lbl)
 
         layout.addWidget(self.status_lbl)
-        layout.addWidget(self.progress)
+        layout.addLayout(prog_row)
         layout.addWidget(self.spinner_lbl)
 
         # Actions
@@ -224,101 +474,245 @@ class ArduinoBackupTool(QMainWindow):
         bkup.clicked.connect(self.start_backup)
         rst  = QPushButton("Restore All")
         rst.clicked.connect(self.start_restore)
+        vfy  = QPushButton("Verify")
+        vfy.clicked.connect(self.start_verify)
         al.addWidget(bkup)
         al.addWidget(rst)
+        chk  = QPushButton("Check Backups")
+        chk.clicked.connect(self.start_check)
+        cmp  = QPushButton("Compare")
+        cmp.clicked.connect(self.start_compare)
+        mass = QPushButton("Mass Program")
+        mass.clicked.connect(self.start_mass_program)
+        al.addWidget(vfy)
+        al.addWidget(mass)
+        al.addWidget(cmp)
+        al.addWidget(chk)
         act.setLayout(al)
         layout.addWidget(act)
 
         # Console
         self.console = QPlainTextEdit()
         self.console.setReadOnly(True)
+        self.console.setMaximumBlockCount(CONSOLE_BLOCKS)
         layout.addWidget(self.console)
+        self.log_timer = QTimer(self)
+        self.log_timer.setInterval(LOG_FLUSH_MS)
+        self.log_timer.timeout.connect(self.flush_log)
+        self.log_timer.start()
 
         widget.setLayout(layout)
         self.setCentralWidget(widget)
 
     def autodetect_board(self):
-        port = self.port_combo.currentText()
-        if not port:
+        if self.fleet_chk.isChecked():
+            ports = [self.port_combo.itemText(i) for i in range(self.port_combo.count())]
+        else:
+            ports = [self.port_combo.currentText()] if self.port_combo.currentText() else []
+        if not ports:
             self.log("Aucun port COM sélectionné.")
             return
 
-        self.log(f"🔍 Auto-détection sur {port}...")
-
-        test_list = [
-            ("atmega328p", "arduino", "115200"),  # priorité
-            ("atmega328p", "arduino", "57600"),
-            ("atmega328p", "wiring", "57600"),
-            ("atmega2560", "arduino", "115200"),
-            ("atmega2560", "stk500v1", "57600"),
-        ]
-
-        for mcu, prog, baud in test_list:
-            cmd = [
-                self.avrdude_path, "-C", self.avrdude_conf_path,
-                "-v", "-p", mcu, "-c", prog, "-P", port, "-b", baud
-            ]
-            self.log(f"➡️ Test : MCU={mcu}, Baud={baud}, Prog={prog}")
-            try:
-                proc = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
-                output = proc.stdout + proc.stderr
-                if "Device signature" in output:
-                    self.log(f"✅ Détection réussie : {mcu}, {baud}, {prog}")
-                    self.mcu.setCurrentText(mcu)
-                    self.baud.setCurrentText(baud)
-                    self.prog.setCurrentText(prog)
-                    return
-                else:
-                    self.log("⚠️ Pas de signature détectée.")
-                    self.log("…stdout:\n" + proc.stdout)
-                    self.log("…stderr:\n" + proc.stderr)
-            except subprocess.TimeoutExpired:
-                self.log("⏳ Temps dépassé pour cette combinaison.")
-            except Exception as e:
-                self.log(f"❌ Erreur : {e}")
+        self.autodetect_btn.setEnabled(False)
+        self.detect_worker = DetectWorker(self.avrdude_path, self.avrdude_conf_path, ports, self.log)
+        self.detect_worker.port_detected.connect(self.on_port_detected)
+        self.detect_worker.finished.connect(lambda: self.autodetect_btn.setEnabled(True))
+        self.detect_worker.start()
 
-        self.log("❌ Aucune combinaison valide détectée.")
+    def on_port_detected(self, port, mcu, prog, baud):
+        self.board_settings[port] = {'mcu': mcu, 'prog': prog, 'baud': baud}
+        if port == self.port_combo.currentText():
+            self.mcu.setCurrentText(mcu)
+            self.baud.setCurrentText(baud)
+            self.prog.setCurrentText(prog)
 
     def browse_file(self, attr, filt):
         p, _ = QFileDialog.getOpenFileName(self, f"Select {attr}", "", filt)
         if p:
             setattr(self, attr, p)
             getattr(self, f"{attr}_edit").setText(p)
+            if attr == 'avrdude_conf_path':
+                self.load_part_lists()
 
     def reset_path(self, attr):
         default = getattr(self, f"default_{attr}")
         setattr(self, attr, default)
         getattr(self, f"{attr}_edit").setText(default)
         self.log(f"{attr} reset to default.")
+        if attr == 'avrdude_conf_path':
+            self.load_part_lists()
+
+    def load_part_lists(self):
+        # Every part and programmer of avrdude.conf, the usual ones first.
+        try:
+            index = avrdude_conf.load(self.avrdude_conf_path)
+        except OSError as e:
+            self.log(f"avrdude.conf: {e}")
+            return
+        for combo, common, names in [
+            (self.mcu, MCUS, index['parts']),
+            (self.prog, PROGS, index['programmers'])
+        ]:
+            current = combo.currentText()
+            combo.clear()
+            combo.addItems(common + sorted(n for n in names if n not in common))
+            combo.setCurrentText(current)
 
     def log(self, txt):
-        self.console.appendPlainText(txt)
+        # Safe from any thread: queued, shown by flush_log.
+        self.log_sink.put(txt)
+
+    def flush_log(self):
+        lines = self.log_sink.drain()
+        if lines:
+            self.console.appendPlainText("\n".join(lines))
+
+    def closeEvent(self, event):
+        self.port_watcher.requestInterruption()
+        self.port_watcher.wait()
+        self.flush_log()
+        self.log_sink.close()
+        super().closeEvent(event)
 
     def detect_serial_ports(self):
         self.port_combo.clear()
         try:
-            ports = [p.device for p in serial.tools.list_ports.comports()]
+            ports = list(port_watch.list_ports())
         except Exception as e:
             self.log(f"pyserial error: {e}")
             ports = []
         self.port_combo.addItems(ports)
         self.log(f"Detected ports: {ports}")
 
+    def on_port_added(self, info):
+        if self.port_combo.findText(info['device']) < 0:
+            self.port_combo.addItem(info['device'])
+        self.log(f"Port plugged in: {port_watch.label(info)}")
+        if not self.auto_chk.isChecked():
+            return
+        # Known: auto-detected in this session or earlier (detect cache).
+        settings = self.board_settings.get(info['device'])
+        if settings is None:
+            found = autodetect.DetectCache().get(info['key'])
+            if found:
+                settings = dict(zip(('mcu', 'prog', 'baud'), found))
+        if settings is None:
+            self.log(f"[{info['device']}] unknown board, run Auto-détecter once to enable automatic backups")
+            return
+        self.board_settings[info['device']] = settings
+        if info['device'] not in self.auto_queue:
+            self.auto_queue.append(info['device'])
+        self.start_queued_backup()
+
+    def on_port_removed(self, info):
+        i = self.port_combo.findText(info['device'])
+        if i >= 0:
+            self.port_combo.removeItem(i)
+        if info['device'] in self.auto_queue:
+            self.auto_queue.remove(info['device'])
+        self.log(f"Port removed: {port_watch.label(info)}")
+
+    def start_queued_backup(self):
+        if not self.auto_queue or (self.worker is not None and self.worker.isRunning()):
+            return
+        port = self.auto_queue.popleft()
+        settings = self.board_settings[port]
+        self.port_combo.setCurrentText(port)
+        self.mcu.setCurrentText(settings['mcu'])
+        self.prog.setCurrentText(settings['prog'])
+        self.baud.setCurrentText(settings['baud'])
+        folder = os.path.abspath("backup")
+        os.makedirs(folder, exist_ok=True)
+        self.log(f"[{port}] automatic backup to {folder}")
+        self.run_worker('backup', folder, auto=True)
+
     def start_backup(self):
         folder = QFileDialog.getExistingDirectory(self, "Select Save Location", os.path.abspath("backup"))
         if folder:
             self.run_worker('backup', folder)
 
+    def select_backup(self):
+        picker = BackupPicker(self, os.path.abspath("backup"), self.archive_chk.isChecked())
+        picker.exec_()
+        return picker.selected
+
     def start_restore(self):
-        folder = QFileDialog.getExistingDirectory(self, "Select Backup Folder", os.path.abspath("backup"))
+        folder = self.select_backup()
         if folder:
             self.run_worker('restore', folder)
 
-    def run_worker(self, mode, folder):
+    def start_verify(self):
+        folder = self.select_backup()
+        if folder:
+            self.run_worker('verify', folder)
+
+    def start_mass_program(self):
+        # Every listed port gets the same golden backup, decoded once.
+        ports = [self.port_combo.itemText(i) for i in range(self.port_combo.count())]
+        if not ports:
+            self.log("Aucun port COM sélectionné.")
+            return
+        golden = self.select_backup()
+        if not golden:
+            return
         for w in self.findChildren(QPushButton):
             w.setEnabled(False)
-        self.spinner_lbl.setVisible(True)
-        self.spinner.start()
+        self.start_spinner()
+        params = {
+            'avrdude_path': self.avrdude_path,
+            'avrdude_conf_path': self.avrdude_conf_path,
+            'mcu': self.mcu.currentText(),
+            'prog': self.prog.currentText(),
+            'baud': self.baud.currentText(),
+            'batch': self.batch_chk.isChecked(),
+            'engine': 'native' if self.native_chk.isChecked() else 'avrdude',
+            'unsafe_fuses': self.unsafe_fuses_chk.isChecked(),
+            'board_settings': dict(self.board_settings),
+            'base_dir': golden
+        }
+        self.auto_job = False
+        self.worker = MassWorker(params, ports)
+        self.worker.unit_done.connect(
+            lambda u: self.log(f"#{u['unit']} [{u['port']}] {'PASS' if u['ok'] else 'FAIL: ' + u['error']}"))
+        self.worker.progress_changed.connect(self.progress.setValue)
+        self.worker.status_changed.connect(lambda s: (self.status_lbl.setText(s.splitlines()[0]), self.log(s)))
+        self.worker.finished_ok.connect(self.on_finished_ok)
+        self.worker.finished_err.connect(self.on_finished_err)
+        self.worker.start()
+
+    def start_compare(self):
+        a = self.select_backup()
+        if not a:
+            return
+        b = self.select_backup()
+        if not b:
+            return
+        import image_diff
+        try:
+            self.log(image_diff.format_report(image_diff.diff_backups(a, b)))
+        except (OSError, ValueError, KeyError) as e:
+            self.log(f"Compare failed: {e}")
+
+    def start_check(self):
+        folder = QFileDialog.getExistingDirectory(self, "Select Backup Tree", os.path.abspath("backup"))
+        if not folder:
+            return
+        for w in self.findChildren(QPushButton):
+            w.setEnabled(False)
+        self.log(f"Checking backups under {folder}...")
+        self.worker = CheckWorker(folder)
+        self.worker.backup_checked.connect(
+            lambda path, problems: self.log(f"{'✅' if not problems else '❌'} {path}"
+                                            + "".join(f"\n    {p}" for p in problems)))
+        self.worker.status_changed.connect(lambda s: (self.status_lbl.setText(s), self.log(s)))
+        self.worker.finished.connect(self.reset_ui)
+        self.worker.start()
+
+    def run_worker(self, mode, folder, auto=False):
+        self.auto_job = auto
+        for w in self.findChildren(QPushButton):
+            w.setEnabled(False)
+        self.start_spinner()
         params = {
             'avrdude_path': self.avrdude_path,
             'avrdude_conf_path': self.avrdude_conf_path,
@@ -326,34 +720,74 @@ class ArduinoBackupTool(QMainWindow):
             'prog': self.prog.currentText(),
             'port': self.port_combo.currentText(),
             'baud': self.baud.currentText(),
+            'batch': self.batch_chk.isChecked(),
+            'engine': 'native' if self.native_chk.isChecked() else 'avrdude',
+            'store': self.store_chk.isChecked(),
+            'archive': self.archive_chk.isChecked(),
+            'catalog': True,
+            'differential': self.diff_chk.isChecked(),
+            'verify': 'hash' if self.hash_verify_chk.isChecked() else 'avrdude',
+            'unsafe_fuses': self.unsafe_fuses_chk.isChecked(),
+            'board_settings': dict(self.board_settings),
             'base_dir': folder
         }
-        self.worker = Worker(mode, params)
+        if self.fleet_chk.isChecked() and not auto:
+            ports = [self.port_combo.itemText(i) for i in range(self.port_combo.count())]
+            self.worker = FleetWorker(mode, params, ports, int(self.jobs.currentText()))
+            self.worker.board_status.connect(lambda p, s: self.log(f"[{p}] {s}"))
+            self.worker.board_finished.connect(
+                lambda p, ok, e: self.log(f"[{p}] OK" if ok else f"[{p}] Error: {e}"))
+        else:
+            self.worker = Worker(mode, params)
+            self.worker.throughput_changed.connect(
+                lambda bps: self.rate_lbl.setText(f"{bps / 1024:.1f} kB/s"))
+            self.worker.phase_done.connect(self.log_phase)
         self.worker.progress_changed.connect(self.progress.setValue)
         self.worker.status_changed.connect(lambda s: (self.status_lbl.setText(s), self.log(s)))
         self.worker.finished_ok.connect(self.on_finished_ok)
         self.worker.finished_err.connect(self.on_finished_err)
         self.worker.start()
 
-    def on_finished_ok(self):
-        self.spinner.stop()
+    def start_spinner(self):
+        # The GIF is decoded on first use, not while the window opens.
+        if self.spinner is None:
+            from PyQt5.QtGui import QMovie
+            self.spinner = QMovie(os.path.join(self.base_path, "loader.gif"))
+            self.spinner_lbl.setMovie(self.spinner)
+        self.spinner_lbl.setVisible(True)
+        self.spinner.start()
+
+    def stop_spinner(self):
+        if self.spinner is not None:
+            self.spinner.stop()
         self.spinner_lbl.setVisible(False)
+
+    def log_phase(self, event):
+        label = event.get('op') or event['phase']
+        self.log(f"Timing: {label} {event['elapsed']:.2f} s (at {event['start']:.2f} s)")
+
+    def on_finished_ok(self):
+        self.stop_spinner()
         self.log("Operation successful.")
-        QMessageBox.information(self, "OK", "Operation completed.")
+        if not self.auto_job:
+            QMessageBox.information(self, "OK", "Operation completed.")
         self.reset_ui()
 
     def on_finished_err(self, err):
-        self.spinner.stop()
-        self.spinner_lbl.setVisible(False)
+        self.stop_spinner()
         self.log(f"Error: {err}")
-        QMessageBox.critical(self, "Error", err)
+        if not self.auto_job:
+            QMessageBox.critical(self, "Error", err)
         self.reset_ui()
 
     def reset_ui(self):
         for w in self.findChildren(QPushButton):
             w.setEnabled(True)
         self.status_lbl.setText("Ready")
+        self.rate_lbl.setText("")
         self.progress.setValue(0)
+        # Boards plugged in meanwhile wait for the running job.
+        QTimer.singleShot(0, self.start_queued_backup)
 
 
 if __name__ == '__main__':
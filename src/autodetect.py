@@ -0,0 +1,134 @@
+import os
+import re
+import json
+import subprocess
+import threading
+
+import app_paths
+import avrdude_conf
+
+TEST_LIST = [
+    ("atmega328p", "arduino", "115200"),  # priorité
+    ("atmega328p", "arduino", "57600"),
+    ("atmega328p", "wiring", "57600"),
+    ("atmega2560", "arduino", "115200"),
+    ("atmega2560", "stk500v1", "57600"),
+]
+
+SIGNATURES = {
+    '1e950f': 'atmega328p',
+    '1e9406': 'atmega168',
+    '1e9801': 'atmega2560',
+    '1e930b': 'attiny85',
+    '1e9587': 'atmega32u4',
+    '1e9703': 'atmega1280',
+    '1e9007': 'attiny13',
+    '1e9307': 'atmega8',
+}
+
+SIGNATURE_RE = re.compile(r"Device signature = 0x([0-9a-fA-F]{6})")
+PROBE_TIMEOUT = 4
+
+
+def port_key(info):
+    vid = getattr(info, 'vid', None)
+    pid = getattr(info, 'pid', None)
+    serial_number = getattr(info, 'serial_number', None)
+    if vid is not None and pid is not None:
+        usb = f"{vid:04x}:{pid:04x}"
+        # Without a serial number (most CH340 clones) the port name is the
+        # only thing telling two identical adapters apart.
+        return f"{usb}:{serial_number}" if serial_number else f"{usb}@{info.device}"
+    return info.device
+
+
+class DetectCache:
+    def __init__(self, path=None):
+        self.path = path or app_paths.user_file('detect_cache.json')
+        self.lock = threading.Lock()
+        try:
+            with open(self.path, 'r') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        return (entry['mcu'], entry['prog'], entry['baud']) if entry else None
+
+    def save(self):
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(self.path + '.tmp', self.path)
+
+    def put(self, key, mcu, prog, baud):
+        with self.lock:
+            self.entries[key] = {'mcu': mcu, 'prog': prog, 'baud': baud}
+            self.save()
+
+    def forget(self, key):
+        with self.lock:
+            if self.entries.pop(key, None):
+                self.save()
+
+
+def probe(avrdude_path, conf_path, port, mcu, prog, baud, timeout=PROBE_TIMEOUT):
+    # No -U and no -v: avrdude only syncs with the board and reads the
+    # signature, which is the shortest exchange it can do.
+    cmd = [avrdude_path, "-C", conf_path, "-p", mcu, "-c", prog, "-P", port, "-b", baud]
+    startupinfo = None
+    creationflags = 0
+    if os.name == 'nt':
+        startupinfo = subprocess.STARTUPINFO()
+        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        creationflags = subprocess.CREATE_NO_WINDOW
+    try:
+        proc = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout,
+                              startupinfo=startupinfo, creationflags=creationflags)
+    except subprocess.TimeoutExpired:
+        return None, "timeout"
+    output = proc.stdout + proc.stderr
+    m = SIGNATURE_RE.search(output)
+    if not m or m.group(1).lower() in ('000000', 'ffffff'):
+        return None, output
+    # A wrong -p still yields the real signature: map it to the part.
+    return part_for_signature(conf_path, m.group(1).lower()) or mcu, output
+
+
+def part_for_signature(conf_path, signature):
+    if signature in SIGNATURES:
+        return SIGNATURES[signature]
+    try:
+        return avrdude_conf.part_by_signature(avrdude_conf.load(conf_path), signature)
+    except OSError:
+        return None
+
+
+def detect(avrdude_path, conf_path, port, key=None, cache=None, log=None,
+           tests=TEST_LIST, timeout=PROBE_TIMEOUT, stop=None):
+    log = log or (lambda s: None)
+    candidates = list(tests)
+    cached = cache.get(key) if cache and key else None
+    if cached:
+        candidates = [cached] + [c for c in candidates if c != cached]
+
+    for mcu, prog, baud in candidates:
+        if stop is not None and stop.is_set():
+            return None
+        log(f"➡️ Test : MCU={mcu}, Baud={baud}, Prog={prog}" + (" (cache)" if (mcu, prog, baud) == cached else ""))
+        found, output = probe(avrdude_path, conf_path, port, mcu, prog, baud, timeout)
+        if found:
+            if cache and key:
+                cache.put(key, found, prog, baud)
+            return found, prog, baud
+        if output == "timeout":
+            log("⏳ Temps dépassé pour cette combinaison.")
+            continue
+        lines = [l for l in output.strip().splitlines() if l.strip()]
+        log("⚠️ Pas de signature détectée." + (f" ({lines[-1].strip()})" if lines else ""))
+        if "can't open device" in output:
+            # The port itself is gone or busy: no other combination will do.
+            break
+    if cache and key and cached:
+        cache.forget(key)
+    return None
@@ -0,0 +1,202 @@
+import os
+import re
+import json
+import copy
+import hashlib
+import threading
+
+import app_paths
+
+# Compact index of avrdude.conf: parts (signature, memory/page sizes) and
+# programmers, cached in the user folder and rebuilt when the file changes.
+INDEX_VERSION = 1
+TOKEN_RE = re.compile(r'"[^"]*"|#[^\n]*|/\*.*?\*/|[=;,]|[^\s=;,"#]+', re.DOTALL)
+
+_memo = {}
+_lock = threading.Lock()
+
+
+def tokens(text):
+    for m in TOKEN_RE.finditer(text):
+        tok = m.group(0)
+        if tok[0] != '#' and not tok.startswith('/*'):
+            yield tok
+
+
+def unquote(tok):
+    return tok[1:-1] if tok[:1] == '"' else tok
+
+
+def to_int(tok, default=None):
+    try:
+        return int(tok, 0)
+    except ValueError:
+        return default
+
+
+def parse(text):
+    parts = {}
+    programmers = {}
+    order = []
+    stack = []
+    toks = tokens(text)
+    for tok in toks:
+        if tok in ('part', 'programmer') and not stack:
+            entry = {'kind': tok, 'fields': {}, 'memories': {}}
+            stack.append(entry)
+            continue
+        if tok == 'parent' and len(stack) == 1:
+            parent = unquote(next(toks))
+            known = parts if stack[0]['kind'] == 'part' else programmers
+            if parent in known:
+                stack[0]['fields'] = copy.deepcopy(known[parent]['fields'])
+                stack[0]['memories'] = copy.deepcopy(known[parent]['memories'])
+            continue
+        if tok == 'memory' and len(stack) == 1:
+            name = unquote(next(toks))
+            stack.append(stack[0]['memories'].setdefault(name, {}))
+            continue
+        if tok == ';':
+            entry = stack.pop() if stack else None
+            if entry is not None and not stack:
+                ids = entry['fields'].get('id', [])
+                known = parts if entry['kind'] == 'part' else programmers
+                for ident in ids:
+                    known[ident] = entry
+                if entry['kind'] == 'part' and ids:
+                    order.append(ids[0])
+            continue
+        # key = value [, value ...] ;
+        if next(toks, None) != '=':
+            continue
+        values = []
+        for value in toks:
+            if value == ';':
+                break
+            if value != ',':
+                values.append(unquote(value))
+        target = stack[-1] if stack else None
+        if target is None:
+            continue
+        fields = target['fields'] if len(stack) == 1 else target
+        fields[tok] = values
+    return parts, programmers, order
+
+
+def compile_index(text):
+    parts, programmers, order = parse(text)
+    index = {'parts': {}, 'programmers': {}}
+    for ident in order:
+        if ident.startswith('.'):
+            # Templates (".xmega", ".reduced_core_tiny") only serve as parents.
+            continue
+        entry = parts[ident]
+        desc = entry['fields'].get('desc', [ident])[0]
+        if ' ' in desc:
+            # "deprecated, use 'uc3a0512'": not usable as a -p name.
+            desc = ident
+        if desc.lower() in index['parts']:
+            continue
+        sig = entry['fields'].get('signature', [])
+        memories = {}
+        for name, mem in entry['memories'].items():
+            size = to_int(mem.get('size', ['0'])[0], 0)
+            if size:
+                memories[name] = [size, to_int(mem.get('page_size', ['0'])[0], 0)]
+        index['parts'][desc.lower()] = {
+            'id': ident,
+            'desc': desc,
+            'signature': ''.join(f"{to_int(b, 0):02x}" for b in sig),
+            'memories': memories,
+        }
+    for ident, entry in programmers.items():
+        index['programmers'][ident] = {
+            'desc': entry['fields'].get('desc', [''])[0],
+            'type': entry['fields'].get('type', [''])[0],
+        }
+    return index
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def cache_path(conf_path):
+    key = hashlib.sha1(os.path.abspath(conf_path).encode()).hexdigest()[:12]
+    return os.path.join(app_paths.user_dir('conf_index'), f"{key}.json")
+
+
+def load(conf_path, cache=True):
+    st = os.stat(conf_path)
+    stamp = (os.path.abspath(conf_path), st.st_mtime_ns, st.st_size)
+    with _lock:
+        if stamp in _memo:
+            return _memo[stamp]
+        cached = None
+        if cache:
+            try:
+                with open(cache_path(conf_path), 'r') as f:
+                    cached = json.load(f)
+            except (OSError, ValueError):
+                cached = None
+        if cached and cached.get('version') != INDEX_VERSION:
+            cached = None
+        index = None
+        if cached and (cached['mtime_ns'], cached['size']) == (st.st_mtime_ns, st.st_size):
+            index = cached['index']
+        else:
+            # A touched but identical file keeps its index.
+            digest = file_sha256(conf_path)
+            if cached and cached['sha256'] == digest:
+                index = cached['index']
+            else:
+                with open(conf_path, 'r', errors='replace') as f:
+                    index = compile_index(f.read())
+            if cache:
+                save(conf_path, {'version': INDEX_VERSION, 'mtime_ns': st.st_mtime_ns,
+                                 'size': st.st_size, 'sha256': digest, 'index': index})
+        _memo[stamp] = index
+        return index
+
+
+def save(conf_path, entry):
+    path = cache_path(conf_path)
+    try:
+        with open(path + '.tmp', 'w') as f:
+            json.dump(entry, f)
+        os.replace(path + '.tmp', path)
+    except OSError:
+        pass
+
+
+def find_part(index, name):
+    # avrdude accepts -p by id (m328p) or description (ATmega328P).
+    name = name.lower()
+    if name in index['parts']:
+        return index['parts'][name]
+    for part in index['parts'].values():
+        if part['id'].lower() == name:
+            return part
+    return None
+
+
+def part_by_signature(index, signature):
+    signature = signature.lower()
+    for name, part in index['parts'].items():
+        if part['signature'] == signature:
+            return name
+    return None
+
+
+def memory_sizes(part):
+    # (flash size, eeprom size, flash page, eeprom page), as MEMORY_SIZES.
+    if not part or 'flash' not in part['memories']:
+        return None
+    flash = part['memories']['flash']
+    eeprom = part['memories'].get('eeprom', [0, 0])
+    return flash[0], eeprom[0], flash[1] or 1, eeprom[1] or 1
+
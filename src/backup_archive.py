@@ -0,0 +1,108 @@
+import os
+import json
+import struct
+import zlib
+
+# Single-file backup: a header, then one section per image or fuse appended
+# as soon as it has been read from the board, then an end marker. Every
+# section carries its raw size and CRC32; images are deflate-compressed.
+EXT     = '.abt'
+MAGIC   = b'ABTA\x01'
+SECTION = struct.Struct('<BIII')  # codec, raw size, stored size, crc32
+RAW, DEFLATE = 0, 1
+END = 'end'
+
+
+def is_archive(path):
+    return path.endswith(EXT) and os.path.isfile(path)
+
+
+class ArchiveWriter:
+    def __init__(self, path, meta, level=9):
+        self.path  = path
+        self.level = level
+        self.f = open(path + '.part', 'wb')
+        self.f.write(MAGIC)
+        self.add('meta', json.dumps(meta).encode())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def add(self, name, data):
+        data = bytes(data)
+        stored, codec = zlib.compress(data, self.level), DEFLATE
+        if len(stored) >= len(data):
+            stored, codec = data, RAW
+        key = name.encode()
+        self.f.write(bytes([len(key)]) + key
+                     + SECTION.pack(codec, len(data), len(stored), zlib.crc32(data) & 0xffffffff))
+        self.f.write(stored)
+        self.f.flush()
+
+    def add_image(self, name, data):
+        self.add(f"image/{name}", data)
+
+    def add_fuse(self, name, value):
+        self.add(f"fuse/{name}", value.strip().encode())
+
+    def close(self):
+        # The archive only gets its final name once complete.
+        self.add(END, b'')
+        self.f.close()
+        os.replace(self.path + '.part', self.path)
+
+    def abort(self):
+        self.f.close()
+        try:
+            os.remove(self.path + '.part')
+        except OSError:
+            pass
+
+
+def read_sections(path):
+    with open(path, 'rb') as f:
+        blob = memoryview(f.read())
+    if bytes(blob[:len(MAGIC)]) != MAGIC:
+        raise ValueError(f"{path}: not an ABT archive")
+    sections = {}
+    pos = len(MAGIC)
+    while pos < len(blob):
+        n = blob[pos]
+        name = bytes(blob[pos + 1:pos + 1 + n]).decode()
+        pos += 1 + n
+        if pos + SECTION.size > len(blob):
+            break
+        codec, size, stored, crc = SECTION.unpack_from(blob, pos)
+        pos += SECTION.size
+        payload = blob[pos:pos + stored]
+        pos += stored
+        if len(payload) != stored:
+            break
+        try:
+            data = zlib.decompress(payload) if codec == DEFLATE else bytes(payload)
+        except zlib.error as e:
+            raise ValueError(f"{path}: {name}: {e}")
+        if len(data) != size or zlib.crc32(data) & 0xffffffff != crc:
+            raise ValueError(f"{path}: {name}: bad size or checksum")
+        if name == END:
+            return sections
+        sections[name] = data
+    raise ValueError(f"{path}: truncated archive")
+
+
+def load(path):
+    sections = read_sections(path)
+    backup = {'meta': json.loads(sections.pop('meta', b'{}')), 'images': {}, 'fuses': {}}
+    for name, data in sections.items():
+        kind, _, key = name.partition('/')
+        if kind == 'image':
+            backup['images'][key] = data
+        elif kind == 'fuse':
+            backup['fuses'][key] = data.decode()
+    return backup
@@ -0,0 +1,223 @@
+import sys
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import zlib
+from datetime import datetime
+
+import backup_archive
+import ihex
+
+STORE_DIRNAME = '.abt_store'
+MANIFEST_NAME = 'manifest.json'
+IMAGES = [('flash', 'hex'), ('eeprom', 'eep')]
+FUSES  = ['lfuse', 'hfuse', 'efuse']
+
+
+class BackupStore:
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.objects = os.path.join(self.root, 'objects')
+
+    @classmethod
+    def for_backup(cls, backup_dir, manifest=None):
+        manifest = manifest or read_manifest(backup_dir)
+        return cls(os.path.normpath(os.path.join(backup_dir, manifest['store'])))
+
+    def object_path(self, digest):
+        return os.path.join(self.objects, digest[:2], f"{digest}.bin")
+
+    def has(self, digest):
+        return os.path.exists(self.object_path(digest))
+
+    def put(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Several boards may store the same image at the same time.
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        return digest
+
+    def get(self, digest):
+        with open(self.object_path(digest), 'rb') as f:
+            return f.read()
+
+    def ingest(self, backup_dir, info=None, remove=True):
+        manifest = {
+            'format': 1,
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'store': os.path.relpath(self.root, backup_dir),
+            'images': {},
+            'fuses': {},
+        }
+        manifest.update(info or {})
+        for name, ext in IMAGES:
+            path = os.path.join(backup_dir, f"{name}.{ext}")
+            data = ihex.decode(path)
+            manifest['images'][name] = dict(digests(data), sha256=self.put(data))
+        for fuse in FUSES:
+            path = os.path.join(backup_dir, f"{fuse}.txt")
+            # atmega8, attiny13...: no efuse.
+            if not os.path.exists(path):
+                continue
+            with open(path, 'r') as f:
+                manifest['fuses'][fuse] = f.read().strip()
+
+        write_manifest(backup_dir, manifest)
+        if remove:
+            for name, ext in IMAGES:
+                os.remove(os.path.join(backup_dir, f"{name}.{ext}"))
+            for fuse in manifest['fuses']:
+                os.remove(os.path.join(backup_dir, f"{fuse}.txt"))
+        return manifest
+
+    def stats(self):
+        count = size = 0
+        for dirpath, _, files in os.walk(self.objects):
+            for fn in files:
+                if fn.endswith('.bin'):
+                    count += 1
+                    size += os.path.getsize(os.path.join(dirpath, fn))
+        return count, size
+
+
+def digests(data):
+    return {
+        'sha256': hashlib.sha256(data).hexdigest(),
+        'crc32': f"{zlib.crc32(data) & 0xffffffff:08x}",
+        'size': len(data),
+    }
+
+
+def expected_digests(backup_dir, name):
+    if backup_archive.is_archive(backup_dir):
+        return digests(load_image(backup_dir, name))
+    if is_store_backup(backup_dir):
+        entry = read_manifest(backup_dir)['images'][name]
+        if 'crc32' in entry:
+            return entry
+    return digests(load_image(backup_dir, name))
+
+
+def read_manifest(backup_dir):
+    with open(os.path.join(backup_dir, MANIFEST_NAME), 'r') as f:
+        return json.load(f)
+
+
+def write_manifest(backup_dir, manifest):
+    path = os.path.join(backup_dir, MANIFEST_NAME)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def is_store_backup(backup_dir):
+    return os.path.exists(os.path.join(backup_dir, MANIFEST_NAME))
+
+
+def load_image(backup_dir, name):
+    if backup_archive.is_archive(backup_dir):
+        return memoryview(backup_archive.load(backup_dir)['images'][name])
+    if is_store_backup(backup_dir):
+        manifest = read_manifest(backup_dir)
+        store = BackupStore.for_backup(backup_dir, manifest)
+        return ihex.map_file(store.object_path(manifest['images'][name]['sha256']))
+    ext = dict(IMAGES)[name]
+    return ihex.load(os.path.join(backup_dir, f"{name}.{ext}"))
+
+
+def read_fuses(backup_dir):
+    if backup_archive.is_archive(backup_dir):
+        return backup_archive.load(backup_dir)['fuses']
+    if is_store_backup(backup_dir):
+        return read_manifest(backup_dir)['fuses']
+    fuses = {}
+    for fuse in FUSES:
+        path = os.path.join(backup_dir, f"{fuse}.txt")
+        if fuse == 'efuse' and not os.path.exists(path):
+            continue
+        with open(path, 'r') as f:
+            fuses[fuse] = f.read().strip()
+    return fuses
+
+
+def is_legacy_backup(backup_dir):
+    return all(os.path.exists(os.path.join(backup_dir, f"{n}.{e}")) for n, e in IMAGES)
+
+
+def fingerprint(manifest):
+    parts = [manifest['images'][n]['sha256'] for n, _ in IMAGES]
+    parts += [manifest['fuses'].get(f, '') for f in FUSES]
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+
+def latest_backup(base_dir, exclude=None):
+    best = None
+    for d in os.listdir(base_dir):
+        path = os.path.join(base_dir, d)
+        if path == exclude or not is_store_backup(path):
+            continue
+        mtime = os.path.getmtime(os.path.join(path, MANIFEST_NAME))
+        if best is None or mtime > best[0]:
+            best = (mtime, path)
+    return best[1] if best else None
+
+
+def import_tree(base_dir, store_dir=None, remove=False):
+    store = BackupStore(store_dir or os.path.join(base_dir, STORE_DIRNAME))
+    imported = []
+    for d in sorted(os.listdir(base_dir)):
+        path = os.path.join(base_dir, d)
+        if d.startswith('abt_') and os.path.isdir(path) \
+                and is_legacy_backup(path) and not is_store_backup(path):
+            store.ingest(path, remove=remove)
+            imported.append(d)
+    return store, imported
+
+
+def archive_backup(backup_dir, remove=False):
+    if is_store_backup(backup_dir):
+        meta = {k: v for k, v in read_manifest(backup_dir).items() if k not in ('images', 'fuses', 'store')}
+    else:
+        created = datetime.fromtimestamp(os.path.getmtime(backup_dir))
+        meta = {'format': 1, 'created': created.isoformat(timespec='seconds')}
+    path = backup_dir.rstrip(os.sep) + backup_archive.EXT
+    with backup_archive.ArchiveWriter(path, meta) as archive:
+        for name, _ in IMAGES:
+            archive.add_image(name, load_image(backup_dir, name))
+        for fuse, value in read_fuses(backup_dir).items():
+            archive.add_fuse(fuse, value)
+    if remove:
+        shutil.rmtree(backup_dir)
+    return path
+
+
+def archive_tree(base_dir, remove=False):
+    archived = []
+    for d in sorted(os.listdir(base_dir)):
+        path = os.path.join(base_dir, d)
+        if d.startswith('abt_') and os.path.isdir(path) \
+                and (is_store_backup(path) or is_legacy_backup(path)) \
+                and not os.path.exists(path + backup_archive.EXT):
+            archived.append(archive_backup(path, remove=remove))
+    return archived
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3 or sys.argv[1] not in ('import', 'archive'):
+        print("usage: backup_store.py import|archive <backup_dir> [--remove]")
+        sys.exit(2)
+    if sys.argv[1] == 'archive':
+        done = archive_tree(sys.argv[2], remove='--remove' in sys.argv)
+        print(f"Archived {len(done)} folder(s): {', '.join(os.path.basename(p) for p in done)}")
+        sys.exit(0)
+    store, done = import_tree(sys.argv[2], remove='--remove' in sys.argv)
+    count, size = store.stats()
+    print(f"Imported {len(done)} folder(s): {', '.join(done)}")
+    print(f"Store {store.root}: {count} unique image(s), {size} bytes")
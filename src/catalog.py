@@ -0,0 +1,164 @@
+import os
+import time
+import sqlite3
+import threading
+from datetime import datetime
+
+import app_paths
+import backup_archive
+import backup_store
+import integrity
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS snapshots (
+    path          TEXT PRIMARY KEY,
+    kind          TEXT NOT NULL,
+    stamp         INTEGER NOT NULL,
+    created       TEXT NOT NULL,
+    board         TEXT NOT NULL DEFAULT '',
+    mcu           TEXT NOT NULL DEFAULT '',
+    prog          TEXT NOT NULL DEFAULT '',
+    lfuse         TEXT NOT NULL DEFAULT '',
+    hfuse         TEXT NOT NULL DEFAULT '',
+    efuse         TEXT NOT NULL DEFAULT '',
+    flash_sha256  TEXT NOT NULL DEFAULT '',
+    flash_size    INTEGER NOT NULL DEFAULT 0,
+    eeprom_sha256 TEXT NOT NULL DEFAULT '',
+    eeprom_size   INTEGER NOT NULL DEFAULT 0,
+    indexed       REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_created ON snapshots(created);
+CREATE INDEX IF NOT EXISTS snapshots_board ON snapshots(board, created);
+CREATE INDEX IF NOT EXISTS snapshots_mcu ON snapshots(mcu, created);
+CREATE INDEX IF NOT EXISTS snapshots_flash ON snapshots(flash_sha256);
+'''
+
+SEARCH_COLUMNS = ('path', 'board', 'mcu', 'prog', 'lfuse', 'hfuse', 'efuse',
+                  'flash_sha256', 'eeprom_sha256', 'created')
+
+
+def stamp_of(path):
+    # Folders change mtime when files are added or replaced, which is how
+    # both the store (manifest.json) and loose backups are written.
+    st = os.stat(path)
+    stamp = st.st_mtime_ns
+    manifest = os.path.join(path, backup_store.MANIFEST_NAME)
+    if os.path.isdir(path) and os.path.exists(manifest):
+        stamp = max(stamp, os.stat(manifest).st_mtime_ns)
+    return stamp
+
+
+def describe(path, board=None):
+    if backup_archive.is_archive(path):
+        kind, meta = 'archive', backup_archive.load(path)['meta']
+    elif backup_store.is_store_backup(path):
+        kind, meta = 'store', backup_store.read_manifest(path)
+    else:
+        kind, meta = 'folder', {}
+    created = meta.get('created') or \
+        datetime.fromtimestamp(os.path.getmtime(path)).isoformat(timespec='seconds')
+    row = {
+        'path': os.path.abspath(path), 'kind': kind, 'created': created,
+        'board': board or meta.get('board') or meta.get('port', ''),
+        'mcu': meta.get('mcu', ''), 'prog': meta.get('prog', ''),
+    }
+    fuses = backup_store.read_fuses(path)
+    for fuse in backup_store.FUSES:
+        row[fuse] = fuses.get(fuse, '')
+    for name, _ in backup_store.IMAGES:
+        found = backup_store.expected_digests(path, name)
+        row[f"{name}_sha256"] = found['sha256']
+        row[f"{name}_size"] = found['size']
+    # Taken last: decoding a HEX file may add its .bin sidecar to the folder.
+    row['stamp'] = stamp_of(path)
+    return row
+
+
+class Catalog:
+    def __init__(self, path=None):
+        self.path = path or app_paths.user_file('catalog.db')
+        self.lock = threading.Lock()
+        # Fleet jobs add backups from several threads and processes.
+        self.db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def put(self, rows):
+        now = time.time()
+        with self.lock:
+            for row in rows:
+                row = dict(row, indexed=now)
+                self.db.execute(f"INSERT OR REPLACE INTO snapshots ({', '.join(row)}) VALUES "
+                                f"({', '.join('?' * len(row))})", list(row.values()))
+            self.db.commit()
+
+    def add(self, path, board=None):
+        self.put([describe(path, board)])
+
+    def scan(self, base_dir, on_status=None, stop=None):
+        # Only backups that are new or whose stamp changed are opened;
+        # rows of backups that disappeared from the tree are dropped.
+        # A set stop event ends the scan after the current backup.
+        base_dir = os.path.abspath(base_dir)
+        with self.lock:
+            known = dict(self.db.execute(
+                "SELECT path, stamp FROM snapshots WHERE path LIKE ? ESCAPE '\\'",
+                (base_dir.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+                 + os.sep + '%',)).fetchall())
+        added = errors = 0
+        seen = set()
+        rows = []
+        for path in integrity.find_backups(base_dir):
+            if stop is not None and stop.is_set():
+                self.put(rows)
+                return {'indexed': added + len(rows), 'removed': 0, 'errors': errors,
+                        'total': len(seen), 'stopped': True}
+            path = os.path.abspath(path)
+            seen.add(path)
+            try:
+                if known.get(path) == stamp_of(path):
+                    continue
+                rows.append(describe(path))
+            except (OSError, ValueError, KeyError) as e:
+                errors += 1
+                if on_status:
+                    on_status(f"{path}: {e}")
+            if len(rows) >= 500:
+                self.put(rows)
+                added, rows = added + len(rows), []
+        self.put(rows)
+        added += len(rows)
+        gone = [p for p in known if p not in seen]
+        with self.lock:
+            self.db.executemany("DELETE FROM snapshots WHERE path=?", [(p,) for p in gone])
+            self.db.commit()
+        return {'indexed': added, 'removed': len(gone), 'errors': errors, 'total': len(seen)}
+
+    def search(self, text='', mcu=None, board=None, limit=500):
+        sql = "SELECT * FROM snapshots"
+        where, args = [], []
+        for word in text.split():
+            # Every word has to match one column: "uno 328p 2026-05".
+            pattern = f"%{word}%"
+            where.append("(" + " OR ".join(f"{c} LIKE ?" for c in SEARCH_COLUMNS) + ")")
+            args += [pattern] * len(SEARCH_COLUMNS)
+        if mcu:
+            where.append("mcu = ?")
+            args.append(mcu)
+        if board:
+            where.append("board = ?")
+            args.append(board)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created DESC LIMIT ?"
+        args.append(limit)
+        with self.lock:
+            return [dict(r) for r in self.db.execute(sql, args)]
+
+    def count(self):
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM snapshots").fetchone()[0]
@@ -0,0 +1,133 @@
+import os
+import json
+import shutil
+import zlib
+from datetime import datetime
+
+import backup_archive
+
+# Progress of an unfinished backup, kept next to it so that a failed run
+# (USB glitch halfway through a 256 KB flash) can be resumed by the next one
+# instead of starting over in a new folder. Memories read by avrdude count
+# as done once complete; the native engine also keeps every finished chunk.
+# Retries within a run always resume; a later run only does when asked,
+# since the board may have been reflashed in between.
+DIRNAME = '.checkpoint'
+STATE   = 'state.json'
+CHUNK   = 4096
+
+
+def now():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def path_for(backup_dir):
+    # Archives are single files: their checkpoint sits beside them.
+    if backup_dir.endswith(backup_archive.EXT):
+        return backup_dir + DIRNAME
+    return os.path.join(backup_dir, DIRNAME)
+
+
+def find(base_dir, meta):
+    # Newest unfinished backup of the same board and MCU, or None.
+    best = None
+    for d in os.listdir(base_dir):
+        if not d.startswith('abt_'):
+            continue
+        path = os.path.join(base_dir, d)
+        if d.endswith(backup_archive.EXT + DIRNAME):
+            backup, state = path[:-len(DIRNAME)], os.path.join(path, STATE)
+        elif os.path.isdir(path):
+            backup, state = path, os.path.join(path, DIRNAME, STATE)
+        else:
+            continue
+        try:
+            with open(state, 'r') as f:
+                saved = json.load(f)
+            mtime = os.path.getmtime(state)
+        except (OSError, ValueError):
+            continue
+        if saved.get('meta') == meta and (best is None or mtime > best[0]):
+            best = (mtime, backup)
+    return best[1] if best else None
+
+
+class Checkpoint:
+    def __init__(self, backup_dir, meta, chunk=CHUNK):
+        self.path = path_for(backup_dir)
+        self.chunk = chunk
+        os.makedirs(self.path, exist_ok=True)
+        self.state = {'meta': meta, 'chunk': chunk, 'done': [], 'chunks': {}, 'done_at': {},
+                      'started': now()}
+        try:
+            with open(os.path.join(self.path, STATE), 'r') as f:
+                saved = json.load(f)
+            if saved.get('meta') == meta and saved.get('chunk') == chunk:
+                self.state = saved
+        except (OSError, ValueError):
+            pass
+        self.save()
+
+    def save(self):
+        tmp = os.path.join(self.path, STATE + '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(tmp, os.path.join(self.path, STATE))
+
+    def read_before(self):
+        # Memories (whole or in part) a previous run already read.
+        return sorted(set(self.state['done']) | {m for m, chunks in self.state['chunks'].items() if chunks})
+
+    def is_done(self, memory):
+        return memory in self.state['done']
+
+    def mark_done(self, memory):
+        if memory not in self.state['done']:
+            self.state['done'].append(memory)
+            self.state['chunks'].pop(memory, None)
+            self.state.setdefault('done_at', {})[memory] = now()
+            self.save()
+
+    def part_path(self, memory):
+        return os.path.join(self.path, f"{memory}.part")
+
+    def missing(self, memory, size):
+        # Chunk addresses still to read, in order.
+        have = self.state['chunks'].get(memory, {})
+        return [addr for addr in range(0, size, self.chunk) if str(addr) not in have]
+
+    def put_chunk(self, memory, addr, data):
+        path = self.part_path(memory)
+        with open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+            f.seek(addr)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self.state['chunks'].setdefault(memory, {})[str(addr)] = zlib.crc32(data) & 0xffffffff
+        self.save()
+
+    def image(self, memory, size):
+        # Assembled only when every chunk is there and still matches its
+        # CRC; bad chunks are forgotten so the next attempt reads them again.
+        have = self.state['chunks'].get(memory, {})
+        try:
+            with open(self.part_path(memory), 'rb') as f:
+                data = f.read(size)
+        except OSError:
+            data = b''
+        bad = []
+        for addr in range(0, size, self.chunk):
+            chunk = data[addr:addr + self.chunk]
+            if len(chunk) != min(self.chunk, size - addr) or \
+                    have.get(str(addr)) != zlib.crc32(chunk) & 0xffffffff:
+                bad.append(addr)
+        if bad:
+            for addr in bad:
+                have.pop(str(addr), None)
+            self.save()
+            raise RuntimeError(f"{memory}: {len(bad)} checkpoint chunk(s) missing or corrupt, "
+                               f"first at 0x{bad[0]:05x}")
+        return data
+
+    def remove(self):
+        shutil.rmtree(self.path, ignore_errors=True)
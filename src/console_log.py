@@ -0,0 +1,64 @@
+import json
+import time
+import logging
+import threading
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
+import app_paths
+
+# Messages from any thread are queued here; the GUI drains them on a timer
+# and appends each batch with a single widget call. Every message also goes
+# to a rotating JSON-lines file, so nothing grows without bound.
+MAX_PENDING  = 5000
+LOG_BYTES    = 1 << 20
+LOG_BACKUPS  = 3
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        return json.dumps({
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)),
+            'level': record.levelname.lower(),
+            'source': getattr(record, 'source', ''),
+            'msg': record.getMessage(),
+        }, ensure_ascii=False)
+
+
+class LogSink:
+    def __init__(self, path=None, max_pending=MAX_PENDING):
+        self.lock = threading.Lock()
+        self.pending = deque(maxlen=max_pending)
+        self.dropped = 0
+        self.logger = logging.getLogger(f"abt.console.{id(self)}")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        try:
+            handler = RotatingFileHandler(path or app_paths.user_file('abt.log'), maxBytes=LOG_BYTES,
+                                          backupCount=LOG_BACKUPS, encoding='utf-8')
+        except OSError:
+            handler = logging.NullHandler()
+        handler.setFormatter(JsonFormatter())
+        self.logger.addHandler(handler)
+
+    def put(self, text, source='', level=logging.INFO):
+        self.logger.log(level, text, extra={'source': source})
+        with self.lock:
+            if len(self.pending) == self.pending.maxlen:
+                self.dropped += 1
+            self.pending.append(text)
+
+    def drain(self):
+        with self.lock:
+            lines = list(self.pending)
+            self.pending.clear()
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            # The widget only keeps the newest lines anyway; the file has all.
+            lines.insert(0, f"... {dropped} message(s) not shown, see the log file")
+        return lines
+
+    def close(self):
+        for handler in list(self.logger.handlers):
+            handler.close()
+            self.logger.removeHandler(handler)
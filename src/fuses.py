@@ -0,0 +1,95 @@
+import backup_store
+
+# Fuse bytes decoded into their fields. avrdude.conf describes how to read
+# and write each fuse but not what its bits mean, so the layouts of the
+# MCUs the tool knows are listed here (datasheets, "Fuse Bits" tables).
+# Fuse bits are active low: 0 means programmed.
+# fuse -> [(field, shift, width)]
+_CLOCK = [('CKDIV8', 7, 1), ('CKOUT', 6, 1), ('SUT', 4, 2), ('CKSEL', 0, 4)]
+_HIGH_BOOT = [('RSTDISBL', 7, 1), ('DWEN', 6, 1), ('SPIEN', 5, 1), ('WDTON', 4, 1),
+              ('EESAVE', 3, 1), ('BOOTSZ', 1, 2), ('BOOTRST', 0, 1)]
+_HIGH_BOD = [('RSTDISBL', 7, 1), ('DWEN', 6, 1), ('SPIEN', 5, 1), ('WDTON', 4, 1),
+             ('EESAVE', 3, 1), ('BODLEVEL', 0, 3)]
+_HIGH_JTAG = [('OCDEN', 7, 1), ('JTAGEN', 6, 1), ('SPIEN', 5, 1), ('WDTON', 4, 1),
+              ('EESAVE', 3, 1), ('BOOTSZ', 1, 2), ('BOOTRST', 0, 1)]
+
+LAYOUTS = {
+    'atmega328p': {'lfuse': _CLOCK, 'hfuse': _HIGH_BOOT, 'efuse': [('BODLEVEL', 0, 3)]},
+    'atmega168':  {'lfuse': _CLOCK, 'hfuse': _HIGH_BOD, 'efuse': [('BOOTSZ', 1, 2), ('BOOTRST', 0, 1)]},
+    'attiny85':   {'lfuse': _CLOCK, 'hfuse': _HIGH_BOD, 'efuse': [('SELFPRGEN', 0, 1)]},
+    'atmega2560': {'lfuse': _CLOCK, 'hfuse': _HIGH_JTAG, 'efuse': [('BODLEVEL', 0, 3)]},
+    'atmega1280': {'lfuse': _CLOCK, 'hfuse': _HIGH_JTAG, 'efuse': [('BODLEVEL', 0, 3)]},
+    'atmega32u4': {'lfuse': _CLOCK, 'hfuse': _HIGH_JTAG, 'efuse': [('HWBE', 3, 1), ('BODLEVEL', 0, 3)]},
+    'attiny13':   {'lfuse': [('SPIEN', 7, 1), ('EESAVE', 6, 1), ('WDTON', 5, 1), ('CKDIV8', 4, 1),
+                             ('SUT', 2, 2), ('CKSEL', 0, 2)],
+                   'hfuse': [('SELFPRGEN', 4, 1), ('DWEN', 3, 1), ('BODLEVEL', 1, 2), ('RSTDISBL', 0, 1)]},
+    'atmega8':    {'lfuse': [('BODLEVEL', 7, 1), ('BODEN', 6, 1), ('SUT', 4, 2), ('CKSEL', 0, 4)],
+                   'hfuse': [('RSTDISBL', 7, 1), ('WDTON', 6, 1), ('SPIEN', 5, 1), ('CKOPT', 4, 1),
+                             ('EESAVE', 3, 1), ('BOOTSZ', 1, 2), ('BOOTRST', 0, 1)]},
+}
+
+# field -> (value, why): settings after which neither ISP nor the
+# bootloader can reach the board again without a high-voltage programmer.
+DANGEROUS = {
+    'SPIEN':    (1, "serial programming disabled"),
+    'RSTDISBL': (0, "reset pin disabled (no ISP, no bootloader auto-reset)"),
+    'DWEN':     (0, "debugWIRE enabled (reset pin taken, ISP disabled)"),
+}
+
+
+def names(mcu, part=None):
+    # Fuses the part has, from its avrdude.conf memories when known: an
+    # efuse op on an atmega8 or attiny13 fails the whole avrdude command.
+    if part and part.get('memories'):
+        return [fuse for fuse in backup_store.FUSES if fuse in part['memories']]
+    layout = LAYOUTS.get(mcu.lower())
+    if layout:
+        return [fuse for fuse in backup_store.FUSES if fuse in layout]
+    return list(backup_store.FUSES)
+
+
+def value(text):
+    # avrdude writes "0xff" (h), "255" (d) or "0b11111111" (b).
+    return int(str(text).strip(), 0)
+
+
+def decode(mcu, fuse, byte):
+    # {field: value}, empty when the layout is not known.
+    return {field: (byte >> shift) & ((1 << width) - 1)
+            for field, shift, width in LAYOUTS.get(mcu.lower(), {}).get(fuse, [])}
+
+
+def diff(mcu, fuse, old, new):
+    # Fields that differ between two values of the same fuse.
+    before, after = decode(mcu, fuse, value(old)), decode(mcu, fuse, value(new))
+    return [f"{field} {before[field]}->{after[field]}" for field in after if before[field] != after[field]]
+
+
+def check(mcu, target, current):
+    # Dangerous settings the target fuses would put the board in and the
+    # device values show it is not in already.
+    problems = []
+    for fuse in backup_store.FUSES:
+        if fuse not in target:
+            continue
+        fields = decode(mcu, fuse, value(target[fuse]))
+        now = decode(mcu, fuse, value(current[fuse])) if fuse in current else {}
+        for field, (bad, why) in DANGEROUS.items():
+            if fields.get(field) == bad and now.get(field) != bad:
+                problems.append(f"{fuse} {target[fuse]}: {field}, {why}")
+    return problems
+
+
+def ensure_safe(mcu, target, current, allow=False):
+    # Refuse before anything is written; allowed changes are returned so
+    # the caller can still warn about them.
+    problems = check(mcu, target, current)
+    if problems and not allow:
+        raise RuntimeError("Fuse change refused, the board could be locked out:\n" + "\n".join(problems))
+    return problems
+
+
+def changed(current, target):
+    # Fuses whose device value differs from the target, in FUSES order.
+    return [fuse for fuse in backup_store.FUSES
+            if fuse in target and fuse in current and value(current[fuse]) != value(target[fuse])]
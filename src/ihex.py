@@ -0,0 +1,135 @@
+import os
+import mmap
+from binascii import unhexlify
+
+SIDECAR_EXT = '.bin'
+
+
+def decode_lines(lines, name='<hex>', ranges=None):
+    # ranges, when given, receives the merged (start, end) spans actually
+    # present in the file: sparse files must not be written as a whole.
+    data = bytearray()
+    base = 0
+    for lineno, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        if line[:1] not in (':', b':'):
+            raise ValueError(f"{name}:{lineno}: not an Intel HEX record")
+        rec = unhexlify(line[1:])
+        if len(rec) < 5 or len(rec) != rec[0] + 5 or sum(rec) & 0xff:
+            raise ValueError(f"{name}:{lineno}: bad record length or checksum")
+        typ = rec[3]
+        if typ == 0:
+            addr = base + ((rec[1] << 8) | rec[2])
+            end  = addr + rec[0]
+            if end > len(data):
+                data.extend(b'\xff' * (end - len(data)))
+            data[addr:end] = rec[4:-1]
+            if ranges is not None and end > addr:
+                if ranges and ranges[-1][1] == addr:
+                    ranges[-1] = (ranges[-1][0], end)
+                else:
+                    ranges.append((addr, end))
+        elif typ == 1:
+            break
+        elif typ == 2:
+            base = int.from_bytes(rec[4:6], 'big') << 4
+        elif typ == 4:
+            base = int.from_bytes(rec[4:6], 'big') << 16
+    return data
+
+
+def decode(path, ranges=None):
+    with open(path, 'rb') as f:
+        return decode_lines(f.read().splitlines(), path, ranges)
+
+
+def record(typ, addr, payload=b''):
+    rec = bytes([len(payload), (addr >> 8) & 0xff, addr & 0xff, typ]) + bytes(payload)
+    return f":{rec.hex().upper()}{(-sum(rec)) & 0xff:02X}"
+
+
+def encode(data, record_size=32):
+    data = memoryview(data)
+    lines = []
+    ext = 0
+    for addr in range(0, len(data), record_size):
+        if addr >> 16 != ext:
+            ext = addr >> 16
+            lines.append(record(4, 0, ext.to_bytes(2, 'big')))
+        lines.append(record(0, addr & 0xffff, data[addr:addr + record_size]))
+    lines.append(record(1, 0))
+    return "\n".join(lines) + "\n"
+
+
+def encode_ranges(data, ranges, record_size=32):
+    data = memoryview(data)
+    lines = []
+    ext = 0
+    for start, end in ranges:
+        addr = start
+        while addr < end:
+            if addr >> 16 != ext:
+                ext = addr >> 16
+                lines.append(record(4, 0, ext.to_bytes(2, 'big')))
+            stop = min(addr + record_size, end, (ext + 1) << 16)
+            lines.append(record(0, addr & 0xffff, data[addr:stop]))
+            addr = stop
+    lines.append(record(1, 0))
+    return "\n".join(lines) + "\n"
+
+
+def write(path, data, record_size=32, ranges=None):
+    with open(path, 'w') as f:
+        if ranges is None:
+            f.write(encode(data, record_size))
+        else:
+            f.write(encode_ranges(data, ranges, record_size))
+
+
+def sidecar_path(path):
+    return path + SIDECAR_EXT
+
+
+def sidecar_valid(path):
+    # The sidecar carries the exact mtime of the HEX file it was decoded
+    # from; any rewrite of the HEX file invalidates it.
+    try:
+        return os.stat(sidecar_path(path)).st_mtime_ns == os.stat(path).st_mtime_ns
+    except OSError:
+        return False
+
+
+def write_sidecar(path, data=None):
+    if data is None:
+        data = decode(path)
+    side = sidecar_path(path)
+    st = os.stat(path)
+    with open(side + '.tmp', 'wb') as f:
+        f.write(data)
+    os.utime(side + '.tmp', ns=(st.st_atime_ns, st.st_mtime_ns))
+    os.replace(side + '.tmp', side)
+    return data
+
+
+def map_file(path):
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return memoryview(b'')
+        return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def load(path, cache=True):
+    if path.endswith(SIDECAR_EXT):
+        return map_file(path)
+    if not cache:
+        return memoryview(decode(path))
+    if not sidecar_valid(path):
+        data = decode(path)
+        try:
+            write_sidecar(path, data)
+        except OSError:
+            # Read-only backup tree: keep the in-memory decode.
+            return memoryview(data)
+    return map_file(sidecar_path(path))
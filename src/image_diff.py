@@ -0,0 +1,171 @@
+from zlib import crc32
+
+
+def changed_ranges(current, target, page_size=1):
+    # Compare page by page over the target image; the device side is treated
+    # as erased (0xff) past its end. Adjacent changed pages are merged.
+    current = memoryview(current)
+    target  = memoryview(target)
+    ranges = []
+    for start in range(0, len(target), page_size):
+        end = min(start + page_size, len(target))
+        cur = bytes(current[start:end])
+        if len(cur) < end - start:
+            cur += b'\xff' * (end - start - len(cur))
+        if cur == target[start:end]:
+            continue
+        if ranges and ranges[-1][1] == start:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((start, end))
+    return ranges
+
+
+def pad(data, size):
+    data = bytes(data)
+    return data + b'\xff' * (size - len(data))
+
+
+def diff_ranges(a, b, block=256):
+    # Byte-exact changed ranges; identical blocks are skipped with one
+    # slice comparison. The shorter image reads as erased flash.
+    size = max(len(a), len(b))
+    a, b = pad(a, size), pad(b, size)
+    ranges = []
+    for start in range(0, size, block):
+        end = min(start + block, size)
+        if a[start:end] == b[start:end]:
+            continue
+        for i in range(start, end):
+            if a[i] == b[i]:
+                continue
+            if ranges and ranges[-1][1] == i:
+                ranges[-1] = (ranges[-1][0], i + 1)
+            else:
+                ranges.append((i, i + 1))
+    return ranges
+
+
+def merge_ranges(ranges, gap):
+    merged = []
+    for start, end in ranges:
+        if merged and start - merged[-1][1] <= gap:
+            merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+# Similarity: an image is summarised by the hashes of its 64-byte blocks
+# (erased blocks left out), compared as sets. MinHash over those sets puts
+# likely-similar images in the same LSH bucket, so grouping a catalog costs
+# one pass over the images instead of comparing every pair.
+BLOCK = 64
+ERASED = crc32(b'\xff' * BLOCK)
+MINHASH = [((0x9e3779b1 * (2 * i + 1)) & 0xffffffff | 1, (0x7f4a7c15 * (i + 1)) & 0xffffffff)
+           for i in range(16)]
+BAND = 2
+
+
+def block_hashes(data, block=BLOCK):
+    data = memoryview(bytes(data))
+    hashes = {crc32(data[i:i + block]) for i in range(0, len(data), block)}
+    hashes.discard(ERASED)
+    return frozenset(hashes)
+
+
+def similarity(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def minhash(hashes):
+    if not hashes:
+        return tuple(0 for _ in MINHASH)
+    return tuple(min((h * m + k) & 0xffffffff for h in hashes) for m, k in MINHASH)
+
+
+def group_similar(images, threshold=0.8):
+    # images: {key: data}. Returns groups (lists of keys), largest first;
+    # keys of a group are linked by a chain of pairs at least threshold
+    # similar.
+    hashes = {key: block_hashes(data) for key, data in images.items()}
+    parent = {key: key for key in hashes}
+
+    def find(key):
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    buckets = {}
+    for key, h in hashes.items():
+        sig = minhash(h)
+        for band in range(0, len(sig), BAND):
+            buckets.setdefault((band, sig[band:band + BAND]), []).append(key)
+    for members in buckets.values():
+        first = members[0]
+        for key in members[1:]:
+            if find(key) != find(first) and similarity(hashes[first], hashes[key]) >= threshold:
+                parent[find(key)] = find(first)
+
+    groups = {}
+    for key in hashes:
+        groups.setdefault(find(key), []).append(key)
+    return sorted(groups.values(), key=len, reverse=True)
+
+
+def fuse_bits(a, b):
+    # Bit numbers (7..0) whose value differs between two fuse bytes.
+    changed = int(a, 0) ^ int(b, 0)
+    return [bit for bit in range(7, -1, -1) if changed >> bit & 1]
+
+
+def diff_backups(a, b, limit=64, gap=16):
+    # Changed bytes are counted exactly; ranges closer than gap bytes are
+    # reported as one (a rebuilt function, not a dozen one-byte edits).
+    import backup_store
+    report = {'a': a, 'b': b, 'images': {}, 'fuses': {}}
+    for name, _ in backup_store.IMAGES:
+        old = backup_store.load_image(a, name)
+        new = backup_store.load_image(b, name)
+        ranges = diff_ranges(old, new)
+        entry = {
+            'size_a': len(old), 'size_b': len(new),
+            'changed': sum(end - start for start, end in ranges),
+            'ranges': merge_ranges(ranges, gap),
+            'similarity': round(similarity(block_hashes(old), block_hashes(new)), 3),
+        }
+        if name == 'eeprom':
+            size = max(len(old), len(new))
+            old, new = pad(old, size), pad(new, size)
+            entry['bytes'] = [(i, old[i], new[i]) for start, end in ranges
+                              for i in range(start, end)][:limit]
+        report['images'][name] = entry
+    fa, fb = backup_store.read_fuses(a), backup_store.read_fuses(b)
+    for fuse in backup_store.FUSES:
+        if fuse in fa and fuse in fb and int(fa[fuse], 0) != int(fb[fuse], 0):
+            report['fuses'][fuse] = {'a': fa[fuse], 'b': fb[fuse], 'bits': fuse_bits(fa[fuse], fb[fuse])}
+    return report
+
+
+def format_report(report):
+    lines = [f"{report['a']} -> {report['b']}"]
+    for name, entry in report['images'].items():
+        if not entry['changed']:
+            lines.append(f"{name}: identical ({entry['size_a']} bytes)")
+            continue
+        lines.append(f"{name}: {entry['changed']} byte(s) differ in {len(entry['ranges'])} range(s), "
+                     f"sizes {entry['size_a']}/{entry['size_b']}, similarity {entry['similarity']:.0%}")
+        for start, end in entry['ranges'][:16]:
+            lines.append(f"  0x{start:05x}-0x{end - 1:05x} ({end - start} bytes)")
+        if len(entry['ranges']) > 16:
+            lines.append(f"  ... {len(entry['ranges']) - 16} more range(s)")
+        for addr, old, new in entry.get('bytes', [])[:16]:
+            lines.append(f"  [0x{addr:03x}] 0x{old:02x} -> 0x{new:02x}")
+    for fuse, entry in report['fuses'].items():
+        lines.append(f"{fuse}: {entry['a']} -> {entry['b']} (bit(s) {', '.join(map(str, entry['bits']))})")
+    if not report['fuses']:
+        lines.append("fuses: identical")
+    return "\n".join(lines)
@@ -0,0 +1,98 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import backup_archive
+import backup_store
+import checkpoint
+import ihex
+
+
+def check_backup(backup_dir):
+    problems = []
+    if backup_archive.is_archive(backup_dir):
+        try:
+            # Loading checks the CRC32 of every section.
+            archive = backup_archive.load(backup_dir)
+        except (OSError, ValueError) as e:
+            return [str(e)]
+        for name, _ in backup_store.IMAGES:
+            if name not in archive['images']:
+                problems.append(f"{name}: missing from archive")
+        fuses = archive['fuses']
+    elif backup_store.is_store_backup(backup_dir):
+        try:
+            manifest = backup_store.read_manifest(backup_dir)
+            store = backup_store.BackupStore.for_backup(backup_dir, manifest)
+        except (OSError, ValueError, KeyError) as e:
+            return [f"manifest: {e}"]
+        for name, _ in backup_store.IMAGES:
+            entry = manifest['images'].get(name)
+            if not entry:
+                problems.append(f"{name}: missing from manifest")
+                continue
+            path = store.object_path(entry['sha256'])
+            try:
+                data = ihex.map_file(path)
+            except OSError as e:
+                problems.append(f"{name}: {e.strerror} ({path})")
+                continue
+            found = backup_store.digests(data)
+            for key in ('size', 'sha256', 'crc32'):
+                if key in entry and entry[key] != found[key]:
+                    problems.append(f"{name}: {key} mismatch (manifest {entry[key]}, object {found[key]})")
+                    break
+        fuses = manifest.get('fuses', {})
+    else:
+        for name, ext in backup_store.IMAGES:
+            path = os.path.join(backup_dir, f"{name}.{ext}")
+            try:
+                # Decoding checks every record checksum of the HEX file.
+                ihex.decode(path)
+            except (OSError, ValueError) as e:
+                problems.append(f"{name}: {e}")
+        fuses = {}
+        for fuse in backup_store.FUSES:
+            if fuse == 'efuse' and not os.path.exists(os.path.join(backup_dir, 'efuse.txt')):
+                continue
+            try:
+                with open(os.path.join(backup_dir, f"{fuse}.txt"), 'r') as f:
+                    fuses[fuse] = f.read().strip()
+            except OSError as e:
+                problems.append(f"{fuse}: {e.strerror}")
+
+    for fuse, value in fuses.items():
+        try:
+            if not 0 <= int(value, 0) <= 0xff:
+                raise ValueError
+        except ValueError:
+            problems.append(f"{fuse}: invalid value {value!r}")
+    return problems
+
+
+def find_backups(base_dir):
+    found = []
+    for dirpath, dirnames, filenames in os.walk(base_dir):
+        # Unfinished backups (and their checkpoints) are not backups yet.
+        if checkpoint.DIRNAME in dirnames:
+            dirnames[:] = []
+            continue
+        dirnames[:] = [d for d in dirnames if d != backup_store.STORE_DIRNAME
+                       and not d.endswith(checkpoint.DIRNAME)]
+        found += [os.path.join(dirpath, f) for f in filenames
+                  if f.startswith('abt_') and f.endswith(backup_archive.EXT)]
+        if os.path.basename(dirpath).startswith('abt_') and (
+                backup_store.is_store_backup(dirpath) or backup_store.is_legacy_backup(dirpath)):
+            found.append(dirpath)
+            dirnames[:] = []
+    return sorted(found)
+
+
+def check_tree(base_dir, jobs=None, on_result=None):
+    backups = find_backups(base_dir)
+    results = {}
+    with ThreadPoolExecutor(max_workers=jobs or min(8, (os.cpu_count() or 1) + 2)) as pool:
+        for path, problems in zip(backups, pool.map(check_backup, backups)):
+            results[path] = problems
+            if on_result:
+                on_result(path, problems)
+    return results
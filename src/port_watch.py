@@ -0,0 +1,48 @@
+import autodetect
+
+# Serial ports come and go as boards are plugged in. pyserial has no
+# portable notification API, so the watcher enumerates the ports off the
+# GUI thread and only reports what changed since the previous poll.
+POLL_SECONDS = 1.0
+
+
+def describe(info):
+    return {
+        'device': info.device,
+        'key': autodetect.port_key(info),
+        'vid': f"{info.vid:04x}" if getattr(info, 'vid', None) is not None else None,
+        'pid': f"{info.pid:04x}" if getattr(info, 'pid', None) is not None else None,
+        'serial_number': getattr(info, 'serial_number', None),
+        'description': getattr(info, 'description', '') or '',
+        'location': getattr(info, 'location', None),
+    }
+
+
+def label(info):
+    usb = f" {info['vid']}:{info['pid']}" if info['vid'] else ""
+    sn = f" SN {info['serial_number']}" if info['serial_number'] else ""
+    return f"{info['device']}{usb}{sn}"
+
+
+def list_ports():
+    # Imported on first use: enumeration is the slow part of startup.
+    import serial.tools.list_ports
+    return {info.device: describe(info) for info in serial.tools.list_ports.comports()}
+
+
+class PortWatcher:
+    def __init__(self, enumerate_ports=list_ports):
+        self.enumerate_ports = enumerate_ports
+        self.ports = {}
+
+    def poll(self):
+        # Ports added and removed since the last poll; the first poll
+        # reports every port present. A port whose adapter changed under
+        # the same name (another board on COM3) counts as both.
+        current = self.enumerate_ports()
+        removed = [info for dev, info in self.ports.items()
+                   if dev not in current or current[dev]['key'] != info['key']]
+        added = [info for dev, info in current.items()
+                 if dev not in self.ports or self.ports[dev]['key'] != info['key']]
+        self.ports = current
+        return added, removed
@@ -0,0 +1,291 @@
+import os
+import re
+import time
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import abt_core
+import app_paths
+import backup_store
+import port_watch
+
+# avrdude messages meaning another program (or another job) holds the port.
+BUSY_RE = re.compile(r"can't open device|access is denied|resource busy|permission denied|"
+                     r"programmer is not responding|not in sync", re.IGNORECASE)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS boards (
+    id          INTEGER PRIMARY KEY,
+    name        TEXT UNIQUE NOT NULL,
+    port        TEXT NOT NULL,
+    mcu         TEXT NOT NULL,
+    prog        TEXT NOT NULL,
+    baud        TEXT NOT NULL,
+    base_dir    TEXT NOT NULL,
+    hub         TEXT NOT NULL,
+    interval_s  INTEGER NOT NULL,
+    next_run    REAL NOT NULL,
+    enabled     INTEGER NOT NULL DEFAULT 1
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    id          INTEGER PRIMARY KEY,
+    board_id    INTEGER NOT NULL REFERENCES boards(id) ON DELETE CASCADE,
+    mode        TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    not_before  REAL NOT NULL,
+    created     REAL NOT NULL,
+    started     REAL,
+    finished    REAL,
+    duration    REAL,
+    backup_dir  TEXT,
+    error       TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, not_before);
+'''
+
+
+def parse_interval(text):
+    m = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([smhd]?)\s*", str(text))
+    if not m:
+        raise ValueError(f"invalid interval: {text!r} (e.g. 90s, 30m, 24h, 7d)")
+    seconds = int(float(m.group(1)) * {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400}[m.group(2)])
+    if seconds < 1:
+        raise ValueError(f"interval too short: {text!r} (at least 1s)")
+    return seconds
+
+
+def next_at(clock, now=None):
+    now = now or datetime.now()
+    hour, minute = (int(v) for v in clock.split(':'))
+    first = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if first <= now:
+        first += timedelta(days=1)
+    return first.timestamp()
+
+
+def hub_of(port):
+    # Boards behind the same USB hub share its bandwidth and power budget.
+    try:
+        import serial.tools.list_ports
+        infos = {p.device: p for p in serial.tools.list_ports.comports()}
+    except Exception:
+        return port
+    location = getattr(infos.get(port), 'location', None)
+    if not location:
+        return port
+    m = re.search(r"Hub_#\d+", location)
+    if m:
+        return m.group(0)
+    path = location.split(':')[0]
+    return path.rsplit('.', 1)[0] if '.' in path else path
+
+
+class JobQueue:
+    def __init__(self, path=None):
+        self.path = path or app_paths.user_file('jobs.db')
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute('PRAGMA foreign_keys = ON')
+        self.db.executescript(SCHEMA)
+        # Jobs left 'running' by a previous process never finished.
+        self.db.execute("UPDATE jobs SET status='queued' WHERE status='running'")
+        self.db.commit()
+
+    def execute(self, sql, args=()):
+        with self.lock:
+            cur = self.db.execute(sql, args)
+            self.db.commit()
+            return cur
+
+    def query(self, sql, args=()):
+        with self.lock:
+            return [dict(r) for r in self.db.execute(sql, args)]
+
+    def add_board(self, name, port, mcu, prog, baud, base_dir, interval, hub=None, at=None):
+        first = next_at(at) if at else time.time()
+        self.execute(
+            "INSERT INTO boards (name, port, mcu, prog, baud, base_dir, hub, interval_s, next_run) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (name, port, mcu, prog, str(baud), os.path.abspath(base_dir), hub or port,
+             parse_interval(interval), first))
+
+    def remove_board(self, name):
+        return self.execute("DELETE FROM boards WHERE name=?", (name,)).rowcount
+
+    def boards(self):
+        return self.query("SELECT * FROM boards ORDER BY name")
+
+    def enqueue(self, board_id, mode='backup', not_before=None):
+        now = time.time()
+        self.execute(
+            "INSERT INTO jobs (board_id, mode, status, not_before, created) VALUES (?, ?, 'queued', ?, ?)",
+            (board_id, mode, not_before or now, now))
+
+    def enqueue_due(self, now=None):
+        now = now or time.time()
+        due = self.query(
+            "SELECT * FROM boards WHERE enabled=1 AND next_run<=? AND id NOT IN "
+            "(SELECT board_id FROM jobs WHERE status IN ('queued', 'running'))", (now,))
+        for board in due:
+            self.enqueue(board['id'])
+            # Skip missed periods (PC asleep...) instead of queuing a burst.
+            interval = max(1, board['interval_s'])
+            next_run = board['next_run'] + ((now - board['next_run']) // interval + 1) * interval
+            self.execute("UPDATE boards SET next_run=? WHERE id=?", (next_run, board['id']))
+        return len(due)
+
+    def enqueue_plugged(self, port):
+        # A scheduled board just plugged in gets a backup now, unless one
+        # is already waiting or running.
+        boards = self.query(
+            "SELECT * FROM boards WHERE enabled=1 AND port=? AND id NOT IN "
+            "(SELECT board_id FROM jobs WHERE status IN ('queued', 'running'))", (port,))
+        for board in boards:
+            self.enqueue(board['id'])
+        return boards
+
+    def ready(self, now=None):
+        return self.query(
+            "SELECT jobs.*, boards.name, boards.port, boards.mcu, boards.prog, boards.baud, "
+            "boards.base_dir, boards.hub FROM jobs JOIN boards ON boards.id = jobs.board_id "
+            "WHERE jobs.status='queued' AND jobs.not_before<=? ORDER BY jobs.not_before, jobs.id",
+            (now or time.time(),))
+
+    def mark_running(self, job_id):
+        self.execute("UPDATE jobs SET status='running', started=?, attempts=attempts+1 WHERE id=?",
+                     (time.time(), job_id))
+
+    def mark_done(self, job_id, duration, backup_dir):
+        self.execute("UPDATE jobs SET status='done', finished=?, duration=?, backup_dir=?, error=NULL "
+                     "WHERE id=?", (time.time(), duration, backup_dir, job_id))
+
+    def mark_failed(self, job_id, duration, error, retry_at=None):
+        status = 'queued' if retry_at else 'failed'
+        self.execute("UPDATE jobs SET status=?, finished=?, duration=?, error=?, not_before=COALESCE(?, not_before) "
+                     "WHERE id=?", (status, time.time(), duration, error, retry_at, job_id))
+
+    def history(self, name=None, limit=50):
+        sql = ("SELECT jobs.*, boards.name FROM jobs JOIN boards ON boards.id = jobs.board_id "
+               "WHERE jobs.status IN ('done', 'failed')")
+        args = []
+        if name:
+            sql += " AND boards.name=?"
+            args.append(name)
+        return self.query(sql + " ORDER BY jobs.finished DESC LIMIT ?", args + [limit])
+
+    def trend(self, name=None):
+        sql = ("SELECT boards.name, date(jobs.finished, 'unixepoch', 'localtime') AS day, "
+               "COUNT(*) AS runs, SUM(jobs.status='failed') AS failed, AVG(jobs.duration) AS avg_s, "
+               "MAX(jobs.duration) AS max_s FROM jobs JOIN boards ON boards.id = jobs.board_id "
+               "WHERE jobs.finished IS NOT NULL")
+        args = []
+        if name:
+            sql += " AND boards.name=?"
+            args.append(name)
+        return self.query(sql + " GROUP BY boards.name, day ORDER BY day, boards.name", args)
+
+
+class Scheduler:
+    def __init__(self, queue, avrdude_path, conf_path, max_jobs=4, per_hub=2,
+                 max_attempts=5, backoff=30, on_status=None, watch=False):
+        self.queue = queue
+        self.avrdude_path = avrdude_path
+        self.conf_path    = conf_path
+        self.max_jobs     = max_jobs
+        self.per_hub      = per_hub
+        self.max_attempts = max_attempts
+        self.backoff      = backoff
+        self.on_status    = on_status or (lambda s: None)
+        self.pool    = ThreadPoolExecutor(max_workers=max_jobs)
+        self.running = {}
+        self.stop    = threading.Event()
+        self.watcher = None
+        if watch:
+            self.watcher = port_watch.PortWatcher()
+            # Boards already connected follow their normal schedule.
+            self.watcher.poll()
+
+    def run_job(self, job):
+        params = {
+            'avrdude_path': self.avrdude_path,
+            'avrdude_conf_path': self.conf_path,
+            'mcu': job['mcu'], 'prog': job['prog'], 'port': job['port'], 'baud': job['baud'],
+            'board': job['name'], 'catalog': True,
+            # One folder per board, one store shared by the whole bench.
+            'base_dir': os.path.join(job['base_dir'], abt_core.port_dirname(job['name'])),
+            'store_dir': os.path.join(job['base_dir'], backup_store.STORE_DIRNAME),
+        }
+        os.makedirs(params['base_dir'], exist_ok=True)
+        return abt_core.Job(job['mode'], params).run()
+
+    def collect(self):
+        for job_id, (job, future, t0) in list(self.running.items()):
+            if not future.done():
+                continue
+            del self.running[job_id]
+            duration = time.time() - t0
+            try:
+                result = future.result()
+            except Exception as e:
+                error = str(e)
+                retry_at = None
+                if BUSY_RE.search(error) and job['attempts'] + 1 < self.max_attempts:
+                    retry_at = time.time() + self.backoff * (2 ** job['attempts'])
+                self.queue.mark_failed(job_id, duration, error, retry_at)
+                first = error.strip().splitlines()[0] if error.strip() else error
+                if retry_at:
+                    self.on_status(f"[{job['name']}] port busy, retry in {int(retry_at - time.time())}s: {first}")
+                else:
+                    self.on_status(f"[{job['name']}] failed after {duration:.1f}s: {first}")
+                continue
+            self.queue.mark_done(job_id, duration, result.get('backup_dir'))
+            self.on_status(f"[{job['name']}] {job['mode']} done in {duration:.1f}s")
+
+    def dispatch(self):
+        busy_ports = {job['port'] for job, _, _ in self.running.values()}
+        per_hub = {}
+        for job, _, _ in self.running.values():
+            per_hub[job['hub']] = per_hub.get(job['hub'], 0) + 1
+        for job in self.queue.ready():
+            if len(self.running) >= self.max_jobs:
+                break
+            if job['port'] in busy_ports or per_hub.get(job['hub'], 0) >= self.per_hub:
+                continue
+            self.queue.mark_running(job['id'])
+            self.on_status(f"[{job['name']}] {job['mode']} on {job['port']}")
+            self.running[job['id']] = (job, self.pool.submit(self.run_job, job), time.time())
+            busy_ports.add(job['port'])
+            per_hub[job['hub']] = per_hub.get(job['hub'], 0) + 1
+
+    def watch_ports(self):
+        try:
+            added, _ = self.watcher.poll()
+        except Exception as e:
+            self.on_status(f"Port scan failed: {e}")
+            return
+        for info in added:
+            for board in self.queue.enqueue_plugged(info['device']):
+                self.on_status(f"[{board['name']}] plugged in ({port_watch.label(info)}), backup queued")
+
+    def tick(self):
+        self.collect()
+        if self.watcher:
+            self.watch_ports()
+        self.queue.enqueue_due()
+        self.dispatch()
+
+    def run_forever(self, poll=5, until_idle=False):
+        try:
+            while not self.stop.is_set():
+                self.tick()
+                if until_idle and not self.running and not self.queue.ready(now=float('inf')):
+                    break
+                busy = self.running or self.watcher
+                self.stop.wait(min(poll, port_watch.POLL_SECONDS) if busy else poll)
+        finally:
+            self.pool.shutdown(wait=True)
+            self.collect()
@@ -0,0 +1,423 @@
+import time
+
+import serial
+
+import ihex
+
+# STK500v1, spoken by optiboot and ATmegaBOOT (-c arduino / stk500v1).
+STK_OK             = 0x10
+STK_INSYNC         = 0x14
+CRC_EOP            = 0x20
+STK_GET_SYNC       = 0x30
+STK_ENTER_PROGMODE = 0x50
+STK_LEAVE_PROGMODE = 0x51
+STK_LOAD_ADDRESS   = 0x55
+STK_UNIVERSAL      = 0x56
+STK_PROG_PAGE      = 0x64
+STK_READ_PAGE      = 0x74
+STK_READ_SIGN      = 0x75
+
+# STK500v2, spoken by the wiring bootloader of the Mega boards (-c wiring).
+MESSAGE_START          = 0x1b
+TOKEN                  = 0x0e
+CMD_SIGN_ON            = 0x01
+CMD_LOAD_ADDRESS       = 0x06
+CMD_ENTER_PROGMODE_ISP = 0x10
+CMD_LEAVE_PROGMODE_ISP = 0x11
+CMD_PROGRAM_FLASH_ISP  = 0x13
+CMD_READ_FLASH_ISP     = 0x14
+CMD_PROGRAM_EEPROM_ISP = 0x15
+CMD_READ_EEPROM_ISP    = 0x16
+CMD_PROGRAM_FUSE_ISP   = 0x17
+CMD_READ_FUSE_ISP      = 0x18
+CMD_READ_SIGNATURE_ISP = 0x1b
+STATUS_CMD_OK          = 0x00
+
+# ISP instructions the bootloaders pass through for fuse access.
+FUSE_READ  = {'lfuse': (0x50, 0x00), 'hfuse': (0x58, 0x08), 'efuse': (0x50, 0x08), 'lock': (0x58, 0x00)}
+FUSE_WRITE = {'lfuse': (0xac, 0xa0), 'hfuse': (0xac, 0xa8), 'efuse': (0xac, 0xa4), 'lock': (0xac, 0xe0)}
+
+# Checked after sync, as avrdude does, before anything is read or written.
+SIGNATURES = {
+    'atmega328p': b'\x1e\x95\x0f',
+    'atmega168':  b'\x1e\x94\x06',
+    'atmega2560': b'\x1e\x98\x01',
+    'atmega1280': b'\x1e\x97\x03',
+    'atmega32u4': b'\x1e\x95\x87',
+    'atmega8':    b'\x1e\x93\x07',
+    'attiny85':   b'\x1e\x93\x0b',
+    'attiny13':   b'\x1e\x90\x07',
+}
+
+# Bootloaders read any length up to their 256-byte buffer, whatever the
+# part's page size; EEPROM is written byte by byte so blocks are free too.
+READ_SIZE    = 256
+EEPROM_BLOCK = 128
+SYNC_TIMEOUT = 3.0
+
+
+def _ignore(*args):
+    pass
+
+
+def parse_spec(spec):
+    # memory:op:value:format, value may hold ':' (C:\ on Windows).
+    memory, op, rest = spec.split(':', 2)
+    value, fmt = rest.rsplit(':', 1)
+    return memory, op, value, fmt
+
+
+def blocks(ranges, unit, align):
+    # Flash is written in whole aligned pages, EEPROM in blocks cut at
+    # multiples of unit without growing the ranges.
+    spans = []
+    for start, end in ranges:
+        if align:
+            start -= start % unit
+            end += -end % unit
+        if spans and start <= spans[-1][1]:
+            spans[-1] = (spans[-1][0], max(end, spans[-1][1]))
+        else:
+            spans.append((start, end))
+    for start, end in spans:
+        addr = start
+        while addr < end:
+            stop = min(end, addr - addr % unit + unit)
+            yield addr, stop
+            addr = stop
+
+
+def save(memory, data, path, fmt):
+    if fmt == 'i':
+        # Same files as avrdude: trailing 0xff dropped from flash only.
+        ihex.write(path, data.rstrip(b'\xff') if memory == 'flash' else data)
+    elif fmt == 'h':
+        with open(path, 'w') as f:
+            f.write(",".join(f"0x{b:x}" for b in data) + "\n")
+    elif fmt == 'r':
+        with open(path, 'wb') as f:
+            f.write(data)
+    else:
+        raise RuntimeError(f"unsupported output format '{fmt}'")
+
+
+class Bootloader:
+    def __init__(self, port, baud, flash_size=0, timeout=1.0, ser=None):
+        self.port = port
+        self.flash_size = flash_size
+        self.ser = ser or serial.Serial(port, int(baud), timeout=timeout)
+        self.ext = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        try:
+            self.leave()
+        except (RuntimeError, OSError, serial.SerialException):
+            pass
+        finally:
+            self.ser.close()
+
+    def reset(self):
+        # Same auto-reset pulse as avrdude: DTR/RTS low, then high.
+        try:
+            self.ser.dtr = self.ser.rts = False
+            time.sleep(0.25)
+            self.ser.dtr = self.ser.rts = True
+            time.sleep(0.05)
+        except (OSError, serial.SerialException):
+            # ptys and some adapters have no modem lines.
+            pass
+        self.ser.reset_input_buffer()
+
+    def recv(self, n):
+        data = self.ser.read(n)
+        if len(data) != n:
+            raise RuntimeError(f"{self.port}: programmer is not responding ({len(data)}/{n} bytes)")
+        return data
+
+    def open(self):
+        self.reset()
+        deadline = time.monotonic() + SYNC_TIMEOUT
+        timeout, self.ser.timeout = self.ser.timeout, 0.2
+        try:
+            while True:
+                try:
+                    self.sync()
+                    break
+                except RuntimeError:
+                    if time.monotonic() > deadline:
+                        raise RuntimeError(f"{self.port}: not in sync, no bootloader answering")
+                    self.ser.reset_input_buffer()
+            # Late answers to earlier sync attempts must not be taken for
+            # the answer to the next command.
+            time.sleep(0.05)
+            self.ser.reset_input_buffer()
+        finally:
+            self.ser.timeout = timeout
+        self.sync()
+        self.enter()
+        return self
+
+    def read_memory(self, memory, size, on_bytes=_ignore, start=0):
+        # Bytes start..size; a checkpointed backup reads one chunk at a time.
+        data = bytearray()
+        while start + len(data) < size:
+            n = min(READ_SIZE, size - start - len(data))
+            data += self.read_chunk(memory, start + len(data), n)
+            on_bytes(n)
+        return data
+
+    def write_memory(self, memory, data, ranges, page_size, on_bytes=_ignore):
+        flash = memory == 'flash'
+        written = []
+        for start, end in blocks(ranges, page_size if flash else EEPROM_BLOCK, flash):
+            chunk = bytes(data[start:end])
+            chunk += b'\xff' * (end - start - len(chunk))
+            self.write_chunk(memory, start, chunk)
+            written.append((start, chunk))
+            on_bytes(len(chunk))
+        return written
+
+    def execute(self, spec, size, page_size, verify=True, on_bytes=_ignore):
+        memory, op, value, fmt = parse_spec(spec)
+        if op == 'r':
+            if memory in FUSE_READ:
+                data = bytes([self.read_fuse(memory)])
+                on_bytes(1, 1)
+            else:
+                done = [0]
+
+                def count(n):
+                    done[0] += n
+                    on_bytes(done[0], size)
+                data = self.read_memory(memory, size, count)
+            save(memory, data, value, fmt)
+            return
+
+        if op not in ('w', 'v'):
+            raise RuntimeError(f"invalid I/O mode '{op}' in update specification")
+        ranges = []
+        if fmt == 'm':
+            data = bytes(int(v, 0) & 0xff for v in value.split(','))
+        elif fmt == 'i':
+            data = ihex.decode(value, ranges)
+        elif fmt == 'r':
+            with open(value, 'rb') as f:
+                data = f.read()
+        else:
+            raise RuntimeError(f"unsupported input format '{fmt}'")
+        if len(data) > size:
+            raise RuntimeError(f"{len(data)} bytes do not fit in {memory} ({size} bytes)")
+
+        if op == 'v':
+            self.verify_memory(memory, data, ranges or [(0, len(data))], on_bytes)
+            return
+
+        if memory in FUSE_WRITE:
+            self.write_fuse(memory, data[0])
+            back = self.read_fuse(memory) if verify else data[0]
+            if back != data[0]:
+                raise RuntimeError(f"verification error, {memory} reads back 0x{back:02x}")
+            on_bytes(1, 1)
+            return
+
+        ranges = ranges or ([(0, len(data))] if data else [])
+        flash = memory == 'flash'
+        total = sum(end - start for start, end in blocks(ranges, page_size if flash else EEPROM_BLOCK, flash))
+        total *= 2 if verify else 1
+        done = [0]
+
+        def count(n):
+            done[0] += n
+            on_bytes(done[0], total)
+        written = self.write_memory(memory, data, ranges, page_size, count)
+        if not verify:
+            return
+        for start, chunk in written:
+            back = self.read_chunk(memory, start, len(chunk))
+            if back != chunk:
+                first = next(i for i in range(len(chunk)) if back[i] != chunk[i])
+                raise RuntimeError(f"verification error, first mismatch at byte 0x{start + first:04x}")
+            count(len(chunk))
+
+
+    def verify_memory(self, memory, data, ranges, on_bytes=_ignore):
+        # Read back only the given ranges, as avrdude -U memory:v does.
+        if memory in FUSE_READ:
+            back = self.read_fuse(memory)
+            if back != data[0]:
+                raise RuntimeError(f"verification error, {memory} reads 0x{back:02x}, expected 0x{data[0]:02x}")
+            on_bytes(1, 1)
+            return
+        total = sum(end - start for start, end in ranges)
+        done = 0
+        for start, end in ranges:
+            for addr in range(start, end, READ_SIZE):
+                n = min(READ_SIZE, end - addr)
+                back = self.read_chunk(memory, addr, n)
+                chunk = data[addr:addr + n]
+                if back != chunk:
+                    first = next(i for i in range(n) if back[i] != chunk[i])
+                    raise RuntimeError(f"verification error, first mismatch at byte 0x{addr + first:04x}")
+                done += n
+                on_bytes(done, total)
+
+
+class Stk500v1(Bootloader):
+    MEMTYPES = {'flash': ord('F'), 'eeprom': ord('E')}
+
+    def expect(self, n):
+        data = self.recv(n + 2)
+        if data[0] != STK_INSYNC:
+            raise RuntimeError(f"{self.port}: not in sync: resp=0x{data[0]:02x}")
+        if data[-1] != STK_OK:
+            raise RuntimeError(f"{self.port}: protocol error, expect=0x10, resp=0x{data[-1]:02x}")
+        return data[1:-1]
+
+    def command(self, payload, n=0):
+        self.ser.write(bytes(payload) + bytes([CRC_EOP]))
+        return self.expect(n)
+
+    def sync(self):
+        self.command([STK_GET_SYNC])
+
+    def enter(self):
+        self.command([STK_ENTER_PROGMODE])
+
+    def leave(self):
+        self.command([STK_LEAVE_PROGMODE])
+
+    def signature(self):
+        return bytes(self.command([STK_READ_SIGN], 3))
+
+    def read_fuse(self, fuse):
+        return self.command([STK_UNIVERSAL, *FUSE_READ[fuse], 0, 0], 1)[0]
+
+    def write_fuse(self, fuse, value):
+        self.command([STK_UNIVERSAL, *FUSE_WRITE[fuse], 0, value], 1)
+
+    def load_address(self, memory, addr):
+        if memory == 'flash':
+            if self.flash_size > 0x20000 and addr >> 17 != self.ext:
+                # Load Extended Address for the upper 128 KB of the Megas.
+                self.ext = addr >> 17
+                self.command([STK_UNIVERSAL, 0x4d, 0x00, self.ext, 0x00], 1)
+            addr >>= 1
+        return bytes([STK_LOAD_ADDRESS, addr & 0xff, (addr >> 8) & 0xff, CRC_EOP])
+
+    def read_chunk(self, memory, addr, n):
+        # Address and read request go out in one write: one USB round trip
+        # per block instead of two.
+        self.ser.write(self.load_address(memory, addr)
+                       + bytes([STK_READ_PAGE, n >> 8, n & 0xff, self.MEMTYPES[memory], CRC_EOP]))
+        self.expect(0)
+        return bytes(self.expect(n))
+
+    def write_chunk(self, memory, addr, chunk):
+        n = len(chunk)
+        self.ser.write(self.load_address(memory, addr)
+                       + bytes([STK_PROG_PAGE, n >> 8, n & 0xff, self.MEMTYPES[memory]]) + chunk
+                       + bytes([CRC_EOP]))
+        self.expect(0)
+        self.expect(0)
+
+
+class Stk500v2(Bootloader):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.seq = 0
+
+    def frame(self, body):
+        msg = bytes([MESSAGE_START, self.seq, len(body) >> 8, len(body) & 0xff, TOKEN]) + bytes(body)
+        self.seq = (self.seq + 1) & 0xff
+        check = 0
+        for b in msg:
+            check ^= b
+        return msg + bytes([check])
+
+    def answer(self, cmd):
+        head = self.recv(5)
+        if head[0] != MESSAGE_START or head[4] != TOKEN:
+            raise RuntimeError(f"{self.port}: not in sync: resp=0x{head[0]:02x}")
+        body = self.recv((head[2] << 8) | head[3])
+        check = self.recv(1)[0]
+        for b in head + body:
+            check ^= b
+        if check:
+            raise RuntimeError(f"{self.port}: stk500v2 checksum error")
+        if body[0] != cmd or body[1] != STATUS_CMD_OK:
+            raise RuntimeError(f"{self.port}: command 0x{cmd:02x} failed, status 0x{body[1]:02x}")
+        return body[2:]
+
+    def command(self, body):
+        self.ser.write(self.frame(body))
+        return self.answer(body[0])
+
+    def sync(self):
+        self.command([CMD_SIGN_ON])
+
+    def enter(self):
+        self.command([CMD_ENTER_PROGMODE_ISP, 200, 100, 25, 32, 0, 0x53, 3, 0xac, 0x53, 0, 0])
+
+    def leave(self):
+        self.command([CMD_LEAVE_PROGMODE_ISP, 1, 1])
+
+    def signature(self):
+        return bytes(self.command([CMD_READ_SIGNATURE_ISP, 4, 0x30, 0, i, 0])[0] for i in range(3))
+
+    def read_fuse(self, fuse):
+        return self.command([CMD_READ_FUSE_ISP, 4, *FUSE_READ[fuse], 0, 0])[0]
+
+    def write_fuse(self, fuse, value):
+        self.command([CMD_PROGRAM_FUSE_ISP, *FUSE_WRITE[fuse], 0, value])
+
+    def load_address(self, memory, addr):
+        if memory == 'flash':
+            addr >>= 1
+            if self.flash_size > 0x20000:
+                addr |= 0x80000000
+        return self.frame([CMD_LOAD_ADDRESS, *addr.to_bytes(4, 'big')])
+
+    def read_chunk(self, memory, addr, n):
+        cmd = CMD_READ_FLASH_ISP if memory == 'flash' else CMD_READ_EEPROM_ISP
+        self.ser.write(self.load_address(memory, addr) + self.frame([cmd, n >> 8, n & 0xff, 0x20]))
+        self.answer(CMD_LOAD_ADDRESS)
+        data = self.answer(cmd)
+        return bytes(data[:n])
+
+    def write_chunk(self, memory, addr, chunk):
+        n = len(chunk)
+        if memory == 'flash':
+            head = [CMD_PROGRAM_FLASH_ISP, n >> 8, n & 0xff, 0xc1, 10, 0x40, 0x4c, 0x20, 0, 0]
+        else:
+            head = [CMD_PROGRAM_EEPROM_ISP, n >> 8, n & 0xff, 0xc1, 10, 0xc1, 0xc2, 0xa0, 0, 0]
+        self.ser.write(self.load_address(memory, addr) + self.frame(bytes(head) + chunk))
+        self.answer(CMD_LOAD_ADDRESS)
+        self.answer(head[0])
+
+
+PROTOCOLS = {
+    'arduino':  Stk500v1,
+    'stk500v1': Stk500v1,
+    'wiring':   Stk500v2,
+}
+
+
+def connect(prog, port, baud, flash_size=0, mcu=None, signature=None):
+    boot = PROTOCOLS[prog](port, baud, flash_size)
+    try:
+        boot.open()
+        expected = bytes.fromhex(signature) if signature else SIGNATURES.get(mcu)
+        if expected:
+            sig = boot.signature()
+            if sig != expected:
+                raise RuntimeError(f"{port}: device signature = 0x{sig.hex()}, expected 0x{expected.hex()} ({mcu})")
+        return boot
+    except Exception:
+        boot.close()
+        raise
@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.insert(0, os.path.join(ROOT, 'tools'))
+
+import abt_core
+
+
+@pytest.fixture
+def bench(tmp_path, monkeypatch):
+    # Instant fake avrdude, its boards under devices/, settings under home/.
+    devices = tmp_path / 'devices'
+    devices.mkdir()
+    for name, value in {'FAKE_AVRDUDE_DEVICES': str(devices), 'FAKE_AVRDUDE_STARTUP': '0',
+                        'FAKE_AVRDUDE_RESET': '0', 'FAKE_AVRDUDE_BPS': '0',
+                        'ABT_HOME': str(tmp_path / 'home')}.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.setattr(abt_core, 'RETRY_DELAY', 0.1)
+    return tmp_path
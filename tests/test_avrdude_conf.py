@@ -0,0 +1,78 @@
+import os
+
+from conftest import ROOT
+import avrdude_conf
+
+CONF = '''
+# comment ; with = tokens
+programmer
+    id    = "arduino";
+    desc  = "Arduino";
+    type  = "arduino";
+;
+part
+    id        = ".template";
+    desc      = "template";
+    memory "flash"
+        size      = 0;
+    ;
+;
+part
+    id        = "m8";
+    desc      = "ATmega8";
+    signature = 0x1e 0x93 0x07;
+    memory "flash"
+        size      = 8192;
+        page_size = 64;
+    ;
+    memory "eeprom"
+        size      = 512;
+        page_size = 4;
+    ;
+    memory "lfuse"
+        size      = 1;
+    ;
+    memory "hfuse"
+        size      = 1;
+    ;
+;
+part parent "m8"
+    id        = "m88";
+    desc      = "ATmega88";
+    signature = 0x1e 0x93 0x0a;
+    /* inherits flash and the fuses, adds efuse */
+    memory "efuse"
+        size      = 1;
+    ;
+;
+'''
+
+
+def test_compile_index():
+    index = avrdude_conf.compile_index(CONF)
+    assert set(index['parts']) == {'atmega8', 'atmega88'}
+    assert index['programmers']['arduino'] == {'desc': 'Arduino', 'type': 'arduino'}
+    m8 = avrdude_conf.find_part(index, 'm8')
+    assert m8['signature'] == '1e9307'
+    assert sorted(m8['memories']) == ['eeprom', 'flash', 'hfuse', 'lfuse']
+    assert avrdude_conf.memory_sizes(m8) == (8192, 512, 64, 4)
+    # The parent's memories, plus its own.
+    assert 'efuse' in avrdude_conf.find_part(index, 'ATmega88')['memories']
+    assert avrdude_conf.part_by_signature(index, '1E930A') == 'atmega88'
+
+
+def test_cache(bench, tmp_path):
+    conf = tmp_path / 'avrdude.conf'
+    conf.write_text(CONF)
+    index = avrdude_conf.load(str(conf))
+    assert os.path.exists(avrdude_conf.cache_path(str(conf)))
+    # Changed file: indexed again.
+    conf.write_text(CONF.replace('"ATmega8"', '"ATmega8A"'))
+    assert 'atmega8a' in avrdude_conf.load(str(conf))['parts']
+    assert 'atmega8a' not in index['parts']
+
+
+def test_shipped_conf(bench):
+    index = avrdude_conf.load(os.path.join(ROOT, 'avrdude', 'avrdude.conf'))
+    assert avrdude_conf.memory_sizes(avrdude_conf.find_part(index, 'atmega328p')) == (32768, 1024, 128, 4)
+    assert 'efuse' not in avrdude_conf.find_part(index, 'atmega8')['memories']
@@ -0,0 +1,50 @@
+import os
+import shutil
+import threading
+
+import pytest
+
+from conftest import ROOT
+import catalog
+
+
+@pytest.fixture
+def tree(tmp_path):
+    # Two boards, one shipped backup each.
+    for board, name in (('uno', 'abt_may13a'), ('nano', 'abt_may13b')):
+        shutil.copytree(os.path.join(ROOT, 'backup', name), str(tmp_path / 'backup' / board / name))
+    return tmp_path / 'backup'
+
+
+@pytest.fixture
+def cat(tmp_path):
+    cat = catalog.Catalog(str(tmp_path / 'catalog.db'))
+    yield cat
+    cat.close()
+
+
+def test_scan_and_search(cat, tree):
+    assert cat.scan(str(tree))['indexed'] == 2
+    assert cat.count() == 2
+    rows = cat.search('uno 0x0')
+    assert len(rows) == 1 and rows[0]['path'].endswith(os.path.join('uno', 'abt_may13a'))
+    assert cat.search('no-such-board') == []
+
+    # Unchanged backups are not opened again; removed ones are dropped.
+    assert cat.scan(str(tree))['indexed'] == 0
+    shutil.rmtree(str(tree / 'nano'))
+    assert cat.scan(str(tree))['removed'] == 1
+    assert cat.count() == 1
+
+
+def test_add_names_the_board(cat, tree):
+    path = str(tree / 'uno' / 'abt_may13a')
+    cat.add(path, board='bench-7')
+    assert [r['path'] for r in cat.search(board='bench-7')] == [os.path.abspath(path)]
+
+
+def test_scan_stops(cat, tree):
+    stop = threading.Event()
+    stop.set()
+    result = cat.scan(str(tree), stop=stop)
+    assert result['stopped'] and result['indexed'] == 0
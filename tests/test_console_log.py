@@ -0,0 +1,34 @@
+import json
+import threading
+
+import console_log
+
+
+def test_drain_batches(tmp_path):
+    sink = console_log.LogSink(str(tmp_path / 'abt.log'))
+    threads = [threading.Thread(target=lambda n=n: [sink.put(f"{n}:{i}", source='job') for i in range(100)])
+               for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    lines = sink.drain()
+    assert len(lines) == 400
+    assert [l for l in lines if l.startswith('2:')] == [f"2:{i}" for i in range(100)]
+    assert sink.drain() == []
+    sink.close()
+
+    # Every message is in the JSON-lines file too.
+    with open(tmp_path / 'abt.log', encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) == 400 and records[0]['source'] == 'job'
+
+
+def test_overflow_keeps_newest(tmp_path):
+    sink = console_log.LogSink(str(tmp_path / 'abt.log'), max_pending=10)
+    for i in range(25):
+        sink.put(f"line {i}")
+    lines = sink.drain()
+    assert lines[0] == "... 15 message(s) not shown, see the log file"
+    assert lines[1:] == [f"line {i}" for i in range(15, 25)]
+    sink.close()
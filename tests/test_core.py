@@ -0,0 +1,250 @@
+# End-to-end jobs against the simulators: tools/fake_avrdude.py for the
+# avrdude path and tools/fake_bootloader.py (on a pty) for the native engine.
+# Both store a board as <memory>.bin files in one folder per port.
+#
+#   python -m pytest -q tests
+import os
+import random
+
+import pytest
+
+from conftest import ROOT
+import abt_core
+import backup_store
+from fake_avrdude import load_mem, save_mem
+from fake_bootloader import FakeBootloader
+
+MCU = 'atmega328p'
+FLASH, EEPROM = abt_core.MEMORY_SIZES[MCU][:2]
+
+
+def board(bench, port, seed=None):
+    # A board folder; with a seed, a sketch in the first 6 KB of flash.
+    path = bench / 'devices' / port
+    path.mkdir(exist_ok=True)
+    if seed is not None:
+        rnd = random.Random(seed)
+        save_mem(path, 'flash', bytes(rnd.getrandbits(8) for _ in range(6144)) + b'\xff' * (FLASH - 6144))
+        save_mem(path, 'eeprom', bytes(rnd.getrandbits(8) for _ in range(EEPROM)))
+    return str(path)
+
+
+def params(bench, port, base_dir, **extra):
+    p = {
+        'avrdude_path': os.path.join(ROOT, 'tools', 'fake_avrdude.py'),
+        'avrdude_conf_path': os.path.join(ROOT, 'avrdude', 'avrdude.conf'),
+        'mcu': MCU, 'prog': 'arduino', 'port': port, 'baud': '115200',
+        'base_dir': str(base_dir),
+    }
+    p.update(extra)
+    return p
+
+
+def backup(bench, port, **extra):
+    out = bench / 'backup'
+    out.mkdir(exist_ok=True)
+    return abt_core.Job('backup', params(bench, port, out, **extra)).run()['backup_dir']
+
+
+def same_board(a, b):
+    return all(load_mem(a, mem, size) == load_mem(b, mem, size)
+               for mem, size in (('flash', FLASH), ('eeprom', EEPROM)))
+
+
+@pytest.mark.parametrize('batch', [True, False])
+def test_backup_restore_verify(bench, batch):
+    src, dst = board(bench, 'b0', seed=1), board(bench, 'b1')
+    path = backup(bench, 'b0', batch=batch)
+    assert backup_store.is_store_backup(path)
+
+    result = abt_core.Job('restore', params(bench, 'b1', path, batch=batch)).run()
+    assert same_board(src, dst)
+    # Through a bootloader the fuses are left alone.
+    assert not any(e.get('memory', '').endswith('fuse') for e in result['phases'] if e['phase'] == 'transfer')
+    abt_core.Job('verify', params(bench, 'b1', path, batch=batch)).run()
+
+
+def test_non_batch_groups_fuses(bench):
+    board(bench, 'b0', seed=1)
+    out = bench / 'backup'
+    out.mkdir()
+    result = abt_core.Job('backup', params(bench, 'b0', out, batch=False)).run()
+    # flash, eeprom, then the three fuses in one process.
+    assert sum(1 for e in result['phases'] if e['phase'] == 'exit') == 3
+
+
+def test_phases(bench):
+    board(bench, 'b0', seed=1)
+    out = bench / 'backup'
+    out.mkdir()
+    phases = abt_core.Job('backup', params(bench, 'b0', out)).run()['phases']
+    names = [e['phase'] for e in phases]
+    assert [n for n in names if n in ('spawn', 'config', 'connect')] == ['spawn', 'config', 'connect']
+    assert names.index('connect') < names.index('transfer')
+    assert [(e['phase'], e['memory']) for e in phases if e.get('memory') == 'flash'] == [
+        ('transfer', 'flash'), ('file_write', 'flash')]
+
+
+def test_verify_reports_mismatch(bench):
+    dev = board(bench, 'b0', seed=1)
+    path = backup(bench, 'b0')
+    eeprom = load_mem(dev, 'eeprom', EEPROM)
+    eeprom[0x10] ^= 0xff
+    save_mem(dev, 'eeprom', eeprom)
+    with pytest.raises(RuntimeError, match=r"eeprom: 1 byte\(s\) differ, first at 0x0010"):
+        abt_core.Job('verify', params(bench, 'b0', path)).run()
+
+
+def test_connection_error(bench):
+    out = bench / 'backup'
+    out.mkdir()
+    with pytest.raises(RuntimeError, match=r"(?s)^Connection to b9 failed:\n.*can't open device"):
+        abt_core.Job('backup', params(bench, 'b9', out, retries=0)).run()
+
+
+def test_differential_restore(bench):
+    dev = board(bench, 'b0', seed=1)
+    path = backup(bench, 'b0')
+    flash = load_mem(dev, 'flash', FLASH)
+    flash[0x1234] ^= 0xff
+    save_mem(dev, 'flash', flash)
+
+    result = abt_core.Job('restore', params(bench, 'b0', path, differential=True)).run()
+    assert any(line.startswith("flash: 128 byte(s) written") for line in result['report'])
+    assert load_mem(dev, 'flash', FLASH)[0x1234] == flash[0x1234] ^ 0xff
+
+
+def test_hash_verify_restore(bench):
+    src, dst = board(bench, 'b0', seed=2), board(bench, 'b1')
+    path = backup(bench, 'b0')
+    result = abt_core.Job('restore', params(bench, 'b1', path, verify='hash')).run()
+    assert result['report'][-1] == "Device matches backup"
+    # avrdude checks the image bytes with a :v op instead of reading the memory.
+    size = len(backup_store.load_image(path, 'flash'))
+    assert f"flash: {size} byte(s) verified by avrdude" in result['report']
+    assert same_board(src, dst)
+
+
+def test_archive_backup_restore(bench):
+    src, dst = board(bench, 'b0', seed=3), board(bench, 'b1')
+    path = backup(bench, 'b0', archive=True)
+    assert path.endswith('.abt') and os.path.isfile(path)
+    abt_core.Job('restore', params(bench, 'b1', path)).run()
+    assert same_board(src, dst)
+    abt_core.Job('verify', params(bench, 'b1', path)).run()
+
+
+def test_shipped_backup_restores(bench):
+    # Bootloader backups hold 0x0 fuses (Optiboot reads them as 0x00).
+    board(bench, 'b0')
+    shipped = os.path.join(ROOT, 'backup', 'abt_may13a')
+    abt_core.Job('restore', params(bench, 'b0', shipped)).run()
+    result = abt_core.MassProgram(params(bench, None, shipped), ['b0']).run()
+    assert result['passed'] == 1
+
+
+@pytest.mark.parametrize('mode', ['verify', 'restore'])
+def test_shipped_backup_hash_verify(bench, mode):
+    # Fuses are neither read nor compared through the bootloader.
+    board(bench, 'b0')
+    shipped = os.path.join(ROOT, 'backup', 'abt_may13a')
+    if mode == 'verify':
+        abt_core.Job('restore', params(bench, 'b0', shipped)).run()
+    result = abt_core.Job(mode, params(bench, 'b0', shipped, verify='hash')).run()
+    assert result['report'][-1] == "Device matches backup"
+
+
+def test_stk500v1_fuses_read_as_zero(bench):
+    # stk500v1 may be a bootloader: 0x00 fuses are neither written nor compared.
+    dev = board(bench, 'b0')
+    for fuse in ('lfuse', 'hfuse', 'efuse'):
+        save_mem(dev, fuse, b'\x00')
+    shipped = os.path.join(ROOT, 'backup', 'abt_may13a')
+    status = []
+    result = abt_core.Job('restore', params(bench, 'b0', shipped, prog='stk500v1', verify='hash'),
+                          on_status=status.append).run()
+    assert any(s.startswith("Fuses not written") for s in status)
+    assert "fuses: not compared, the device reads them as 0x00" in result['report']
+
+
+def test_isp_no_efuse(bench):
+    # atmega8 has no efuse: avrdude would reject the whole command line.
+    dev = board(bench, 'b0')
+    save_mem(dev, 'flash', bytes(range(256)) * 32)
+    save_mem(dev, 'hfuse', b'\xc9')
+    path = backup(bench, 'b0', prog='usbasp', mcu='atmega8')
+    assert set(backup_store.read_fuses(path)) == {'lfuse', 'hfuse'}
+    save_mem(dev, 'hfuse', b'\xd9')
+    result = abt_core.Job('restore', params(bench, 'b0', path, prog='usbasp', mcu='atmega8',
+                                           verify='hash')).run()
+    assert "fuses: 1 written, 1 unchanged" in result['report']
+    assert load_mem(dev, 'hfuse', 1) == b'\xc9'
+
+
+def test_isp_fuses(bench):
+    dev = board(bench, 'b0', seed=1)
+    save_mem(dev, 'hfuse', b'\xde')
+    path = backup(bench, 'b0', prog='usbasp', store=False)
+    save_mem(dev, 'hfuse', b'\xda')
+
+    result = abt_core.Job('restore', params(bench, 'b0', path, prog='usbasp')).run()
+    assert "fuses: 1 written, 2 unchanged" in result['report']
+    assert load_mem(dev, 'hfuse', 1) == b'\xde'
+
+    # RSTDISBL programmed: refused before anything is written.
+    with open(os.path.join(path, 'hfuse.txt'), 'w') as f:
+        f.write('0x5e\n')
+    save_mem(dev, 'eeprom', b'\x00' * EEPROM)
+    with pytest.raises(RuntimeError, match="RSTDISBL"):
+        abt_core.Job('restore', params(bench, 'b0', path, prog='usbasp')).run()
+    assert load_mem(dev, 'eeprom', EEPROM) == b'\x00' * EEPROM
+
+
+@pytest.mark.parametrize('protocol, prog', [('v1', 'arduino'), ('v2', 'wiring')])
+def test_native_engine(bench, protocol, prog):
+    src, dst = board(bench, 'b0', seed=4), board(bench, 'b1')
+    boots = [FakeBootloader(d, MCU, protocol).start() for d in (src, dst)]
+    try:
+        path = backup(bench, boots[0].path, engine='native', prog=prog)
+        # The avrdude path reads the same board files back.
+        abt_core.Job('verify', params(bench, 'b0', path)).run()
+        abt_core.Job('restore', params(bench, boots[1].path, path, engine='native', prog=prog,
+                                       verify='hash')).run()
+    finally:
+        for boot in boots:
+            boot.close()
+    assert same_board(src, dst)
+
+
+def test_native_glitch_resumes(bench):
+    dev = board(bench, 'b0', seed=5)
+    boot = FakeBootloader(dev, MCU, 'v1', glitch=12288).start()
+    status = []
+    try:
+        out = bench / 'backup'
+        out.mkdir()
+        job = abt_core.Job('backup', params(bench, boot.path, out, engine='native', retries=3),
+                           on_status=status.append)
+        path = job.run()['backup_dir']
+    finally:
+        boot.close()
+    assert any("resuming from checkpoint" in s for s in status)
+    assert any("byte(s) from checkpoint" in s for s in status)
+    # The HEX leaves out the trailing 0xff bytes.
+    image = bytes(backup_store.load_image(path, 'flash'))
+    assert image + b'\xff' * (FLASH - len(image)) == bytes(load_mem(dev, 'flash', FLASH))
+    assert not os.path.exists(os.path.join(path, '.checkpoint'))
+
+
+def test_fleet_with_failing_board(bench):
+    for n in range(3):
+        board(bench, f"b{n}", seed=n)
+    with open(bench / 'devices' / 'b1' / 'fail.txt', 'w') as f:
+        f.write('eeprom')
+    out = bench / 'backup'
+    out.mkdir()
+    results = abt_core.Fleet('backup', params(bench, None, out), ['b0', 'b1', 'b2'], jobs=3).run()
+    ok = {r['port']: r['ok'] for r in results}
+    assert ok == {'b0': True, 'b1': False, 'b2': True}
+    failed = next(r for r in results if not r['ok'])
+    assert "eeprom" in failed['error']
@@ -0,0 +1,31 @@
+import pytest
+
+import fuses
+
+
+def test_names():
+    assert fuses.names('atmega328p') == ['lfuse', 'hfuse', 'efuse']
+    assert fuses.names('atmega8') == ['lfuse', 'hfuse']
+    assert fuses.names('atmega8', {'memories': {'flash': [8192, 64], 'lfuse': [1, 0]}}) == ['lfuse']
+    assert fuses.names('unknown') == ['lfuse', 'hfuse', 'efuse']
+
+
+def test_decode_and_diff():
+    assert fuses.decode('atmega328p', 'hfuse', 0xde)['BOOTSZ'] == 3
+    assert fuses.decode('unknown', 'hfuse', 0xde) == {}
+    assert fuses.diff('atmega328p', 'hfuse', '0xde', '0xda') == ['BOOTSZ 3->1']
+
+
+def test_dangerous_changes_refused():
+    current = {'lfuse': '0xff', 'hfuse': '0xde'}
+    assert fuses.check('atmega328p', {'hfuse': '0xda'}, current) == []
+    with pytest.raises(RuntimeError, match="RSTDISBL"):
+        fuses.ensure_safe('atmega328p', {'hfuse': '0x5e'}, current)
+    assert fuses.ensure_safe('atmega328p', {'hfuse': '0xfe'}, current, allow=True)
+    # Already there: not a new lock-out.
+    assert fuses.check('atmega328p', {'hfuse': '0x5e'}, {'hfuse': '0x5e'}) == []
+
+
+def test_changed():
+    assert fuses.changed({'lfuse': '0xff', 'hfuse': '0xde'},
+                         {'lfuse': '255', 'hfuse': '0xda', 'efuse': '0xfd'}) == ['hfuse']
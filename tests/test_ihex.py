@@ -0,0 +1,47 @@
+import os
+import random
+
+import pytest
+
+import ihex
+
+
+def test_encode_decode_round_trip():
+    # 80 KB: crosses a 64 KB segment, needs an extended address record.
+    data = bytes(random.Random(1).getrandbits(8) for _ in range(80 * 1024))
+    text = ihex.encode(data)
+    assert ":020000040001F9" in text
+    assert ihex.decode_lines(text.splitlines()) == data
+
+
+def test_sparse_ranges():
+    data = bytearray(b'\xff' * 1024)
+    data[0x10:0x30] = b'\x01' * 32
+    data[0x200:0x208] = b'\x02' * 8
+    ranges = []
+    decoded = ihex.decode_lines(ihex.encode_ranges(data, [(0x10, 0x30), (0x200, 0x208)]).splitlines(),
+                                ranges=ranges)
+    assert ranges == [(0x10, 0x30), (0x200, 0x208)]
+    assert decoded == data[:0x208]
+
+
+def test_bad_checksum():
+    line = ihex.record(0, 0, b'\x01\x02')
+    with pytest.raises(ValueError, match="checksum"):
+        ihex.decode_lines([line[:-2] + '00'], 'flash.hex')
+
+
+def test_sidecar(tmp_path):
+    path = str(tmp_path / 'flash.hex')
+    ihex.write(path, b'\x0c\x94' * 100)
+    assert not ihex.sidecar_valid(path)
+    assert bytes(ihex.load(path)) == b'\x0c\x94' * 100
+    assert ihex.sidecar_valid(path)
+
+    # Rewriting the HEX file invalidates the sidecar.
+    ihex.write(path, b'\x00' * 16)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1000))
+    assert not ihex.sidecar_valid(path)
+    assert bytes(ihex.load(path)) == b'\x00' * 16
+    assert bytes(ihex.load(path, cache=False)) == b'\x00' * 16
@@ -0,0 +1,50 @@
+import random
+
+import image_diff
+
+
+def sketch(seed, size=8192):
+    rnd = random.Random(seed)
+    return bytes(rnd.getrandbits(8) for _ in range(size)) + b'\xff' * (32768 - size)
+
+
+def edited(data, at, count):
+    data = bytearray(data)
+    for i in range(at, at + count):
+        data[i] ^= 0x5a
+    return bytes(data)
+
+
+def test_diff_ranges():
+    a = sketch(1)
+    b = edited(edited(a, 0x100, 4), 0x110, 2)
+    assert image_diff.diff_ranges(a, b) == [(0x100, 0x104), (0x110, 0x112)]
+    assert image_diff.merge_ranges(image_diff.diff_ranges(a, b), gap=16) == [(0x100, 0x112)]
+    # The shorter image reads as erased flash.
+    assert image_diff.diff_ranges(a[:8190], a[:8192]) == [(8190, 8192)]
+
+
+def test_group_similar():
+    base, other = sketch(1), sketch(2)
+    images = {
+        'uno-1': base, 'uno-2': edited(base, 0x200, 64), 'uno-3': edited(base, 0x1000, 32),
+        'nano-1': other, 'nano-2': edited(other, 0x40, 8),
+        'blank': b'\xff' * 32768,
+    }
+    groups = image_diff.group_similar(images)
+    assert sorted(map(sorted, groups)) == [['blank'], ['nano-1', 'nano-2'], ['uno-1', 'uno-2', 'uno-3']]
+    # Largest first.
+    assert len(groups[0]) == 3
+    # Nothing is 100% similar to an edited copy.
+    assert len(image_diff.group_similar(images, threshold=1.0)) == 6
+
+
+def test_similarity():
+    a = image_diff.block_hashes(sketch(1))
+    assert image_diff.similarity(a, a) == 1.0
+    assert image_diff.similarity(a, image_diff.block_hashes(sketch(2))) == 0.0
+    assert image_diff.block_hashes(b'\xff' * 4096) == frozenset()
+
+
+def test_fuse_bits():
+    assert image_diff.fuse_bits('0xde', '0xda') == [2]
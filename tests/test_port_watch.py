@@ -0,0 +1,32 @@
+import port_watch
+
+
+def port(device, key, vid='2341', pid='0043', sn=None):
+    return {'device': device, 'key': key, 'vid': vid, 'pid': pid, 'serial_number': sn,
+            'description': '', 'location': None}
+
+
+def test_poll_diffs():
+    present = {}
+    watcher = port_watch.PortWatcher(lambda: dict(present))
+    assert watcher.poll() == ([], [])
+
+    present['COM3'] = port('COM3', 'uno-1')
+    assert watcher.poll() == ([present['COM3']], [])
+    assert watcher.poll() == ([], [])
+
+    # Another board under the same name: removed and added.
+    old = present['COM3']
+    present['COM3'] = port('COM3', 'nano-7', vid='1a86', pid='7523')
+    present['COM4'] = port('COM4', 'uno-2')
+    added, removed = watcher.poll()
+    assert removed == [old]
+    assert sorted(p['device'] for p in added) == ['COM3', 'COM4']
+
+    del present['COM3']
+    assert watcher.poll() == ([], [port('COM3', 'nano-7', vid='1a86', pid='7523')])
+
+
+def test_label():
+    assert port_watch.label(port('COM3', 'k', sn='8573')) == "COM3 2341:0043 SN 8573"
+    assert port_watch.label(port('/dev/ttyS0', 'k', vid=None)) == "/dev/ttyS0"
@@ -0,0 +1,80 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from conftest import ROOT
+import abt_core
+import scheduler
+from fake_avrdude import save_mem
+
+
+@pytest.mark.parametrize('text, seconds', [('90', 90), ('90s', 90), ('30m', 1800), ('1.5h', 5400), ('7d', 604800)])
+def test_parse_interval(text, seconds):
+    assert scheduler.parse_interval(text) == seconds
+
+
+@pytest.mark.parametrize('text', ['', 'often', '5w', '0', '0.5s'])
+def test_parse_interval_rejects(text):
+    with pytest.raises(ValueError):
+        scheduler.parse_interval(text)
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return scheduler.JobQueue(str(tmp_path / 'jobs.db'))
+
+
+def test_enqueue_due_skips_missed_periods(queue, tmp_path):
+    queue.add_board('uno', 'b0', 'atmega328p', 'arduino', 115200, str(tmp_path), '1h')
+    start = queue.boards()[0]['next_run']
+    # Asleep for 5.5 periods: one backup, the next one on the original grid.
+    assert queue.enqueue_due(now=start + 5.5 * 3600) == 1
+    assert queue.boards()[0]['next_run'] == start + 6 * 3600
+    # Still queued: not queued twice.
+    assert queue.enqueue_due(now=start + 7 * 3600) == 0
+
+
+def test_enqueue_due_zero_interval(queue, tmp_path):
+    # A 0 stored by an older version must not hang the loop.
+    queue.add_board('uno', 'b0', 'atmega328p', 'arduino', 115200, str(tmp_path), '1s')
+    queue.execute("UPDATE boards SET interval_s=0")
+    now = queue.boards()[0]['next_run'] + 1e6
+    assert queue.enqueue_due(now=now) == 1
+    assert queue.boards()[0]['next_run'] > now
+
+
+def test_busy_port_retries_in_one_folder(bench, queue):
+    out = bench / 'backup'
+    queue.add_board('uno', 'b0', 'atmega328p', 'arduino', 115200, str(out), '1d', hub='hub')
+    status = []
+    sched = scheduler.Scheduler(queue, os.path.join(ROOT, 'tools', 'fake_avrdude.py'),
+                                os.path.join(ROOT, 'avrdude', 'avrdude.conf'),
+                                max_attempts=3, backoff=0.05, on_status=status.append)
+    # No board on b0 yet: "can't open device", retried with backoff.
+    sched.run_forever(poll=0.05, until_idle=True)
+    job = queue.history('uno')[0]
+    assert (job['status'], job['attempts']) == ('failed', 3)
+    assert sum("port busy, retry in" in s for s in status) == 2
+    assert [d for d in os.listdir(out / 'uno') if d.startswith('abt_')] == []
+
+    (bench / 'devices' / 'b0').mkdir()
+    save_mem(bench / 'devices' / 'b0', 'flash', b'\x0c\x94' * 64)
+    queue.enqueue(queue.boards()[0]['id'])
+    sched = scheduler.Scheduler(queue, os.path.join(ROOT, 'tools', 'fake_avrdude.py'),
+                                os.path.join(ROOT, 'avrdude', 'avrdude.conf'))
+    sched.run_forever(poll=0.05, until_idle=True)
+    assert queue.history('uno')[0]['status'] == 'done'
+    folders = [d for d in os.listdir(out / 'uno') if d.startswith('abt_')]
+    assert len(folders) == 1 and folders[0].endswith('a')
+
+
+def test_backup_names(tmp_path):
+    day = datetime(2026, 5, 1)
+    for name in ['abt_may13a', 'abt_may1a', 'abt_may1c.abt']:
+        (tmp_path / name).mkdir()
+    # abt_may13a is another day; 'b' is free but would sort before 'c'.
+    assert abt_core.backup_name(str(tmp_path), day) == 'abt_may1d'
+    for n in range(26):
+        (tmp_path / f"abt_may1{chr(ord('a') + n)}").mkdir(exist_ok=True)
+    assert abt_core.backup_name(str(tmp_path), day) == 'abt_may1-27'
@@ -0,0 +1,48 @@
+import os
+import shutil
+
+from conftest import ROOT
+import backup_store
+import ihex
+
+
+def copy_shipped(tmp_path, name, as_name=None):
+    dst = tmp_path / 'backup' / (as_name or name)
+    shutil.copytree(os.path.join(ROOT, 'backup', name), str(dst))
+    return str(dst)
+
+
+def test_same_images_stored_once(tmp_path):
+    copy_shipped(tmp_path, 'abt_may13a')
+    copy_shipped(tmp_path, 'abt_may13a', 'abt_may14a')
+    store, imported = backup_store.import_tree(str(tmp_path / 'backup'), remove=True)
+    assert imported == ['abt_may13a', 'abt_may14a']
+    # flash and eeprom, once for both backups.
+    assert store.stats()[0] == 2
+
+    a, b = (backup_store.read_manifest(str(tmp_path / 'backup' / d)) for d in imported)
+    assert backup_store.fingerprint(a) == backup_store.fingerprint(b)
+    assert not os.path.exists(tmp_path / 'backup' / 'abt_may13a' / 'flash.hex')
+
+
+def test_manifest(tmp_path):
+    path = copy_shipped(tmp_path, 'abt_may13a')
+    flash = bytes(ihex.decode(os.path.join(path, 'flash.hex')))
+    store = backup_store.BackupStore(str(tmp_path / 'store'))
+    manifest = store.ingest(path, info={'mcu': 'atmega328p'})
+
+    assert manifest['mcu'] == 'atmega328p'
+    assert manifest['images']['flash'] == backup_store.digests(flash)
+    assert backup_store.is_store_backup(path)
+    assert bytes(backup_store.load_image(path, 'flash')) == flash
+    assert backup_store.expected_digests(path, 'flash')['size'] == len(flash)
+    assert backup_store.read_fuses(path) == {'lfuse': '0x0', 'hfuse': '0x0', 'efuse': '0x0'}
+
+
+def test_ingest_without_efuse(tmp_path):
+    # atmega8, attiny13: no efuse.txt.
+    path = copy_shipped(tmp_path, 'abt_may13a')
+    os.remove(os.path.join(path, 'efuse.txt'))
+    assert backup_store.read_fuses(path) == {'lfuse': '0x0', 'hfuse': '0x0'}
+    manifest = backup_store.BackupStore(str(tmp_path / 'store')).ingest(path)
+    assert set(manifest['fuses']) == {'lfuse', 'hfuse'}
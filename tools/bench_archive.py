@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# Size and speed of the backup formats: loose abt_* folders (Intel HEX +
+# fuse text files) vs. single-file .abt archives, on synthetic snapshots of
+# a board whose firmware fills part of the flash.
+#
+#   python tools/bench_archive.py --count 200 --mcu atmega2560 --used 0.4
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+
+import abt_core
+import backup_store
+import ihex
+
+
+def make_backups(base_dir, count, mcu, used):
+    flash_size, eeprom_size = abt_core.MEMORY_SIZES[mcu][:2]
+    rnd = random.Random(1)
+    # Firmware-like content: a small instruction alphabet compresses the way
+    # real AVR code does, unlike uniform random bytes.
+    words = [rnd.getrandbits(16).to_bytes(2, 'little') for _ in range(512)]
+    firmware = b''.join(rnd.choice(words) for _ in range(int(flash_size * used) // 2))
+    for n in range(count):
+        path = os.path.join(base_dir, f"abt_bench{n:05d}")
+        os.makedirs(path)
+        eeprom = bytearray(b'\xff' * eeprom_size)
+        eeprom[:16] = n.to_bytes(16, 'little')
+        ihex.write(os.path.join(path, 'flash.hex'), firmware)
+        ihex.write(os.path.join(path, 'eeprom.eep'), eeprom)
+        for fuse in backup_store.FUSES:
+            with open(os.path.join(path, f"{fuse}.txt"), 'w') as f:
+                f.write("0xff\n")
+
+
+def tree_size(paths):
+    files = size = 0
+    for path in paths:
+        if os.path.isfile(path):
+            files, size = files + 1, size + os.path.getsize(path)
+            continue
+        for dirpath, _, names in os.walk(path):
+            files += len(names)
+            size += sum(os.path.getsize(os.path.join(dirpath, f)) for f in names)
+    return files, size
+
+
+def read_all(paths):
+    for path in paths:
+        for name, _ in backup_store.IMAGES:
+            backup_store.load_image(path, name)
+        backup_store.read_fuses(path)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--count', type=int, default=100, help="number of snapshots")
+    ap.add_argument('--mcu', default='atmega328p')
+    ap.add_argument('--used', type=float, default=0.5, help="fraction of the flash holding code")
+    a = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        make_backups(tmp, a.count, a.mcu, a.used)
+        folders = sorted(os.path.join(tmp, d) for d in os.listdir(tmp))
+        # Before conversion: reading the HEX files leaves .bin sidecars.
+        sizes = {'folders': tree_size(folders)}
+
+        t0 = time.perf_counter()
+        archives = backup_store.archive_tree(tmp)
+        t_write = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        for path in folders:
+            for name, ext in backup_store.IMAGES:
+                ihex.load(os.path.join(path, f"{name}.{ext}"), cache=False)
+            backup_store.read_fuses(path)
+        t_folders = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        read_all(archives)
+        t_archives = time.perf_counter() - t0
+        sizes['archives'] = tree_size(archives)
+
+        print(f"{a.count} snapshot(s) of {a.mcu}, {a.used:.0%} of flash used")
+        print(f"{'format':<10} {'files':>8} {'bytes':>12} {'read (ms/backup)':>18}")
+        for label, t in (('folders', t_folders), ('archives', t_archives)):
+            files, size = sizes[label]
+            print(f"{label:<10} {files:>8} {size:>12} {t * 1000 / a.count:>18.2f}")
+        print(f"conversion: {t_write * 1000 / a.count:.2f} ms/backup")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# Compare the single-session avrdude path with the historical
+# one-process-per-memory path, using tools/fake_avrdude.py.
+#
+#   python tools/bench_batch.py --startup 0.3 --reset 1.5 --bps 4000
+import argparse
+import os
+import tempfile
+import time
+
+import sim_env
+import abt_core
+
+
+def run_once(a, mode, batch, base_dir):
+    params = sim_env.params(a, port='bench0', batch=batch, base_dir=base_dir)
+    t0 = time.perf_counter()
+    try:
+        abt_core.Job(mode, params).run()
+    except Exception as e:
+        raise SystemExit(f"{mode} (batch={batch}) failed: {e}")
+    return time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    sim_env.add_arguments(ap, reset=1.5)
+    ap.add_argument('--repeat', type=int, default=3)
+    a = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sim_env.setup(a, tmp, ['bench0'])
+
+        print(f"{'mode':<8} {'sessions':<10} {'best (s)':>10} {'mean (s)':>10}")
+        for mode in ('backup', 'restore'):
+            for batch in (False, True):
+                times = []
+                for n in range(a.repeat):
+                    base = os.path.join(tmp, f"{mode}-{batch}-{n}")
+                    os.makedirs(base)
+                    if mode == 'restore':
+                        run_once(a, 'backup', True, base)
+                        base = os.path.join(base, [d for d in os.listdir(base) if d.startswith('abt_')][0])
+                    times.append(run_once(a, mode, batch, base))
+                label = "1" if batch else "per-op"
+                print(f"{mode:<8} {label:<10} {min(times):>10.2f} {sum(times) / len(times):>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
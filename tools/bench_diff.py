@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# Group a synthetic catalog of flash images by similarity: a few firmware
+# families, each snapshot a copy of its family with a few patched blocks.
+# Compares the MinHash/LSH grouping of src/image_diff.py with comparing
+# every pair, and checks that families come out as groups.
+#
+#   python tools/bench_diff.py --count 3000 --families 40
+import argparse
+import os
+import random
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+
+import image_diff
+
+
+def make_catalog(count, families, size, rnd):
+    words = [rnd.getrandbits(16).to_bytes(2, 'little') for _ in range(4096)]
+    bases = []
+    for _ in range(families):
+        used = rnd.randrange(size // 4, size // 2) & ~1
+        bases.append(b''.join(rnd.choice(words) for _ in range(used // 2)))
+    images, family = {}, {}
+    for n in range(count):
+        f = rnd.randrange(families)
+        data = bytearray(bases[f])
+        # A rebuilt sketch: a few functions change, data tables move.
+        for _ in range(rnd.randrange(1, 4)):
+            at = rnd.randrange(0, len(data) - 64)
+            data[at:at + 32] = bytes(rnd.getrandbits(8) for _ in range(32))
+        images[n] = bytes(data)
+        family[n] = f
+    return images, family
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--count', type=int, default=2000)
+    ap.add_argument('--families', type=int, default=30)
+    ap.add_argument('--size', type=int, default=32768)
+    ap.add_argument('--threshold', type=float, default=0.8)
+    ap.add_argument('--pairwise', type=int, default=300, help="images used to time all-pairs")
+    a = ap.parse_args()
+
+    rnd = random.Random(7)
+    images, family = make_catalog(a.count, a.families, a.size, rnd)
+
+    t0 = time.perf_counter()
+    groups = image_diff.group_similar(images, a.threshold)
+    t_lsh = time.perf_counter() - t0
+
+    # Every group should hold one family, every family one group.
+    pure = sum(1 for g in groups if len({family[k] for k in g}) == 1)
+    split = sum(1 for f in range(a.families)
+                if len({i for i, g in enumerate(groups) for k in g if family[k] == f}) > 1)
+
+    sample = list(images)[:a.pairwise]
+    hashes = {k: image_diff.block_hashes(images[k]) for k in sample}
+    t0 = time.perf_counter()
+    for i, x in enumerate(sample):
+        for y in sample[i + 1:]:
+            image_diff.similarity(hashes[x], hashes[y])
+    t_pairs = time.perf_counter() - t0
+    pairs = len(sample) * (len(sample) - 1) / 2
+    t_all = t_pairs / pairs * a.count * (a.count - 1) / 2
+
+    print(f"{a.count} image(s), {a.families} famil(ies), threshold {a.threshold}")
+    print(f"LSH grouping:    {t_lsh:8.2f} s -> {len(groups)} group(s), "
+          f"{pure} pure, {split} famil(ies) split")
+    print(f"all pairs (est): {t_all:8.2f} s (comparisons only, {int(pairs)} pairs timed)")
+
+
+if __name__ == '__main__':
+    main()
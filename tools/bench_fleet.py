@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# Run abt_core.Fleet against N simulated boards (tools/fake_avrdude.py) and
+# print the per-board report and the overall summary.
+#
+#   python tools/bench_fleet.py --boards 20 --jobs 8 --fail 3
+import argparse
+import os
+import tempfile
+import time
+
+import sim_env
+import abt_core
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--boards', type=int, default=20)
+    ap.add_argument('--jobs', type=int, default=8)
+    ap.add_argument('--fail', type=int, default=0, help="number of boards failing on eeprom")
+    sim_env.add_arguments(ap, reset=1.5)
+    a = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ports = [f"bench{n}" for n in range(a.boards)]
+        sim_env.setup(a, tmp, ports, a.fail)
+        out = os.path.join(tmp, 'backup')
+        os.makedirs(out)
+
+        params = sim_env.params(a, batch=True, base_dir=out)
+        fleet = abt_core.Fleet('backup', params, ports, a.jobs,
+                               on_board_finished=lambda p, ok, e: print(f"[{p}] {'OK' if ok else 'FAILED'}"))
+        t0 = time.perf_counter()
+        fleet.run()
+        print(fleet.summary)
+        print(f"wall time: {time.perf_counter() - t0:.2f}s for {a.boards} boards, {a.jobs} parallel")
+        print(f"board folders: {sorted(os.listdir(out))[:3]}...")
+
+
+if __name__ == '__main__':
+    main()
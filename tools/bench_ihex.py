@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# Benchmark the Intel HEX engine on the sample images in backup/abt_may13*:
+# plain text decode vs. cached raw-binary sidecar, for a hash workload.
+#
+#   python tools/bench_ihex.py --repeat 50
+import argparse
+import glob
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+
+import ihex
+
+
+def timed(fn, files, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for path in files:
+            fn(path)
+    return (time.perf_counter() - t0) / (repeat * len(files))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--repeat', type=int, default=50)
+    a = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = []
+        for path in sorted(glob.glob(os.path.join(HERE, '..', 'backup', 'abt_may13*', 'flash.hex'))):
+            dst = os.path.join(tmp, os.path.basename(os.path.dirname(path)) + '.hex')
+            shutil.copy2(path, dst)
+            files.append(dst)
+        if not files:
+            raise SystemExit("no sample images found in backup/abt_may13*")
+
+        for path in files:
+            data = ihex.decode(path)
+            assert ihex.decode_lines(ihex.encode(data).splitlines()) == data, path
+
+        size = os.path.getsize(files[0])
+        print(f"{len(files)} images, {size} bytes of HEX text each")
+
+        decode = timed(lambda p: hashlib.sha256(ihex.decode(p)).digest(), files, a.repeat)
+        cold = timed(lambda p: (os.remove(ihex.sidecar_path(p)) if ihex.sidecar_valid(p) else None,
+                                hashlib.sha256(ihex.load(p)).digest()), files, a.repeat)
+        warm = timed(lambda p: hashlib.sha256(ihex.load(p)).digest(), files, a.repeat)
+        encode = timed(lambda p: ihex.encode(ihex.load(p)), files, a.repeat)
+
+        print(f"{'decode text + sha256':<28} {decode * 1000:8.3f} ms/image")
+        print(f"{'cold load (writes sidecar)':<28} {cold * 1000:8.3f} ms/image")
+        print(f"{'cached sidecar + sha256':<28} {warm * 1000:8.3f} ms/image  ({decode / warm:.0f}x)")
+        print(f"{'encode to HEX':<28} {encode * 1000:8.3f} ms/image")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# Program one golden backup onto N simulated boards (tools/fake_avrdude.py):
+# one "Restore" per board (backup parsed again, avrdude verify pass) against
+# abt_core.MassProgram (backup decoded once, read-back verify of a board
+# overlapping the programming of the next one).
+#
+#   python tools/bench_mass.py --boards 10 --startup 0.3 --reset 1.5 --bps 11520
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import sim_env
+import abt_core
+from fake_avrdude import save_mem
+from fake_bootloader import FakeBootloader
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--boards', type=int, default=6)
+    ap.add_argument('--fail', type=int, default=0, help="number of boards failing on eeprom")
+    sim_env.add_arguments(ap)
+    ap.add_argument('--engine', choices=['avrdude', 'native'], default='avrdude')
+    a = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ports = [f"bench{n}" for n in range(a.boards)]
+        devices = sim_env.setup(a, tmp, ports)
+        params = sim_env.params(a, store=False)
+
+        # The golden board: a sketch in the first half of the flash.
+        golden_dev = os.path.join(devices, 'golden')
+        os.makedirs(golden_dev)
+        flash_size = abt_core.MEMORY_SIZES[a.mcu][0]
+        rnd = random.Random(3)
+        save_mem(golden_dev, 'flash', bytearray(rnd.getrandbits(8) for _ in range(flash_size // 2))
+                 + bytearray(b'\xff' * (flash_size - flash_size // 2)))
+        out = os.path.join(tmp, 'golden')
+        os.makedirs(out)
+        golden = abt_core.Job('backup', dict(params, port='golden', base_dir=out)).run()['backup_dir']
+        for port in ports[:a.fail]:
+            with open(os.path.join(devices, port, 'fail.txt'), 'w') as f:
+                f.write('eeprom')
+
+        t0 = time.perf_counter()
+        ok = 0
+        for port in ports:
+            try:
+                abt_core.Job('restore', dict(params, port=port, base_dir=golden, engine='avrdude')).run()
+                ok += 1
+            except RuntimeError:
+                pass
+        t_restore = time.perf_counter() - t0
+
+        boots = []
+        if a.engine == 'native':
+            # The same boards behind simulated bootloaders.
+            boots = [FakeBootloader(os.path.join(devices, port), a.mcu, 'v1', a.reset, 0.0, a.bps).start()
+                     for port in ports]
+            ports = [boot.path for boot in boots]
+        mass = abt_core.MassProgram(dict(params, base_dir=golden, engine=a.engine), ports, len(ports),
+                                    on_unit=lambda u: print(f"  #{u['unit']} {u['port']}: "
+                                                            f"{'PASS' if u['ok'] else 'FAIL'} {u['error'][:60]}"))
+        try:
+            result = mass.run()
+        finally:
+            for boot in boots:
+                boot.close()
+
+        print(f"{a.boards} board(s), {a.mcu}, startup {a.startup}s, reset {a.reset}s, "
+              f"{a.bps or 'instant'} B/s")
+        print(f"{'mode':<18} {'time (s)':>9} {'units/hour':>11} {'passed':>7}")
+        print(f"{'restore per board':<18} {t_restore:>9.2f} {a.boards * 3600 / t_restore:>11.0f} {ok:>7}")
+        print(f"{'mass program':<18} {result['elapsed']:>9.2f} {result['units_per_hour']:>11.0f} "
+              f"{result['passed']:>7}")
+
+
+if __name__ == '__main__':
+    main()
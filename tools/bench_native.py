@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# Compare the avrdude path (tools/fake_avrdude.py) with the native STK500
+# engine (tools/fake_bootloader.py on a pty), both driving the same
+# simulated board folder.
+#
+#   python tools/bench_native.py --startup 0.3 --reset 1.5 --bps 11520
+#   python tools/bench_native.py --mcu atmega2560 --protocol v2
+import argparse
+import os
+import tempfile
+import time
+
+import sim_env
+import abt_core
+from fake_bootloader import FakeBootloader
+
+PROGS = {'v1': 'arduino', 'v2': 'wiring'}
+
+
+def run_once(mode, engine, port, base_dir, a):
+    params = sim_env.params(a, prog=PROGS[a.protocol], port=port, engine=engine, base_dir=base_dir)
+    t0 = time.perf_counter()
+    try:
+        abt_core.Job(mode, params).run()
+    except Exception as e:
+        raise SystemExit(f"{mode} ({engine}) failed: {e}")
+    return time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    sim_env.add_arguments(ap)
+    ap.add_argument('--latency', type=float, default=0.0, help="native: USB round trip per burst (s)")
+    ap.add_argument('--protocol', choices=['v1', 'v2'], default='v1')
+    ap.add_argument('--repeat', type=int, default=3)
+    a = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        board = os.path.join(sim_env.setup(a, tmp, ['bench0']), 'bench0')
+        boot = FakeBootloader(board, a.mcu, a.protocol, a.reset, a.latency, a.bps).start()
+        ports = {'avrdude': 'bench0', 'native': boot.path}
+
+        print(f"{'mode':<8} {'engine':<10} {'best (s)':>10} {'mean (s)':>10}")
+        try:
+            for mode in ('backup', 'restore'):
+                for engine in ('avrdude', 'native'):
+                    times = []
+                    for n in range(a.repeat):
+                        base = os.path.join(tmp, f"{mode}-{engine}-{n}")
+                        os.makedirs(base)
+                        if mode == 'restore':
+                            run_once('backup', 'avrdude', 'bench0', base, a)
+                            base = os.path.join(base, [d for d in os.listdir(base) if d.startswith('abt_')][0])
+                        # Let the bootloader time out to the application, as
+                        # between two real sessions.
+                        time.sleep(1.2)
+                        times.append(run_once(mode, engine, ports[engine], base, a))
+                    print(f"{mode:<8} {engine:<10} {min(times):>10.2f} {sum(times) / len(times):>10.2f}")
+        finally:
+            boot.close()
+
+
+if __name__ == '__main__':
+    main()
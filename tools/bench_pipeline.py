@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# Where the time of a backup goes: runs the pipeline in several
+# configurations against tools/fake_avrdude.py (and the native engine on
+# tools/fake_bootloader.py) and sums the per-phase timings the jobs record
+# (spawn, config, connect, transfer, file_write, exit, store, ...). --json
+# writes the numbers for comparison between versions.
+#
+#   python tools/bench_pipeline.py --startup 0.3 --reset 1.5 --bps 11520
+#   python tools/bench_pipeline.py --boards 8 --json timings.json
+import argparse
+import json
+import os
+import tempfile
+import time
+from collections import defaultdict
+
+import sim_env
+import abt_core
+from fake_bootloader import FakeBootloader
+
+# name -> (engine, batch, boards)
+CONFIGS = {
+    'per-op':  ('avrdude', False, 1),
+    'batch':   ('avrdude', True, 1),
+    'native':  ('native', True, 1),
+    'fleet':   ('avrdude', True, None),
+}
+
+
+def totals(results):
+    phases = defaultdict(float)
+    for result in results:
+        for event in result.get('phases', []):
+            phases[event['phase']] += event['elapsed']
+    return phases
+
+
+def run_config(name, a, boot, tmp, n):
+    engine, batch, boards = CONFIGS[name]
+    base = os.path.join(tmp, f"{name}-{n}")
+    os.makedirs(base)
+    params = sim_env.params(a, engine=engine, batch=batch, base_dir=base)
+    t0 = time.perf_counter()
+    try:
+        if boards is None:
+            ports = [f"bench{i}" for i in range(a.boards)]
+            results = abt_core.Fleet('backup', params, ports, a.boards).run()
+            failed = [r['error'] for r in results if not r['ok']]
+            if failed:
+                raise RuntimeError(failed[0])
+        else:
+            params['port'] = boot.path if engine == 'native' else 'bench0'
+            results = [abt_core.Job('backup', params).run()]
+    except Exception as e:
+        raise SystemExit(f"{name} failed: {e}")
+    return time.perf_counter() - t0, totals(results)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    sim_env.add_arguments(ap)
+    ap.add_argument('--boards', type=int, default=4, help="boards in the fleet run")
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--only', nargs='+', choices=list(CONFIGS), default=list(CONFIGS))
+    ap.add_argument('--json', help="write the results to this file")
+    a = ap.parse_args()
+
+    report = {'settings': vars(a), 'configs': {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        devices = sim_env.setup(a, tmp, [f"bench{i}" for i in range(a.boards)])
+        boot = FakeBootloader(os.path.join(devices, 'bench0'), a.mcu, 'v1', a.reset, 0.0, a.bps).start()
+        try:
+            for name in a.only:
+                runs = []
+                for n in range(a.repeat):
+                    if name == 'native':
+                        # Let the bootloader time out to the application.
+                        time.sleep(1.2)
+                    runs.append(run_config(name, a, boot, tmp, n))
+                best = min(runs, key=lambda r: r[0])
+                report['configs'][name] = {
+                    'best': round(best[0], 3),
+                    'mean': round(sum(r[0] for r in runs) / len(runs), 3),
+                    'phases': {k: round(v, 3) for k, v in sorted(best[1].items())},
+                }
+        finally:
+            boot.close()
+
+    names = sorted({p for c in report['configs'].values() for p in c['phases']})
+    print(f"backup of {a.mcu}, startup {a.startup}s, reset {a.reset}s, "
+          f"{a.bps or 'instant'} B/s, best of {a.repeat}")
+    # 'config' is also a phase (avrdude.conf parse): the column is 'run'.
+    print(f"{'run':<8} {'best (s)':>9} {'mean (s)':>9}" + ''.join(f" {p:>10}" for p in names))
+    for name, c in report['configs'].items():
+        print(f"{name:<8} {c['best']:>9.2f} {c['mean']:>9.2f}"
+              + ''.join(f" {c['phases'].get(p, 0):>10.2f}" for p in names))
+    if 'fleet' in report['configs']:
+        print(f"(fleet: {a.boards} board(s) in parallel, phases summed over boards)")
+    if a.json:
+        with open(a.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
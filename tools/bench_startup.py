@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# Cold start of the tool: import time of the modules each entry point
+# loads (python -X importtime), the headless CLI, and the GUI up to its
+# first painted window. The GUI is timed by a probe script that imports it,
+# catches the first paint event and closes the window; --exe times a
+# PyInstaller build (--onefile vs --onedir) from launch to its window
+# being visible (Windows, pywin32).
+#
+#   python tools/bench_startup.py --repeat 5
+#   python tools/bench_startup.py --exe ArduinoBackupTool.exe --exe ArduinoBackupTool/ArduinoBackupTool.exe
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(HERE, '..', 'src')
+
+MODULES = ['abt_core', 'arduino_backup_tool', 'serial.tools.list_ports', 'PyQt5.QtWidgets']
+IMPORT_RE = re.compile(r"import time:\s+\d+ \|\s+(\d+) \| ( *)(\S+)$")
+TITLE = "Arduino Backup Tool"
+
+# Run with python -c in src/: time from interpreter start of the script to
+# the first paint of the main window, then close it like a user would.
+PROBE = """
+import sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, '.')
+import arduino_backup_tool
+from PyQt5.QtCore import QEvent, QObject, QTimer
+from PyQt5.QtWidgets import QApplication
+
+class FirstPaint(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and getattr(obj, 'window', None) and obj.window() is win:
+            print(f"window {time.perf_counter() - t0:.3f}", flush=True)
+            app.removeEventFilter(self)
+            QTimer.singleShot(0, win.close)
+        return False
+
+app = QApplication(sys.argv)
+win = arduino_backup_tool.ArduinoBackupTool()
+probe = FirstPaint()
+app.installEventFilter(probe)
+win.show()
+app.exec_()
+"""
+
+
+def run(cmd, env, timeout=60):
+    t0 = time.perf_counter()
+    res = subprocess.run(cmd, cwd=SRC, env=env, capture_output=True, text=True, timeout=timeout)
+    return time.perf_counter() - t0, res
+
+
+def import_times(module, env, repeat):
+    # Best cumulative time of the module, with its direct imports: they are
+    # the lines indented one level deeper just above it.
+    best = None
+    for _ in range(repeat):
+        _, res = run([sys.executable, '-X', 'importtime', '-c', f"import {module}"], env)
+        if res.returncode != 0:
+            return None
+        lines = [(int(m.group(1)) / 1e6, len(m.group(2)), m.group(3))
+                 for m in map(IMPORT_RE.search, res.stderr.splitlines()) if m]
+        top = max((i for i, (_, depth, name) in enumerate(lines) if name == module and not depth),
+                  default=None)
+        if top is None:
+            continue
+        times = {module: lines[top][0]}
+        for t, depth, name in reversed(lines[:top]):
+            if not depth:
+                break
+            if depth == 2:
+                times[name] = t
+        if best is None or times[module] < best[module]:
+            best = times
+    return best
+
+
+def exe_to_window(exe, env, repeat, timeout=60):
+    # A frozen build cannot run the probe: wait for its window to show up.
+    try:
+        import win32gui
+    except ImportError:
+        return None
+    walls = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        proc = subprocess.Popen([exe], env=env)
+        try:
+            while time.perf_counter() - t0 < timeout:
+                hwnd = win32gui.FindWindow(None, TITLE)
+                if hwnd and win32gui.IsWindowVisible(hwnd):
+                    walls.append(time.perf_counter() - t0)
+                    break
+                time.sleep(0.005)
+            else:
+                return None
+        finally:
+            proc.terminate()
+            proc.wait()
+    return {'wall': round(min(walls), 3), 'in_process': None}
+
+
+def time_to_window(cmd, env, repeat):
+    walls, inner = [], []
+    for _ in range(repeat):
+        wall, res = run(cmd, env)
+        if res.returncode != 0:
+            return None
+        walls.append(wall)
+        m = re.search(r"window (\d+\.\d+)", res.stdout)
+        if m:
+            inner.append(float(m.group(1)))
+    return {'wall': round(min(walls), 3), 'in_process': round(min(inner), 3) if inner else None}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--exe', action='append', default=[], help="built executable to time (repeatable)")
+    ap.add_argument('--json', help="write the results to this file")
+    a = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as home:
+        # Own settings folder: no detect cache or conf index from real use.
+        env = dict(os.environ, ABT_HOME=home)
+        if sys.platform.startswith('linux'):
+            env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        report = {'imports': {}, 'cli': None, 'gui': None, 'exe': {}}
+
+        print(f"{'module':<26} {'import (ms)':>12}  slowest dependencies")
+        for module in MODULES:
+            times = import_times(module, env, a.repeat)
+            if times is None:
+                print(f"{module:<26} {'n/a':>12}  (not importable here)")
+                continue
+            total = times.pop(module)
+            deps = sorted(times.items(), key=lambda kv: -kv[1])[:3]
+            report['imports'][module] = round(total, 4)
+            print(f"{module:<26} {total * 1000:>12.1f}  "
+                  + ", ".join(f"{name} {t * 1000:.0f}" for name, t in deps))
+
+        walls = [run([sys.executable, 'abt.py', '--help'], env)[0] for _ in range(a.repeat)]
+        report['cli'] = round(min(walls), 3)
+        print(f"\nCLI (abt.py --help):        {report['cli']:.3f} s")
+
+        report['gui'] = time_to_window([sys.executable, '-c', PROBE], env, a.repeat)
+        if report['gui']:
+            inner = report['gui']['in_process']
+            print(f"GUI to window:              {report['gui']['wall']:.3f} s"
+                  +  (f" ({inner:.3f} s once Python runs the script)" if inner is not None else ""))
+        else:
+            print("GUI to window:              n/a (PyQt5 or a display is missing)")
+
+        for exe in a.exe:
+            result = exe_to_window(os.path.abspath(exe), env, a.repeat)
+            report['exe'][exe] = result
+            print(f"{exe}: " + (f"{result['wall']:.3f} s to window" if result else "n/a (needs pywin32)"))
+
+    if a.json:
+        with open(a.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -15,10 +15,13 @@ class BuildWorker(QThread):
     finished_ok      = pyqtSignal()
     finished_err     = pyqtSignal(str)
 
-    def __init__(self, add_shortcut=False, launch_after=False):
+    def __init__(self, add_shortcut=False, launch_after=False, onedir=False):
         super().__init__()
         self.add_shortcut = add_shortcut
         self.launch_after = launch_after
+        # --onefile unpacks the whole bundle to a temp folder at every
+        # launch; --onedir starts straight from the installed folder.
+        self.onedir = onedir
 
     def run(self):
         project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
@@ -41,6 +44,14 @@ class BuildWorker(QThread):
         try:
             os.makedirs(os.path.join(project_root, 'backup'), exist_ok=True)
             installer_path = os.path.join(project_root, 'tools', 'python_installer', 'python-3.11.5-amd64.exe')
+            if self.onedir:
+                exe_path = os.path.join(project_root, 'ArduinoBackupTool', 'ArduinoBackupTool.exe')
+                built = os.path.join(project_root, 'dist', 'ArduinoBackupTool')
+                dst = os.path.join(project_root, 'ArduinoBackupTool')
+            else:
+                exe_path = os.path.join(project_root, 'ArduinoBackupTool.exe')
+                built = os.path.join(project_root, 'dist', 'ArduinoBackupTool.exe')
+                dst = exe_path
 
             steps = [
                 ("[1/7] Vérifier Python", ["python", "--version"]),
@@ -53,10 +64,12 @@ class BuildWorker(QThread):
                     "pyqt5", "pyinstaller", "pyserial", "pywin32"
                 ]),
                 ("[4/7] Lancer PyInstaller", [
-                    "python", "-m", "PyInstaller", "--noconfirm", "--onefile", "--windowed",
+                    "python", "-m", "PyInstaller", "--noconfirm",
+                    "--onedir" if self.onedir else "--onefile", "--windowed",
                     f"--icon={os.path.join(project_root, 'assets', 'app.ico')}",
                     "--name=ArduinoBackupTool",
                     "--hidden-import=serial.tools.list_ports",
+                    "--exclude-module=tkinter",
                     f"--add-binary={os.path.join(project_root, 'avrdude','avrdude.exe')}:.",
                     f"--add-data={os.path.join(project_root, 'avrdude','avrdude.conf')}:.",
                     f"--add-data={os.path.join(project_root, 'assets','loader.gif')}:.",
@@ -66,8 +79,18 @@ class BuildWorker(QThread):
                 ("[5/7] Déplacer l'exécutable", ["python", "-c",
                     (
                         "import shutil, os; "
-                        f"src = r'{os.path.join(project_root, 'dist', 'ArduinoBackupTool.exe')}'; "
-                        f"dst = r'{project_root}'; "
+                        f"src = r'{built}'; "
+                        f"dst = r'{dst}'; "
+                        # Only PyInstaller's files are replaced: a ./backup
+                        # folder next to the onedir exe is kept.
+                        "lib = os.path.join(dst, '_internal'); "
+                        "shutil.rmtree(lib) if os.path.isdir(lib) else None; "
+                        "shutil.copytree(src, dst, dirs_exist_ok=True)"
+                    ) if self.onedir else (
+                        "import shutil, os; "
+                        f"src = r'{built}'; "
+                        f"dst = r'{dst}'; "
+                        "os.remove(dst) if os.path.exists(dst) else None; "
                         "shutil.move(src, dst)"
                     )
                 ]),
@@ -82,10 +105,11 @@ class BuildWorker(QThread):
                 shortcut_py = (
                     "import os, win32com.client; "
                     "desk = os.path.join(os.environ['USERPROFILE'], 'Desktop'); "
-                    f"target = r'{os.path.join(project_root, 'ArduinoBackupTool.exe')}'; "
+                    f"target = r'{exe_path}'; "
                     "shell = win32com.client.Dispatch('WScript.Shell'); "
                     "s = shell.CreateShortCut(os.path.join(desk, 'ArduinoBackupTool.lnk')); "
-                    "s.TargetPath = target; s.WorkingDirectory = os.path.dirname(target); s.save()"
+                    # ./backup is the project's backup folder, onefile or onedir.
+                    f"s.TargetPath = target; s.WorkingDirectory = r'{project_root}'; s.save()"
                 )
                 steps.append(("[7/7] Créer raccourci", ["python", "-c", shortcut_py]))
 
@@ -114,8 +138,7 @@ class BuildWorker(QThread):
             self.progress_changed.emit(100)
 
             if self.launch_after:
-                exe = os.path.join(project_root, 'ArduinoBackupTool.exe')
-                subprocess.Popen(exe, shell=True)
+                subprocess.Popen(exe_path, shell=True, cwd=project_root)
 
             self.finished_ok.emit()
 
@@ -141,6 +164,7 @@ class BuilderWindow(QWidget):
 
         self.shortcut_chk = QCheckBox("Créer un raccourci sur le bureau")
         self.launch_chk   = QCheckBox("Lancer l'application après le build")
+        self.onedir_chk   = QCheckBox("Démarrage rapide (dossier --onedir au lieu d'un seul .exe)")
 
         self.progress     = QProgressBar()
         self.build_btn    = QPushButton("Lancer le build")
@@ -151,6 +175,7 @@ class BuilderWindow(QWidget):
         layout.addWidget(self.spinner_lbl)
         layout.addWidget(self.shortcut_chk)
         layout.addWidget(self.launch_chk)
+        layout.addWidget(self.onedir_chk)
         layout.addWidget(self.progress)
         layout.addWidget(self.build_btn)
 
@@ -160,7 +185,8 @@ class BuilderWindow(QWidget):
         self.spinner.start()
         self.worker = BuildWorker(
             add_shortcut=self.shortcut_chk.isChecked(),
-            launch_after=self.launch_chk.isChecked()
+            launch_after=self.launch_chk.isChecked(),
+            onedir=self.onedir_chk.isChecked()
         )
         self.worker.progress_changed.connect(self.progress.setValue)
         self.worker.status_changed.connect(self.status_lbl.setText)
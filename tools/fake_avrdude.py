@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# Simulated avrdude used by the benchmark scripts in tools/.
+#
+# Accepts the subset of the avrdude command line used by ArduinoBackupTool
+# (-C -p -c -P -b -v -n -U ...) and prints avrdude 6.x style messages.
+# Device memories live in FAKE_AVRDUDE_DEVICES/<port>/ so several simulated
+# boards can be driven at once. Timing is controlled by environment variables:
+#
+#   FAKE_AVRDUDE_DEVICES  directory holding one sub-folder per port (required)
+#   FAKE_AVRDUDE_STARTUP  seconds spent on the config parse (after the -v banner)
+#   FAKE_AVRDUDE_RESET    seconds spent on serial open / bootloader handshake
+#   FAKE_AVRDUDE_BPS      transfer speed in bytes per second (0 = instant)
+#   FAKE_AVRDUDE_FAIL     memory name on which to fail (e.g. "eeprom")
+#
+# A per-board failure can also be injected with a fail.txt file holding the
+# memory name in the board's folder. Every write appends "<memory> <bytes>"
+# to written.log in that folder.
+import os
+import re
+import sys
+import time
+
+PARTS = {
+    'atmega328p': ((0x1e, 0x95, 0x0f), 32768, 1024),
+    'atmega168':  ((0x1e, 0x94, 0x06), 16384, 512),
+    'atmega2560': ((0x1e, 0x98, 0x01), 262144, 4096),
+    'atmega1280': ((0x1e, 0x97, 0x03), 131072, 4096),
+    'atmega32u4': ((0x1e, 0x95, 0x87), 32768, 1024),
+    'atmega8':    ((0x1e, 0x93, 0x07), 8192, 512),
+    'attiny85':   ((0x1e, 0x93, 0x0b), 8192, 512),
+    'attiny13':   ((0x1e, 0x90, 0x07), 1024, 64),
+}
+FUSES = ('lfuse', 'hfuse', 'efuse', 'lock')
+NO_EFUSE = ('atmega8', 'attiny13')
+ALIASES = {'m328p': 'atmega328p', 'm168': 'atmega168', 'm2560': 'atmega2560',
+           'm1280': 'atmega1280', 'm32u4': 'atmega32u4', 'm8': 'atmega8',
+           't85': 'attiny85', 't13': 'attiny13'}
+
+
+def env_float(name, default=0.0):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def err(msg):
+    sys.stderr.write(msg + "\n")
+    sys.stderr.flush()
+
+
+def progress_bar(kind, nbytes):
+    bps = env_float('FAKE_AVRDUDE_BPS')
+    total = nbytes / bps if bps > 0 else 0.0
+    sys.stderr.write(f"\n{kind} | ")
+    sys.stderr.flush()
+    for _ in range(50):
+        if total:
+            time.sleep(total / 50)
+        sys.stderr.write("#")
+        sys.stderr.flush()
+    sys.stderr.write(f" | 100% {total:0.2f}s\n\n")
+    sys.stderr.flush()
+
+
+def to_ihex(data, trim=False):
+    # Like avrdude, trailing 0xff bytes are only dropped for flash.
+    end = len(data)
+    while trim and end > 0 and data[end - 1] == 0xff:
+        end -= 1
+    lines = []
+    ext = 0
+    for addr in range(0, end, 32):
+        if addr >> 16 != ext:
+            ext = addr >> 16
+            rec = bytes([2, 0, 0, 4, ext >> 8, ext & 0xff])
+            lines.append(":" + rec.hex().upper() + f"{(-sum(rec)) & 0xff:02X}")
+        chunk = data[addr:min(addr + 32, end)]
+        rec = bytes([len(chunk), (addr >> 8) & 0xff, addr & 0xff, 0]) + chunk
+        lines.append(":" + rec.hex().upper() + f"{(-sum(rec)) & 0xff:02X}")
+    lines.append(":00000001FF")
+    return "\n".join(lines) + "\n"
+
+
+def from_ihex(text):
+    # Returns the data records as (address, bytes) segments: like avrdude,
+    # only addresses present in the file are written.
+    segments = []
+    base = 0
+    for line in text.splitlines():
+        line = line.strip()
+        if not line.startswith(':'):
+            continue
+        rec = bytes.fromhex(line[1:])
+        n, addr, typ = rec[0], (rec[1] << 8) | rec[2], rec[3]
+        payload = rec[4:4 + n]
+        if typ == 0:
+            segments.append((base + addr, payload))
+        elif typ == 2:
+            base = ((payload[0] << 8) | payload[1]) << 4
+        elif typ == 4:
+            base = ((payload[0] << 8) | payload[1]) << 16
+        elif typ == 1:
+            break
+    return segments
+
+
+def parse_value(value, fmt):
+    if fmt == 'm':
+        return [(0, bytes(int(v, 0) & 0xff for v in value.split(',')))]
+    if fmt == 'r':
+        with open(value, 'rb') as f:
+            return [(0, f.read())]
+    with open(value, 'r') as f:
+        text = f.read()
+    if fmt == 'i':
+        return from_ihex(text)
+    return [(0, bytes(int(v, 0) & 0xff for v in re.split(r'[\s,]+', text.strip()) if v))]
+
+
+def load_mem(dev_dir, mem, size):
+    path = os.path.join(dev_dir, f"{mem}.bin")
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            data = bytearray(f.read())
+        data.extend(b'\xff' * (size - len(data)))
+        return data[:size]
+    return bytearray(b'\xff' * size)
+
+
+def save_mem(dev_dir, mem, data):
+    with open(os.path.join(dev_dir, f"{mem}.bin"), 'wb') as f:
+        f.write(bytes(data))
+
+
+def main(argv):
+    args = {'-U': []}
+    verbose = False
+    no_verify = '-V' in argv
+    i = 0
+    while i < len(argv):
+        a = argv[i]
+        if a in ('-C', '-p', '-c', '-P', '-b'):
+            args[a] = argv[i + 1]
+            i += 2
+        elif a == '-U':
+            args['-U'].append(argv[i + 1])
+            i += 2
+        elif a.startswith('-v'):
+            verbose = True
+            i += 1
+        else:
+            i += 1
+
+    # -v: the banner before the config parse, the port and programmer after.
+    if verbose:
+        err("\navrdude: Version 6.3-fake, compiled for ArduinoBackupTool benchmarks")
+    time.sleep(env_float('FAKE_AVRDUDE_STARTUP'))
+    if verbose:
+        err(f"         Using Port                    : {args.get('-P', '')}")
+        err(f"         Using Programmer              : {args.get('-c', '')}")
+
+    part = args.get('-p', '').lower()
+    part = ALIASES.get(part, part)
+    if part not in PARTS:
+        err(f"avrdude: AVR Part \"{args.get('-p')}\" not found.")
+        return 1
+    sig, flash_size, eeprom_size = PARTS[part]
+
+    root = os.environ.get('FAKE_AVRDUDE_DEVICES', '')
+    port = args.get('-P', '')
+    dev_dir = os.path.join(root, re.sub(r'[^A-Za-z0-9_.-]', '_', port))
+    if not root or not os.path.isdir(dev_dir):
+        err(f"avrdude: ser_open(): can't open device \"{port}\": No such file or directory")
+        return 1
+
+    time.sleep(env_float('FAKE_AVRDUDE_RESET'))
+    sig_path = os.path.join(dev_dir, 'signature.txt')
+    if os.path.exists(sig_path):
+        with open(sig_path) as f:
+            sig = tuple(int(v, 0) for v in f.read().split())
+    err("avrdude: AVR device initialized and ready to accept instructions")
+    progress_bar("Reading", 0)
+    err(f"avrdude: Device signature = 0x{sig[0]:02x}{sig[1]:02x}{sig[2]:02x} (probably {part})")
+    if sig != PARTS[part][0]:
+        err("avrdude: Expected signature for %s is %02X %02X %02X" % ((part,) + PARTS[part][0]))
+        err("         Double check chip, or use -F to override this check.")
+        return 1
+
+    sizes = {'flash': flash_size, 'eeprom': eeprom_size}
+    fail = os.environ.get('FAKE_AVRDUDE_FAIL', '')
+    fail_path = os.path.join(dev_dir, 'fail.txt')
+    if os.path.exists(fail_path):
+        with open(fail_path) as f:
+            fail = f.read().strip()
+    # Like avrdude, an unknown memory fails the whole command line.
+    for spec in args['-U']:
+        mem = spec.split(':')[0]
+        if mem not in sizes and (mem not in FUSES or (mem == 'efuse' and part in NO_EFUSE)):
+            err(f"avrdude: memory type \"{mem}\" not defined for part \"{part}\"")
+            return 1
+    for spec in args['-U']:
+        parts = spec.split(':')
+        mem, op, fmt = parts[0], parts[1], parts[-1]
+        value = ':'.join(parts[2:-1])
+        size = sizes.get(mem, 1)
+        if op == 'r':
+            err(f"avrdude: reading {mem} memory:")
+            if mem == fail:
+                progress_bar("Reading", size // 2)
+                err(f"avrdude: failed to read all of {mem} memory, rc=-2")
+                return 1
+            progress_bar("Reading", size)
+            data = load_mem(dev_dir, mem, size)
+            err(f"avrdude: writing output file \"{value}\"")
+            if fmt == 'i':
+                out = to_ihex(data, trim=(mem == 'flash'))
+            elif fmt == 'h':
+                out = ",".join(f"0x{b:x}" for b in data) + "\n"
+            else:
+                out = ",".join(str(b) for b in data) + "\n"
+            with open(value, 'w') as f:
+                f.write(out)
+        elif op in ('w', 'v'):
+            if fmt != 'm':
+                err(f"avrdude: reading input file \"{value}\"")
+            try:
+                segments = parse_value(value, fmt)
+            except OSError as e:
+                err(f"avrdude: can't open input file {value}: {e.strerror}")
+                return 1
+            top = max((addr + len(chunk) for addr, chunk in segments), default=0)
+            count = sum(len(chunk) for _, chunk in segments)
+            if top > size:
+                err(f"avrdude: ERROR: address 0x{top:04x} out of range at line 1 of {value}")
+                return 1
+            data = load_mem(dev_dir, mem, size)
+            if op == 'w':
+                err(f"avrdude: writing {mem} ({top} bytes):")
+                if mem == fail:
+                    progress_bar("Writing", count // 2)
+                    err(f"avrdude: failed to write {mem} memory, rc=-1")
+                    return 1
+                progress_bar("Writing", count)
+                for addr, chunk in segments:
+                    data[addr:addr + len(chunk)] = chunk
+                save_mem(dev_dir, mem, data)
+                with open(os.path.join(dev_dir, 'written.log'), 'a') as f:
+                    f.write(f"{mem} {count}\n")
+                err(f"avrdude: {top} bytes of {mem} written")
+                if no_verify:
+                    continue
+            err(f"avrdude: verifying {mem} memory against {value}:")
+            err(f"avrdude: reading on-chip {mem} data:")
+            progress_bar("Reading", top)
+            err("avrdude: verifying ...")
+            for addr, chunk in segments:
+                if bytes(data[addr:addr + len(chunk)]) != chunk:
+                    err(f"avrdude: verification error, first mismatch at byte 0x{addr:04x}")
+                    return 1
+            err(f"avrdude: {top} bytes of {mem} verified")
+        else:
+            err(f"avrdude: invalid I/O mode '{op}' in update specification")
+            return 1
+
+    err("\navrdude done.  Thank you.\n")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
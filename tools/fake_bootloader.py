@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# Simulated Arduino bootloader behind a pseudo-terminal, used to test and
+# benchmark the native STK500 engine (src/stk500.py) without hardware.
+#
+#   python tools/fake_bootloader.py --dir /tmp/dev/board0 --mcu atmega328p
+#
+# prints the pty path to use as serial port. Memories are the <memory>.bin
+# files of tools/fake_avrdude.py, so both engines can drive the same
+# simulated board. Speaks STK500v1 (optiboot, -c arduino) or, with
+# --protocol v2, STK500v2 (wiring bootloader, -c wiring).
+#
+#   --reset    seconds between the first byte of a session and the
+#              bootloader answering (auto-reset + boot delay)
+#   --latency  seconds added to every burst written by the host (USB
+#              round trip)
+#   --bps      serial speed in bytes per second (0 = instant)
+#   --glitch   drop the link once after this many flash bytes were read
+#              (USB glitch), for the checkpoint/resume path
+#
+# Like optiboot, the bootloader starts the application (and has to be
+# reset again) after LEAVE_PROGMODE or one second without data.
+import argparse
+import os
+import select
+import sys
+import threading
+import time
+import tty
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from fake_avrdude import PARTS, FUSES, load_mem, save_mem
+
+FUSE_READ  = {(0x50, 0x00): 'lfuse', (0x58, 0x08): 'hfuse', (0x50, 0x08): 'efuse', (0x58, 0x00): 'lock'}
+FUSE_WRITE = {(0xac, 0xa0): 'lfuse', (0xac, 0xa8): 'hfuse', (0xac, 0xa4): 'efuse', (0xac, 0xe0): 'lock'}
+BOOT_TIMEOUT = 1.0
+
+# STK500v1 command lengths, command byte and CRC_EOP included.
+V1_LENGTHS = {0x30: 2, 0x41: 3, 0x42: 22, 0x45: 7, 0x50: 2, 0x51: 2, 0x55: 4, 0x56: 6, 0x74: 5, 0x75: 2}
+
+
+class FakeBootloader:
+    def __init__(self, dev_dir, mcu='atmega328p', protocol='v1', reset=0.0, latency=0.0, bps=0.0,
+                 glitch=0):
+        self.dev_dir  = dev_dir
+        self.mcu      = mcu
+        self.protocol = protocol
+        self.reset    = reset
+        self.latency  = latency
+        self.bps      = bps
+        self.glitch   = glitch
+        self.flash_read = 0
+        self.mute_until = 0
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.path = os.ttyname(self.slave)
+        self.buf = bytearray()
+        self.state = 'app'
+        self.boot_at = 0
+        self.last_rx = 0
+        self.mem = None
+        self.stop = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self.serve, daemon=True).start()
+        return self
+
+    def close(self):
+        self.stop.set()
+
+    # -- board ---------------------------------------------------------------
+
+    def load(self):
+        sig, flash_size, eeprom_size = PARTS[self.mcu]
+        sig_path = os.path.join(self.dev_dir, 'signature.txt')
+        if os.path.exists(sig_path):
+            with open(sig_path) as f:
+                sig = tuple(int(v, 0) for v in f.read().split())
+        self.sig = sig
+        self.mem = {'flash': load_mem(self.dev_dir, 'flash', flash_size),
+                    'eeprom': load_mem(self.dev_dir, 'eeprom', eeprom_size)}
+        for fuse in FUSES:
+            self.mem[fuse] = load_mem(self.dev_dir, fuse, 1)
+        self.written = {}
+        self.addr = 0
+        self.ext = 0
+
+    def save(self):
+        if self.mem is None:
+            return
+        for name, count in self.written.items():
+            save_mem(self.dev_dir, name, self.mem[name])
+            with open(os.path.join(self.dev_dir, 'written.log'), 'a') as f:
+                f.write(f"{name} {count}\n")
+        self.mem = None
+
+    def to_app(self):
+        self.save()
+        self.state = 'app'
+        self.buf.clear()
+
+    def read_mem(self, name, addr, n):
+        if name == 'flash':
+            self.flash_read += n
+        return self.mem[name][addr:addr + n]
+
+    def write_mem(self, name, addr, data):
+        mem = self.mem[name]
+        data = data[:max(0, len(mem) - addr)]
+        mem[addr:addr + len(data)] = data
+        self.written[name] = self.written.get(name, 0) + len(data)
+
+    def universal(self, b):
+        if (b[0], b[1]) in FUSE_READ:
+            return self.mem[FUSE_READ[(b[0], b[1])]][0]
+        if (b[0], b[1]) in FUSE_WRITE:
+            self.write_mem(FUSE_WRITE[(b[0], b[1])], 0, bytes([b[3]]))
+            return 0
+        if b[0] == 0x4d:
+            self.ext = b[2]
+        return 0
+
+    # -- STK500v1 ------------------------------------------------------------
+
+    def v1_command(self):
+        cmd = self.buf[0]
+        if cmd == 0x64:
+            if len(self.buf) < 4:
+                return None
+            need = 4 + ((self.buf[1] << 8) | self.buf[2]) + 1
+        else:
+            need = V1_LENGTHS.get(cmd, 2)
+        if len(self.buf) < need:
+            return None
+        req = bytes(self.buf[:need])
+        del self.buf[:need]
+        if req[-1] != 0x20:
+            self.buf.clear()
+            return bytes([0x15])
+        ok = lambda payload=b'': bytes([0x14]) + bytes(payload) + bytes([0x10])
+        if cmd == 0x41:
+            return ok([{0x80: 3, 0x81: 8, 0x82: 0}.get(req[1], 0)])
+        if cmd == 0x75:
+            return ok(self.sig)
+        if cmd == 0x51:
+            self.to_app()
+            return ok()
+        if cmd == 0x55:
+            self.addr = req[1] | (req[2] << 8)
+            return ok()
+        if cmd == 0x56:
+            return ok([self.universal(req[1:5])])
+        if cmd in (0x64, 0x74):
+            n = (req[1] << 8) | req[2]
+            flash = req[3] == ord('F')
+            addr = ((self.addr << 1) + (self.ext << 17)) if flash else self.addr
+            name = 'flash' if flash else 'eeprom'
+            if cmd == 0x74:
+                return ok(self.read_mem(name, addr, n))
+            self.write_mem(name, addr, req[4:4 + n])
+            return ok()
+        return ok()
+
+    # -- STK500v2 ------------------------------------------------------------
+
+    def v2_command(self):
+        start = self.buf.find(0x1b)
+        if start < 0:
+            self.buf.clear()
+            return None
+        del self.buf[:start]
+        if len(self.buf) < 5:
+            return None
+        size = (self.buf[2] << 8) | self.buf[3]
+        if len(self.buf) < 6 + size:
+            return None
+        seq, body = self.buf[1], bytes(self.buf[5:5 + size])
+        del self.buf[:6 + size]
+        cmd = body[0]
+        if cmd == 0x01:
+            out = [0x01, 0x00, 8] + list(b'AVRISP_2')
+        elif cmd == 0x06:
+            self.addr = int.from_bytes(body[1:5], 'big') & 0x7fffffff
+            out = [cmd, 0x00]
+        elif cmd in (0x13, 0x14, 0x15, 0x16):
+            n = (body[1] << 8) | body[2]
+            flash = cmd in (0x13, 0x14)
+            name = 'flash' if flash else 'eeprom'
+            addr = self.addr << 1 if flash else self.addr
+            if cmd in (0x14, 0x16):
+                out = [cmd, 0x00] + list(self.read_mem(name, addr, n)) + [0x00]
+            else:
+                self.write_mem(name, addr, body[10:10 + n])
+                out = [cmd, 0x00]
+            self.addr += n >> 1 if flash else n
+        elif cmd == 0x18:
+            out = [cmd, 0x00, self.universal(body[2:6]), 0x00]
+        elif cmd == 0x17:
+            self.universal(body[1:5])
+            out = [cmd, 0x00, 0x00]
+        elif cmd == 0x1b:
+            out = [cmd, 0x00, self.sig[body[4] % 3], 0x00]
+        elif cmd == 0x11:
+            self.to_app()
+            out = [cmd, 0x00]
+        elif cmd == 0x10:
+            out = [cmd, 0x00]
+        else:
+            out = [cmd, 0xc0]
+        msg = bytes([0x1b, seq, len(out) >> 8, len(out) & 0xff, 0x0e]) + bytes(out)
+        check = 0
+        for b in msg:
+            check ^= b
+        return msg + bytes([check])
+
+    # -- serial line ---------------------------------------------------------
+
+    def send(self, data):
+        if self.bps:
+            time.sleep(len(data) / self.bps)
+        os.write(self.master, data)
+
+    def serve(self):
+        while not self.stop.is_set():
+            ready, _, _ = select.select([self.master], [], [], 0.1)
+            now = time.monotonic()
+            if self.state == 'boot' and now - self.last_rx > BOOT_TIMEOUT:
+                self.to_app()
+            if not ready:
+                continue
+            try:
+                data = os.read(self.master, 4096)
+            except OSError:
+                time.sleep(0.05)
+                continue
+            if self.latency:
+                time.sleep(self.latency)
+            now = time.monotonic()
+            self.last_rx = now
+            if now < self.mute_until:
+                continue
+            if self.state == 'app':
+                # The host opened the port: the board resets and bytes sent
+                # before the bootloader runs are lost.
+                self.state = 'reset'
+                self.boot_at = now + self.reset
+            if self.state == 'reset':
+                if now < self.boot_at:
+                    continue
+                self.state = 'boot'
+                self.load()
+            self.buf += data
+            while self.buf and self.state == 'boot':
+                out = self.v1_command() if self.protocol == 'v1' else self.v2_command()
+                if out is None:
+                    break
+                if self.glitch and self.flash_read >= self.glitch:
+                    # The link drops: no answer, the board restarts.
+                    self.glitch = 0
+                    self.to_app()
+                    self.mute_until = now + 2 * BOOT_TIMEOUT
+                    break
+                self.send(out)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--dir', required=True, help="board folder holding <memory>.bin files")
+    ap.add_argument('--mcu', default='atmega328p')
+    ap.add_argument('--protocol', choices=['v1', 'v2'], default='v1')
+    ap.add_argument('--reset', type=float, default=0.0)
+    ap.add_argument('--latency', type=float, default=0.0)
+    ap.add_argument('--bps', type=float, default=0.0)
+    ap.add_argument('--glitch', type=int, default=0)
+    a = ap.parse_args()
+    os.makedirs(a.dir, exist_ok=True)
+    boot = FakeBootloader(a.dir, a.mcu, a.protocol, a.reset, a.latency, a.bps, a.glitch)
+    print(boot.path, flush=True)
+    try:
+        boot.serve()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
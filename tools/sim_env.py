@@ -0,0 +1,41 @@
+# Simulated boards shared by the bench scripts: the tools/fake_avrdude.py
+# timing options, one board folder per port and the params of a job
+# driving them.
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+sys.path.insert(0, HERE)
+
+
+def add_arguments(ap, reset=0.5):
+    ap.add_argument('--startup', type=float, default=0.3, help="avrdude config parse (s)")
+    ap.add_argument('--reset', type=float, default=reset, help="serial open, auto-reset + bootloader sync (s)")
+    ap.add_argument('--bps', type=float, default=0, help="transfer speed, 0 = instant")
+    ap.add_argument('--mcu', default='atmega328p')
+
+
+def setup(a, tmp, ports, fail=0):
+    # Board folders under tmp/devices; the first `fail` ones fail on eeprom.
+    devices = os.path.join(tmp, 'devices')
+    for n, port in enumerate(ports):
+        os.makedirs(os.path.join(devices, port))
+        if n < fail:
+            with open(os.path.join(devices, port, 'fail.txt'), 'w') as f:
+                f.write('eeprom')
+    os.environ['FAKE_AVRDUDE_DEVICES'] = devices
+    os.environ['FAKE_AVRDUDE_STARTUP'] = str(a.startup)
+    os.environ['FAKE_AVRDUDE_RESET'] = str(a.reset)
+    os.environ['FAKE_AVRDUDE_BPS'] = str(a.bps)
+    return devices
+
+
+def params(a, **extra):
+    p = {
+        'avrdude_path': os.path.join(HERE, 'fake_avrdude.py'),
+        'avrdude_conf_path': os.path.join(HERE, '..', 'avrdude', 'avrdude.conf'),
+        'mcu': a.mcu, 'prog': 'arduino', 'baud': '115200',
+    }
+    p.update(extra)
+    return p